@@ -0,0 +1,197 @@
+"""
+Benchmark of the API on a synthetic schema, with a SQLite-backed stand-in
+for DatabaseExplorer and a stub of the Pyrog GraphQL server: reports the
+latency percentiles and the peak memory of each operation.
+
+    python -m benchmarks.bench_explorer [--tables 10000] [--columns 200]
+        [--rows 1000] [--joins 3] [--iterations 30]
+        [--output results.json] [--baseline results.json] [--tolerance 0.2]
+
+With --baseline, the command fails when the median latency of an operation
+regressed by more than the tolerance compared to the baseline results.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy.exc import SAWarning
+
+from benchmarks.pyrog_stub import PyrogStub
+from benchmarks.sqlite_explorer import make_credentials, OWNER, SQLiteExplorer
+from benchmarks.synthetic import create_database, make_resources, WIDE_TABLE
+from pagai import views
+from pagai.app import app
+from pagai.json_encoder import RowSerializer
+from pagai.services.database_explorer import schema_cache, statement_cache
+from pagai.services.pyrog import pyrog
+
+AUTHORIZATION = {"Authorization": "Bearer benchmark"}
+
+
+class Operation:
+    def __init__(self, name: str, run: Callable, setup: Optional[Callable] = None):
+        self.name = name
+        self.run = run
+        self.setup = setup or (lambda: None)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    index = min(int(round(p / 100 * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(operation: Operation, iterations: int) -> Dict[str, float]:
+    durations = []
+    for _ in range(iterations):
+        operation.setup()
+        start = time.perf_counter()
+        operation.run()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+
+    # Tracing allocations slows everything down: memory is measured on a
+    # separate run.
+    operation.setup()
+    tracemalloc.start()
+    operation.run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": percentile(durations, 50) * 1000,
+        "p95_ms": percentile(durations, 95) * 1000,
+        "p99_ms": percentile(durations, 99) * 1000,
+        "max_ms": durations[-1] * 1000,
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def check_status(response):
+    # Reading the body consumes streamed responses.
+    body = response.get_data()
+    assert response.status_code == 200, body
+    return body
+
+
+def clear_caches():
+    schema_cache.clear()
+    statement_cache.clear()
+    pyrog.resource_cache.clear()
+
+
+def make_operations(client, credentials: dict, rows: int) -> List[Operation]:
+    def post(path):
+        return lambda: check_status(client.post(path, json=credentials))
+
+    def get(path):
+        return lambda: check_status(client.get(path, headers=AUTHORIZATION))
+
+    explorer = SQLiteExplorer(credentials)
+    exploration = explorer.explore(OWNER, WIDE_TABLE, limit=rows)
+    column_types = explorer.get_column_types(OWNER, WIDE_TABLE)
+
+    def serialize():
+        with app.app_context():
+            RowSerializer(column_types).jsonify(exploration).get_data()
+
+    explore_path = f"/explore/wide/{OWNER}/{WIDE_TABLE}?first={rows}"
+    return [
+        Operation("get_owners", post("/get_owners")),
+        Operation("get_owner_schema cold", post(f"/get_owner_schema/{OWNER}"), clear_caches),
+        Operation("get_owner_schema", post(f"/get_owner_schema/{OWNER}")),
+        Operation("search", post(f"/search/{OWNER}/fill_c_1")),
+        Operation("explore cold", get(explore_path), clear_caches),
+        Operation("explore", get(explore_path)),
+        Operation("explore paginated", get(f"{explore_path}&paginate=true")),
+        Operation("explore joins", get(f"/explore/joined/{OWNER}/{WIDE_TABLE}?first={rows}")),
+        Operation("stream ndjson", get(f"/explore/wide/{OWNER}/{WIDE_TABLE}/stream?first={rows}")),
+        Operation("serialize", serialize),
+    ]
+
+
+def print_results(results: Dict[str, dict]):
+    print(
+        f"{'operation':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+        f"{'peak KiB':>12}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<24}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}"
+            f"{result['p99_ms']:>10.1f}{result['max_ms']:>10.1f}{result['peak_memory_kb']:>12.0f}"
+        )
+
+
+def regressions(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float):
+    return [
+        f"{name}: p50 {result['p50_ms']:.1f} ms vs {baseline[name]['p50_ms']:.1f} ms"
+        for name, result in results.items()
+        if name in baseline and result["p50_ms"] > baseline[name]["p50_ms"] * (1 + tolerance)
+    ]
+
+
+def run(args) -> Dict[str, dict]:
+    # SQLite stores decimals as floats.
+    warnings.filterwarnings("ignore", category=SAWarning, message=".*Decimal objects natively")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "benchmark.db")
+        start = time.perf_counter()
+        create_database(path, args.tables, args.columns, args.rows, args.joins)
+        print(
+            f"{args.tables} tables, {args.columns} columns x {args.rows} rows, "
+            f"{args.joins} joins (generated in {time.perf_counter() - start:.1f} s)"
+        )
+
+        pyrog_url, explorer_class = pyrog.PYROG_URL, views.DatabaseExplorer
+        try:
+            with PyrogStub(make_resources(path, args.joins)) as stub:
+                pyrog.PYROG_URL = stub.url
+                views.DatabaseExplorer = SQLiteExplorer
+                client = app.test_client()
+                operations = make_operations(client, make_credentials(path), args.rows)
+                return {
+                    operation.name: measure(operation, args.iterations) for operation in operations
+                }
+        finally:
+            pyrog.PYROG_URL, views.DatabaseExplorer = pyrog_url, explorer_class
+            clear_caches()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tables", type=int, default=10000)
+    parser.add_argument("--columns", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--joins", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare the results to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+
+    results = run(args)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            slower = regressions(results, json.load(baseline), args.tolerance)
+        if slower:
+            print("Regressions:\n" + "\n".join(slower))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark of the fetch profiles: rows/s of the explorations of a wide and a
+narrow table, without tuning, with the default profile of the database and
+with several maximum fetch sizes.
+
+    python -m benchmarks.bench_fetch [--url oracle+cx_oracle://...]
+        [--owner public] [--wide wide] [--narrow link_0] [--rows 10000]
+        [--fetch-sizes 50,500,5000] [--iterations 5] [--stream]
+
+Without --url, the tables are created in a synthetic SQLite database, whose
+driver has no fetch size: give the URL of a database holding tables of the
+same shape to measure the round trips of its driver.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+import warnings
+from typing import Dict, List
+
+from sqlalchemy import create_engine, MetaData, select, Table
+from sqlalchemy.exc import SAWarning
+
+from benchmarks.sqlite_explorer import connect, OWNER
+from benchmarks.synthetic import create_database, link_table, WIDE_TABLE
+from pagai.services.database_explorer import iter_rows, STREAM_BATCH_SIZE
+from pagai.services.fetch_tuning import (
+    DEFAULT_FETCH_PROFILES,
+    fetch_options,
+    fetch_size,
+    FetchProfile,
+    tune_fetches,
+)
+
+DIALECT_MODELS = {"oracle": "ORACLE", "postgresql": "POSTGRES", "mssql": "MSSQL"}
+
+
+def fetch_all(engine, table, rows: int, stream: bool) -> int:
+    statement = select([table]).limit(rows)
+    options = fetch_options(rows, len(table.columns))
+    with engine.connect() as connection:
+        connection = connection.execution_options(stream_results=stream, **options)
+        result = connection.execute(statement)
+        if stream:
+            return sum(1 for _ in iter_rows(result, STREAM_BATCH_SIZE))
+        return len(result.fetchall())
+
+
+def rows_per_second(engine, table, args) -> float:
+    durations = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        count = fetch_all(engine, table, args.rows, args.stream)
+        durations.append(time.perf_counter() - start)
+    return count / statistics.median(durations)
+
+
+def make_profiles(dialect: str, fetch_sizes: List[int]) -> Dict[str, FetchProfile]:
+    profiles = {"untuned": None}
+    profiles["default"] = DEFAULT_FETCH_PROFILES[DIALECT_MODELS.get(dialect, "POSTGRES")]
+    for size in fetch_sizes:
+        profiles[f"{size} rows"] = FetchProfile(size, size * 10 ** 6, None, False)
+    return profiles
+
+
+def bench(url: str, make_engine, args) -> List[dict]:
+    results = []
+    dialect = url.split(":")[0].split("+")[0]
+    for profile_name, profile in make_profiles(dialect, args.fetch_sizes).items():
+        # Fetch hooks can't be removed from an engine: each profile gets
+        # its own.
+        engine = make_engine()
+        if profile is not None:
+            tune_fetches(engine, profile)
+        for table_name in [args.wide, args.narrow]:
+            table = Table(table_name, MetaData(), schema=args.owner, autoload_with=engine)
+            size = fetch_size(profile, args.rows, len(table.columns)) if profile else None
+            results.append(
+                {
+                    "table": table_name,
+                    "columns": len(table.columns),
+                    "profile": profile_name,
+                    "fetch_size": size,
+                    "rows_per_s": rows_per_second(engine, table, args),
+                }
+            )
+        engine.dispose()
+    return results
+
+
+def run(args) -> List[dict]:
+    if args.url:
+        return bench(args.url, lambda: create_engine(args.url), args)
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/fetched.db"
+        create_database(path, n_tables=2, n_columns=args.columns, n_rows=args.rows, n_joins=1)
+        # SQLite stores decimals as floats.
+        warnings.filterwarnings("ignore", category=SAWarning, message=".*Decimal objects natively")
+
+        def make_engine():
+            return create_engine("sqlite://", creator=lambda: connect(path))
+
+        return bench("sqlite://", make_engine, args)
+
+
+def print_results(results: List[dict]):
+    print(f"{'table':<12} {'columns':>8} {'profile':<12} {'fetch size':>10} {'rows/s':>12}")
+    for result in results:
+        print(
+            f"{result['table']:<12} {result['columns']:>8} {result['profile']:<12} "
+            f"{str(result['fetch_size'] or '-'):>10} {result['rows_per_s']:>12.0f}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", help="SQLAlchemy URL of the database holding the tables")
+    parser.add_argument("--owner", default=OWNER)
+    parser.add_argument("--wide", default=WIDE_TABLE)
+    parser.add_argument("--narrow", default=link_table(0))
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--columns", type=int, default=200, help="of the synthetic wide table")
+    parser.add_argument(
+        "--fetch-sizes",
+        type=lambda sizes: [int(size) for size in sizes.split(",")],
+        default=[50, 500, 5000],
+    )
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--stream", action="store_true", help="use server-side cursors")
+    return parser.parse_args(argv)
+
+
+def main():
+    print_results(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Micro-benchmark of the serialization of explorations: flask.jsonify (which
+calls MyJSONEncoder.default for each decimal and date) against
+RowSerializer, on wide decimal and datetime result sets.
+
+    python -m benchmarks.bench_serialization [--rows 1000] [--columns 200]
+"""
+import argparse
+import datetime
+import decimal
+import random
+import timeit
+
+from flask import jsonify
+from sqlalchemy import types
+
+from pagai.app import app
+from pagai.json_encoder import RowSerializer
+
+
+def random_datetime():
+    return datetime.datetime(2000, 1, 1) + datetime.timedelta(seconds=random.randint(0, 10 ** 9))
+
+
+def make_rows(n_rows, column_types):
+    generators = {
+        types.Numeric: lambda: decimal.Decimal(random.randint(0, 10 ** 6)) / 100,
+        types.DateTime: random_datetime,
+        types.Integer: lambda: random.randint(0, 10 ** 6),
+        types.String: lambda: f"value-{random.randint(0, 10 ** 6)}",
+    }
+    return [
+        [generators[type(column_type)]() for column_type in column_types] for _ in range(n_rows)
+    ]
+
+
+def bench(name, column_types, n_rows, repeat):
+    fields = [f"column_{i}" for i in range(len(column_types))]
+    rows = make_rows(n_rows, column_types)
+
+    def run_jsonify():
+        return jsonify({"fields": fields, "rows": rows}).get_data()
+
+    def run_serializer():
+        return RowSerializer(column_types).jsonify({"fields": fields, "rows": rows}).get_data()
+
+    assert run_jsonify() == run_serializer(), "outputs differ"
+
+    jsonify_time = min(timeit.repeat(run_jsonify, number=1, repeat=repeat))
+    serializer_time = min(timeit.repeat(run_serializer, number=1, repeat=repeat))
+    print(
+        f"{name:<12} jsonify: {jsonify_time * 1000:8.1f} ms  "
+        f"RowSerializer: {serializer_time * 1000:8.1f} ms  "
+        f"speedup: x{jsonify_time / serializer_time:.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--columns", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.rows} rows x {args.columns} columns")
+    with app.app_context():
+        for name, column_type in [
+            ("decimal", types.Numeric()),
+            ("datetime", types.DateTime()),
+            ("integer", types.Integer()),
+            ("string", types.String()),
+        ]:
+            bench(name, [column_type] * args.columns, args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+SQLite-backed stand-in for DatabaseExplorer, so that explorations can be
+benchmarked without database containers.
+The credentials look like Postgres ones (so that they go through the views)
+but their "database" is the path of a SQLite file, attached as the "public"
+owner. Only the catalog queries differ from DatabaseExplorer as SQLite has
+no information_schema: planning, caching and serialization are the same.
+"""
+import sqlite3
+import threading
+
+from sqlalchemy import create_engine, text
+
+from pagai.metrics import timed
+from pagai.services.bulkhead import bulkheads
+from pagai.services.catalog import foreign_keys_from_rows, OwnerCatalog, unique_indexes_from_rows
+from pagai.services.database_explorer import DatabaseExplorer, POSTGRES
+from pagai.services.dependency_graph import DependencyGraph, inferred_foreign_keys
+from pagai.services.engine_registry import credentials_key
+
+OWNER = "public"
+
+CATALOG_QUERY = text(
+    """
+    select m.name as table_name, p.name as column_name, p.type as data_type,
+        null as data_precision, null as data_scale,
+        case when p."notnull" then 'NO' else 'YES' end as is_nullable,
+        p.pk > 0 as is_primary_key
+    from public.sqlite_master m, pragma_table_info(m.name, 'public') p
+    where m.type = 'table'
+    order by m.name, p.cid
+    """
+)
+UNIQUE_INDEXES_QUERY = text(
+    """
+    select m.name as table_name, i.name as index_name, c.name as column_name
+    from public.sqlite_master m, pragma_index_list(m.name, 'public') i,
+        pragma_index_info(i.name, 'public') c
+    where m.type = 'table' and i."unique" and i.origin != 'pk'
+    order by m.name, i.name, c.seqno
+    """
+)
+
+FOREIGN_KEYS_QUERY = text(
+    """
+    select m.name as table_name, f.id as constraint_name, f."from" as column_name,
+        f."table" as referenced_table_name, f."to" as referenced_column_name
+    from public.sqlite_master m, pragma_foreign_key_list(m.name, 'public') f
+    where m.type = 'table'
+    order by m.name, f.id, f.seq
+    """
+)
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def make_credentials(path: str) -> dict:
+    return {
+        "model": POSTGRES,
+        "host": "localhost",
+        "port": 0,
+        "database": path,
+        "login": "bench",
+        "password": "bench",
+    }
+
+
+def connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(":memory:", check_same_thread=False)
+    connection.execute(f"attach database '{path}' as {OWNER}")
+    return connection
+
+
+def get_engine(path: str):
+    with _engines_lock:
+        if path not in _engines:
+            _engines[path] = create_engine("sqlite://", creator=lambda: connect(path))
+        return _engines[path]
+
+
+class SQLiteExplorer(DatabaseExplorer):
+    def __init__(self, db_config: dict, query_timeout: float = 0):
+        self._db_model = db_config["model"]
+        self.query_timeout = query_timeout
+        self._db_identity = credentials_key(db_config)
+        with timed("engine", self._db_model):
+            self._sql_engine = get_engine(db_config["database"])
+        self._bulkhead = bulkheads.get(self._db_identity)
+
+    def get_owners(self):
+        with self.connect() as connection, timed("catalog", self._db_model):
+            return [row[1] for row in connection.execute("pragma database_list")]
+
+    def read_owner_schemas(self, owners):
+        schemas = {}
+        for owner in owners:
+            catalog = self.get_owner_catalog(owner)
+            schemas[owner] = {table: catalog.column_names(table) for table in catalog.columns}
+            self.set_schema_entry((self._db_identity, owner), schemas[owner])
+        return schemas
+
+    def read_owner_catalog(self, owner: str) -> OwnerCatalog:
+        if owner != OWNER:
+            return OwnerCatalog(owner, {})
+        with self.connect() as connection, timed("catalog", self._db_model):
+            rows = connection.execute(CATALOG_QUERY).fetchall()
+        return OwnerCatalog.from_rows(owner, rows)
+
+    def read_table_stats(self, owner: str):
+        # SQLite doesn't keep an estimate of the number of rows.
+        return {}
+
+    def read_unique_indexes(self, owner: str):
+        if owner != OWNER:
+            return {}
+        with self.connect() as connection, timed("catalog", self._db_model):
+            rows = connection.execute(UNIQUE_INDEXES_QUERY).fetchall()
+        return unique_indexes_from_rows(rows)
+
+    def read_dependency_graph(self, owner: str) -> DependencyGraph:
+        if owner != OWNER:
+            return DependencyGraph([])
+        with self.connect() as connection, timed("catalog", self._db_model):
+            rows = connection.execute(FOREIGN_KEYS_QUERY).fetchall()
+        foreign_keys = foreign_keys_from_rows(rows)
+        inferred = inferred_foreign_keys(self.get_owner_catalog(owner), foreign_keys)
+        return DependencyGraph(foreign_keys + inferred)
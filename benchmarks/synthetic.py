@@ -0,0 +1,109 @@
+"""
+Synthetic SQLite databases and Pyrog resources for the benchmarks:
+- a wide table of n_columns columns (integers, decimals, strings and
+  timestamps) and n_rows rows,
+- a chain of link tables, each one referencing the previous one (the first
+  one references the wide table) with a foreign key, used by multi-join
+  filters,
+- filler tables up to n_tables tables, which make catalog queries heavier.
+"""
+import random
+import sqlite3
+
+from benchmarks.sqlite_explorer import make_credentials, OWNER
+
+WIDE_TABLE = "wide"
+COLUMN_TYPES = ["integer", "numeric", "varchar", "timestamp"]
+FILLER_COLUMNS = 10
+
+
+def column_value(column_type: str, rng: random.Random):
+    if column_type == "integer":
+        return rng.randint(0, 10 ** 6)
+    if column_type == "numeric":
+        return rng.randint(0, 10 ** 8) / 100
+    if column_type == "varchar":
+        return f"value-{rng.randint(0, 10 ** 6)}"
+    return f"20{rng.randint(10, 20)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)} 12:34:56"
+
+
+def link_table(depth: int) -> str:
+    return f"link_{depth}"
+
+
+def create_database(
+    path: str, n_tables: int, n_columns: int, n_rows: int, n_joins: int, seed: int = 0
+):
+    rng = random.Random(seed)
+    connection = sqlite3.connect(path)
+    with connection:
+        wide_types = [COLUMN_TYPES[i % len(COLUMN_TYPES)] for i in range(n_columns)]
+        columns = ", ".join(f"c_{i} {column_type}" for i, column_type in enumerate(wide_types))
+        connection.execute(f"create table {WIDE_TABLE} (id integer primary key, {columns})")
+        placeholders = ", ".join("?" * (n_columns + 1))
+        connection.executemany(
+            f"insert into {WIDE_TABLE} values ({placeholders})",
+            (
+                [i] + [column_value(column_type, rng) for column_type in wide_types]
+                for i in range(n_rows)
+            ),
+        )
+
+        for depth in range(n_joins):
+            parent = link_table(depth - 1) if depth else WIDE_TABLE
+            connection.execute(
+                f"create table {link_table(depth)} (id integer primary key, "
+                f"parent_id integer not null references {parent} (id), label varchar)"
+            )
+            connection.executemany(
+                f"insert into {link_table(depth)} values (?, ?, ?)",
+                ((i, i, f"label-{rng.randint(0, 100)}") for i in range(n_rows)),
+            )
+
+        filler_columns = ", ".join(f"f_{i} varchar" for i in range(FILLER_COLUMNS))
+        for i in range(max(n_tables - n_joins - 1, 0)):
+            connection.execute(
+                f"create table filler_{i} (id integer primary key, {filler_columns})"
+            )
+    connection.close()
+
+
+def sql_column(table: str, column: str, joins=[]) -> dict:
+    return {"owner": {"name": OWNER}, "table": table, "column": column, "joins": joins}
+
+
+def join_path(n_joins: int) -> list:
+    tables = [WIDE_TABLE] + [link_table(depth) for depth in range(n_joins)]
+    # The column of each side of a join belongs to the table of the other side.
+    return [
+        {"tables": [sql_column(tables[depth], "parent_id"), sql_column(tables[depth + 1], "id")]}
+        for depth in range(n_joins)
+    ]
+
+
+def make_resources(path: str, n_joins: int) -> dict:
+    """
+    Pyrog resources exploring the database: "wide" has no filters while
+    "joined" filters on the first and on the last link tables, the two
+    filters sharing the first join.
+    """
+    source = {"id": "source", "credential": make_credentials(path)}
+    joins = join_path(n_joins)
+    filters = []
+    if n_joins:
+        filters = [
+            {
+                "sqlColumn": sql_column(link_table(0), "label", joins[:1]),
+                "relation": "<>",
+                "value": "label-0",
+            },
+            {
+                "sqlColumn": sql_column(link_table(n_joins - 1), "label", joins),
+                "relation": "LIKE",
+                "value": "label-1%",
+            },
+        ]
+    return {
+        "wide": {"id": "wide", "filters": [], "source": source},
+        "joined": {"id": "joined", "filters": filters, "source": source},
+    }
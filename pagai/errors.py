@@ -8,3 +8,7 @@ class AuthorizationError(Exception):
 
 class OperationOutcome(Exception):
     pass
+
+
+class ServiceUnavailable(Exception):
+    pass
@@ -0,0 +1,144 @@
+import csv
+import datetime
+import decimal
+import io
+from itertools import islice
+
+from sqlalchemy import types
+
+from pagai.errors import OperationOutcome
+from pagai.json_encoder import RowSerializer
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Number of rows written in each chunk of a streamed response.
+CHUNK_SIZE = 500
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    batch = list(islice(rows, size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, size))
+
+
+def ndjson_chunks(fields, column_types, rows, chunk_size=CHUNK_SIZE):
+    """
+    Serialize an exploration as newline delimited JSON: the first line holds
+    the field names and each following line is a row.
+    """
+    serializer = RowSerializer(column_types)
+    yield serializer.dumps({"fields": fields}) + "\n"
+
+    for batch in batches(rows, chunk_size):
+        yield "".join(serializer.dumps(row) + "\n" for row in serializer.convert_rows(batch))
+
+
+def csv_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def csv_chunks(fields, column_types, rows, chunk_size=CHUNK_SIZE):
+    """
+    Serialize an exploration as CSV, the first line holds the field names.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(fields)
+    yield flush(buffer)
+
+    rows_in_buffer = 0
+    for row in rows:
+        writer.writerow([csv_value(value) for value in row])
+        rows_in_buffer += 1
+        if rows_in_buffer == chunk_size:
+            yield flush(buffer)
+            rows_in_buffer = 0
+    if rows_in_buffer:
+        yield flush(buffer)
+
+
+def flush(buffer):
+    value = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return value
+
+
+def columnar_json(exploration: dict, column_types) -> str:
+    """
+    Serialize an exploration with one array of values per field rather than
+    one array per row.
+    """
+    serializer = RowSerializer(column_types)
+    exploration = dict(exploration)
+    converted_rows = serializer.convert_rows(exploration.pop("rows"))
+    columns = [list(column) for column in zip(*converted_rows)]
+    exploration["columns"] = columns or [[] for _ in exploration["fields"]]
+    return serializer.dumps(exploration) + "\n"
+
+
+def to_float(value):
+    return float(value) if isinstance(value, decimal.Decimal) else value
+
+
+def to_str(value):
+    return value if value is None else str(value)
+
+
+def arrow_type(column_type: types.TypeEngine):
+    """
+    Return the Arrow type of a column and how to convert its values.
+    Decimals are converted to floats as in JSON responses.
+    """
+    if isinstance(column_type, types.DateTime):
+        return pyarrow.timestamp("us"), None
+    if isinstance(column_type, types.Date):
+        return pyarrow.date32(), None
+    if isinstance(column_type, types.Integer):
+        return pyarrow.int64(), None
+    if isinstance(column_type, types.Numeric):
+        return pyarrow.float64(), to_float
+    if isinstance(column_type, types.Boolean):
+        return pyarrow.bool_(), None
+    return pyarrow.string(), to_str
+
+
+def arrow_chunks(fields, column_types, rows, chunk_size=CHUNK_SIZE):
+    """
+    Serialize an exploration as an Arrow IPC stream, with one record batch
+    per chunk of rows.
+    """
+    # Raise before the response starts being streamed.
+    if pyarrow is None:
+        raise OperationOutcome("pyarrow must be installed to export Arrow streams")
+    return arrow_batches(fields, column_types, rows, chunk_size)
+
+
+def arrow_batches(fields, column_types, rows, chunk_size):
+    arrow_types, converters = zip(*[arrow_type(column_type) for column_type in column_types])
+    schema = pyarrow.schema(
+        [pyarrow.field(name, type_) for name, type_ in zip(fields, arrow_types)]
+    )
+    buffer = io.BytesIO()
+    writer = pyarrow.ipc.new_stream(buffer, schema)
+    yield flush(buffer)
+
+    for batch in batches(rows, chunk_size):
+        columns = zip(*batch)
+        arrays = [
+            pyarrow.array([convert(value) for value in column] if convert else column, type=type_)
+            for column, type_, convert in zip(columns, arrow_types, converters)
+        ]
+        writer.write_batch(pyarrow.record_batch(arrays, schema=schema))
+        yield flush(buffer)
+
+    writer.close()
+    yield flush(buffer)
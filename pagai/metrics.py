@@ -0,0 +1,226 @@
+"""
+Prometheus metrics, exposed in the text format by /metrics.
+The time spent by a request is broken down in phases:
+- pyrog: fetching the resource from Pyrog,
+- engine: getting the engine (and connection pool) of the database,
+- catalog: catalog queries (schemas, columns, statistics, indexes),
+- query: running the exploration query and fetching its rows,
+- serialize: serializing the rows in the response.
+"""
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Label used when the database model isn't known yet.
+UNKNOWN_MODEL = "none"
+
+PHASE_DURATION = Histogram(
+    "pagai_phase_duration_seconds",
+    "Time spent in each phase of the requests",
+    ["phase", "db_model"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+EXPLORE_DURATION = Histogram(
+    "pagai_explore_duration_seconds",
+    "Time spent serving explorations",
+    ["db_model"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+ROWS_RETURNED = Counter(
+    "pagai_rows_returned", "Number of rows returned by explorations", ["db_model"]
+)
+BYTES_SERIALIZED = Counter(
+    "pagai_bytes_serialized",
+    "Number of bytes of the serialized explorations",
+    ["db_model", "format"],
+)
+
+
+@contextmanager
+def timed(phase: str, db_model: str = UNKNOWN_MODEL):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_DURATION.labels(phase=phase, db_model=db_model).observe(time.perf_counter() - start)
+
+
+def observe_exploration(db_model: str, rows: int, size: int, output_format: str):
+    ROWS_RETURNED.labels(db_model=db_model).inc(rows)
+    BYTES_SERIALIZED.labels(db_model=db_model, format=output_format).inc(size)
+
+
+def metered_chunks(chunks, rows, db_model: str, output_format: str):
+    """
+    Yield the chunks of a streamed exploration and count its rows and bytes
+    once the stream ends.
+    """
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        observe_exploration(db_model, rows.count, size, output_format)
+
+
+class StatsCollector:
+    """
+    Collect the statistics of the connection pools, of the caches and of the
+    concurrency limits when metrics are scraped.
+    """
+
+    def describe(self):
+        # Otherwise the registry calls collect on registration, while the
+        # services are not imported yet.
+        return []
+
+    def collect(self):
+        # Imported here as the services import this module.
+        from pagai.services.bulkhead import bulkheads
+        from pagai.services.database_explorer import (
+            completion_cache,
+            profile_cache,
+            schema_cache,
+            statement_cache,
+        )
+        from pagai.services.engine_registry import engine_registry
+        from pagai.services.pyrog.pyrog import resource_cache
+        from pagai.services.query_planner import compiled_cache
+        from pagai.services.single_flight import single_flight
+        from pagai.services.snapshot_store import snapshot_store
+
+        yield from pool_metrics(engine_registry.stats())
+        yield from cache_metrics(
+            {
+                "schema": schema_cache.stats_by_label(),
+                "statement": statement_cache.stats_by_label(),
+                "profile": profile_cache.stats_by_label(),
+                "completion": completion_cache.stats_by_label(),
+                "pyrog_resource": resource_cache.stats_by_label(),
+            }
+        )
+        yield compiled_metrics(list(compiled_cache), engine_registry.dialect_models())
+        yield from bulkhead_metrics(bulkheads.stats().values())
+        yield CounterMetricFamily(
+            "pagai_coalesced_calls",
+            "Number of calls which waited for an identical call in flight",
+            single_flight.stats()["coalesced"],
+        )
+        if snapshot_store is not None:
+            yield from snapshot_metrics(snapshot_store.stats())
+
+
+def pool_metrics(pools):
+    metrics = {
+        "engines": GaugeMetricFamily(
+            "pagai_engines", "Number of database engines", labels=["db_model"]
+        ),
+        "checked_out": GaugeMetricFamily(
+            "pagai_pool_checked_out_connections",
+            "Number of connections in use",
+            labels=["db_model"],
+        ),
+        "checked_in": GaugeMetricFamily(
+            "pagai_pool_checked_in_connections",
+            "Number of idle connections in the pools",
+            labels=["db_model"],
+        ),
+        "overflow": GaugeMetricFamily(
+            "pagai_pool_overflow_connections",
+            "Number of connections opened beyond the pool sizes",
+            labels=["db_model"],
+        ),
+    }
+    totals = {}
+    for pool in pools:
+        model_totals = totals.setdefault(pool["model"], dict.fromkeys(metrics, 0))
+        model_totals["engines"] += 1
+        for stat in ["checked_out", "checked_in", "overflow"]:
+            model_totals[stat] += max(pool[stat], 0)
+    for db_model, model_totals in totals.items():
+        for stat, metric in metrics.items():
+            metric.add_metric([db_model], model_totals[stat])
+    return metrics.values()
+
+
+def cache_metrics(caches):
+    """
+    Statistics of the caches, given by cache and by database model (None
+    for the entries of no database).
+    """
+    labels = ["cache", "db_model"]
+    entries = GaugeMetricFamily("pagai_cache_entries", "Number of cached entries", labels=labels)
+    weight = GaugeMetricFamily("pagai_cache_weight", "Weight of the cached entries", labels=labels)
+    counters = {
+        stat: CounterMetricFamily(f"pagai_cache_{stat}", f"Number of cache {stat}", labels=labels)
+        for stat in ["hits", "misses", "evictions"]
+    }
+    for cache, stats_by_model in caches.items():
+        for db_model, stats in stats_by_model.items():
+            label_values = [cache, db_model or UNKNOWN_MODEL]
+            entries.add_metric(label_values, stats["entries"])
+            weight.add_metric(label_values, stats["weight"])
+            for stat, counter in counters.items():
+                counter.add_metric(label_values, stats[stat])
+    return [entries, weight, *counters.values()]
+
+
+def compiled_metrics(compiled_keys, dialect_models):
+    """
+    Number of compiled statements per database model, SQLAlchemy keys them
+    by dialect first.
+    """
+    counts = dict.fromkeys(dialect_models.values(), 0)
+    for key in compiled_keys:
+        db_model = dialect_models.get(key[0], UNKNOWN_MODEL)
+        counts[db_model] = counts.get(db_model, 0) + 1
+    metric = GaugeMetricFamily(
+        "pagai_compiled_statements", "Number of cached compiled statements", labels=["db_model"]
+    )
+    for db_model, count in counts.items():
+        metric.add_metric([db_model], count)
+    return metric
+
+
+def bulkhead_metrics(bulkheads):
+    metrics = {
+        "active": GaugeMetricFamily(
+            "pagai_db_active_queries",
+            "Number of queries running on the databases",
+            labels=["db_model"],
+        ),
+        "queued": GaugeMetricFamily(
+            "pagai_db_queued_queries", "Number of queries waiting for a slot", labels=["db_model"]
+        ),
+        "rejected": CounterMetricFamily(
+            "pagai_db_rejected_queries",
+            "Number of queries rejected by the concurrency limits",
+            labels=["db_model"],
+        ),
+    }
+    totals = {}
+    for stats in bulkheads:
+        model_totals = totals.setdefault(stats["db_model"], dict.fromkeys(metrics, 0))
+        for stat in metrics:
+            model_totals[stat] += stats[stat]
+    for db_model, model_totals in totals.items():
+        for stat, metric in metrics.items():
+            metric.add_metric([db_model], model_totals[stat])
+    return metrics.values()
+
+
+def snapshot_metrics(stats):
+    return [
+        CounterMetricFamily(
+            "pagai_snapshot_loads", "Number of schema entries loaded from snapshots", stats["loads"]
+        ),
+        CounterMetricFamily(
+            "pagai_snapshot_saves", "Number of schema entries saved in snapshots", stats["saves"]
+        ),
+    ]
+
+
+REGISTRY.register(StatsCollector())
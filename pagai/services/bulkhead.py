@@ -0,0 +1,130 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+from pagai.errors import ServiceUnavailable
+from pagai.metrics import UNKNOWN_MODEL
+
+# Number of queries which can run at the same time on a database, each on
+# its own connection: this should not exceed PAGAI_POOL_SIZE +
+# PAGAI_POOL_MAX_OVERFLOW.
+DB_MAX_CONCURRENCY = int(os.getenv("PAGAI_DB_MAX_CONCURRENCY", 5))
+# Number of queries which can wait for a slot, further ones are rejected
+# right away.
+DB_MAX_QUEUE = int(os.getenv("PAGAI_DB_MAX_QUEUE", 16))
+# In seconds, queries waiting longer than that are rejected.
+DB_QUEUE_TIMEOUT = float(os.getenv("PAGAI_DB_QUEUE_TIMEOUT", 10))
+
+
+class Bulkhead:
+    """
+    Limit the number of concurrent queries on a database so that a slow
+    database can't use up all the workers while the other ones stay
+    responsive. Queries exceeding max_concurrent wait for a slot, up to
+    max_queue of them and for at most queue_timeout seconds, they are
+    rejected with a ServiceUnavailable error otherwise.
+    A slot is held by a connection rather than by a thread: it may be
+    released by another thread (eg: a stream closed by the server). A
+    connection must not be opened while holding one, or a full bulkhead
+    would deadlock.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = DB_MAX_CONCURRENCY,
+        max_queue: int = DB_MAX_QUEUE,
+        queue_timeout: float = DB_QUEUE_TIMEOUT,
+        db_model: str = UNKNOWN_MODEL,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.db_model = db_model
+
+        self._condition = threading.Condition()
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+
+    def acquire(self):
+        with self._condition:
+            if self.active >= self.max_concurrent:
+                if self.queued >= self.max_queue:
+                    self.rejected += 1
+                    raise ServiceUnavailable("Too many queries are waiting for the database")
+                self.queued += 1
+                try:
+                    acquired = self._condition.wait_for(
+                        lambda: self.active < self.max_concurrent, timeout=self.queue_timeout
+                    )
+                finally:
+                    self.queued -= 1
+                if not acquired:
+                    self.rejected += 1
+                    raise ServiceUnavailable(
+                        f"The database is busy, no query slot was freed "
+                        f"within {self.queue_timeout:g} seconds"
+                    )
+            self.active += 1
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "db_model": self.db_model,
+                "active": self.active,
+                "queued": self.queued,
+                "rejected": self.rejected,
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+            }
+
+
+class BulkheadRegistry:
+    """
+    Process-wide bulkheads keyed by database identity.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = DB_MAX_CONCURRENCY,
+        max_queue: int = DB_MAX_QUEUE,
+        queue_timeout: float = DB_QUEUE_TIMEOUT,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        self._bulkheads: Dict[str, Bulkhead] = {}
+
+    def get(self, key: str, db_model: str = UNKNOWN_MODEL) -> Bulkhead:
+        with self._lock:
+            bulkhead = self._bulkheads.get(key)
+            if bulkhead is None:
+                bulkhead = Bulkhead(
+                    self.max_concurrent, self.max_queue, self.queue_timeout, db_model
+                )
+                self._bulkheads[key] = bulkhead
+            return bulkhead
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            bulkheads = dict(self._bulkheads)
+        return {key: bulkhead.stats() for key, bulkhead in bulkheads.items()}
+
+
+bulkheads = BulkheadRegistry()
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+COUNTED_STATS = ["hits", "misses", "evictions"]
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after ttl seconds.
+    The total weight of the entries (as computed by the weigh function,
+    1 per entry by default) is bounded by max_weight: the least recently
+    used entries are evicted to make room for new ones.
+    Statistics are also kept per label of the keys (as computed by the label
+    function, eg: the database of the entries), see stats_by_label.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        max_weight: int,
+        weigh: Callable[[Any], int] = lambda value: 1,
+        clock: Callable[[], float] = time.monotonic,
+        label: Callable[[Hashable], Optional[str]] = lambda key: None,
+    ):
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self._weigh = weigh
+        self._clock = clock
+        self._label = label
+
+        self._lock = threading.Lock()
+        # key -> (value, weight, expiration time)
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, float]]" = OrderedDict()
+        self._weight = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # label -> hits, misses and evictions of its keys
+        self._label_counts: Dict[Optional[str], Dict[str, int]] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._count(key, "misses")
+                return None
+            value, _, expires_at = entry
+            if self._clock() >= expires_at:
+                self._remove(key)
+                self._count(key, "misses")
+                return None
+            self._entries.move_to_end(key)
+            self._count(key, "hits")
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        weight = self._weigh(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if weight > self.max_weight:
+                # The value would evict everything else, don't cache it.
+                return
+            self._entries[key] = (value, weight, self._clock() + self.ttl)
+            self._weight += weight
+            while self._weight > self.max_weight:
+                lru_key = next(iter(self._entries))
+                self._remove(lru_key)
+                self._count(lru_key, "evictions")
+
+    def invalidate(self, key: Hashable) -> bool:
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._remove(key)
+            return True
+
+    def invalidate_prefix(self, prefix: tuple) -> int:
+        """
+        Drop all the entries whose (tuple) key starts with prefix
+        and return how many were dropped.
+        """
+        with self._lock:
+            keys = [
+                key
+                for key in self._entries
+                if isinstance(key, tuple) and key[: len(prefix)] == prefix
+            ]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "weight": self._weight,
+                "max_weight": self.max_weight,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def stats_by_label(self) -> Dict[Optional[str], dict]:
+        with self._lock:
+            stats = {
+                label: {"entries": 0, "weight": 0, **counts}
+                for label, counts in self._label_counts.items()
+            }
+            for key, (_, weight, _) in self._entries.items():
+                label_stats = stats.setdefault(
+                    self._label(key), {"entries": 0, "weight": 0, **dict.fromkeys(COUNTED_STATS, 0)}
+                )
+                label_stats["entries"] += 1
+                label_stats["weight"] += weight
+            return stats
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _count(self, key: Hashable, stat: str):
+        setattr(self, stat, getattr(self, stat) + 1)
+        label = self._label(key)
+        if label not in self._label_counts:
+            self._label_counts[label] = dict.fromkeys(COUNTED_STATS, 0)
+        self._label_counts[label][stat] += 1
+
+    def _remove(self, key: Hashable):
+        _, weight, _ = self._entries.pop(key)
+        self._weight -= weight
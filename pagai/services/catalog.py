@@ -0,0 +1,502 @@
+from collections import namedtuple
+from inspect import isclass
+from itertools import count
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, types
+from sqlalchemy.dialects import oracle, postgresql
+from sqlalchemy.sql import column as sql_column, table as sql_table, TableClause, text
+
+CatalogColumn = namedtuple("CatalogColumn", ["name", "type", "nullable", "primary_key"])
+ForeignKey = namedtuple(
+    "ForeignKey", ["table", "columns", "referenced_table", "referenced_columns", "inferred"]
+)
+
+# Columns of all the tables of an owner, alongside their type (and its
+# precision and scale for numbers), nullability and whether they are part
+# of the primary key, in a single query. The
+# *_TABLES_CATALOG_QUERY variants only read the given tables.
+ORACLE_CATALOG_SQL = """
+    select c.table_name, c.column_name, c.data_type, c.data_precision, c.data_scale,
+        c.nullable as is_nullable,
+        case when pk.column_name is null then 0 else 1 end as is_primary_key
+    from all_tab_columns c
+    left join (
+        select cc.table_name, cc.column_name
+        from all_constraints ac
+        join all_cons_columns cc
+            on cc.owner = ac.owner and cc.constraint_name = ac.constraint_name
+        where ac.constraint_type = 'P' and ac.owner = :owner
+    ) pk on pk.table_name = c.table_name and pk.column_name = c.column_name
+    where c.owner = :owner {tables_filter}
+    order by c.table_name, c.column_id
+    """
+INFORMATION_SCHEMA_CATALOG_SQL = """
+    select c.table_name, c.column_name, c.data_type,
+        c.numeric_precision as data_precision, c.numeric_scale as data_scale, c.is_nullable,
+        case when pk.column_name is null then 0 else 1 end as is_primary_key
+    from information_schema.columns c
+    left join (
+        select kcu.table_name, kcu.column_name
+        from information_schema.table_constraints tc
+        join information_schema.key_column_usage kcu
+            on kcu.constraint_schema = tc.constraint_schema
+            and kcu.constraint_name = tc.constraint_name
+            and kcu.table_name = tc.table_name
+        where tc.constraint_type = 'PRIMARY KEY' and tc.table_schema = :owner
+    ) pk on pk.table_name = c.table_name and pk.column_name = c.column_name
+    where c.table_schema = :owner {tables_filter}
+    order by c.table_name, c.ordinal_position
+    """
+TABLES_FILTER = "and c.table_name in :tables"
+
+
+def catalog_query(sql: str, tables_filter=False):
+    if not tables_filter:
+        return text(sql.format(tables_filter=""))
+    return text(sql.format(tables_filter=TABLES_FILTER)).bindparams(
+        bindparam("tables", expanding=True)
+    )
+
+
+ORACLE_CATALOG_QUERY = catalog_query(ORACLE_CATALOG_SQL)
+ORACLE_TABLES_CATALOG_QUERY = catalog_query(ORACLE_CATALOG_SQL, tables_filter=True)
+INFORMATION_SCHEMA_CATALOG_QUERY = catalog_query(INFORMATION_SCHEMA_CATALOG_SQL)
+INFORMATION_SCHEMA_TABLES_CATALOG_QUERY = catalog_query(
+    INFORMATION_SCHEMA_CATALOG_SQL, tables_filter=True
+)
+
+# Version of the definition of all the tables of an owner: it changes when
+# the columns of a table are altered. On Postgres, it is built from the
+# transaction ids (xmin) which last updated the rows of the table in
+# pg_class and of its columns in pg_attribute.
+ORACLE_TABLE_VERSIONS_QUERY = text(
+    """
+    select object_name as table_name, last_ddl_time as version
+    from all_objects
+    where owner = :owner and object_type in ('TABLE', 'VIEW')
+    """
+)
+MSSQL_TABLE_VERSIONS_QUERY = text(
+    """
+    select o.name as table_name, o.modify_date as version
+    from sys.objects o
+    join sys.schemas s on s.schema_id = o.schema_id
+    where s.name = :owner and o.type in ('U', 'V')
+    """
+)
+POSTGRES_TABLE_VERSIONS_QUERY = text(
+    """
+    select c.relname as table_name,
+        c.xmin::text || ':' || (
+            select sum(a.xmin::text::bigint) from pg_attribute a
+            where a.attrelid = c.oid and a.attnum > 0
+        ) as version
+    from pg_class c
+    join pg_namespace n on n.oid = c.relnamespace
+    where n.nspname = :owner and c.relkind in ('r', 'p', 'v', 'm', 'f')
+    """
+)
+
+# Estimated row count and on-disk size (in bytes) of all the tables of an owner
+# from the statistics of the catalog rather than with COUNT(*).
+POSTGRES_STATS_QUERY = text(
+    """
+    select c.relname as table_name, c.reltuples as row_count,
+        pg_total_relation_size(c.oid) as size
+    from pg_class c
+    join pg_namespace n on n.oid = c.relnamespace
+    where n.nspname = :owner and c.relkind in ('r', 'p', 'm')
+    """
+)
+ORACLE_STATS_QUERY = text(
+    """
+    select t.table_name, t.num_rows as row_count,
+        t.blocks * coalesce(ts.block_size, 8192) as "size"
+    from all_tables t
+    left join user_tablespaces ts on ts.tablespace_name = t.tablespace_name
+    where t.owner = :owner
+    """
+)
+MSSQL_STATS_QUERY = text(
+    """
+    select t.name as table_name,
+        (
+            select sum(p.rows) from sys.partitions p
+            where p.object_id = t.object_id and p.index_id in (0, 1)
+        ) as row_count,
+        (
+            select sum(a.total_pages) from sys.partitions p
+            join sys.allocation_units a on a.container_id = p.partition_id
+            where p.object_id = t.object_id
+        ) * 8192 as size
+    from sys.tables t
+    join sys.schemas s on s.schema_id = t.schema_id
+    where s.name = :owner
+    """
+)
+
+# Columns of the unique indexes of all the tables of an owner.
+POSTGRES_UNIQUE_INDEXES_QUERY = text(
+    """
+    select t.relname as table_name, i.relname as index_name, a.attname as column_name
+    from pg_index ix
+    join pg_class t on t.oid = ix.indrelid
+    join pg_class i on i.oid = ix.indexrelid
+    join pg_namespace n on n.oid = t.relnamespace
+    join pg_attribute a on a.attrelid = t.oid and a.attnum = any(ix.indkey)
+    where n.nspname = :owner and ix.indisunique
+        and ix.indpred is null and ix.indexprs is null
+    order by t.relname, i.relname, array_position(ix.indkey::int2[], a.attnum)
+    """
+)
+ORACLE_UNIQUE_INDEXES_QUERY = text(
+    """
+    select i.table_name, i.index_name, c.column_name
+    from all_indexes i
+    join all_ind_columns c on c.index_owner = i.owner and c.index_name = i.index_name
+    where i.table_owner = :owner and i.uniqueness = 'UNIQUE'
+    order by i.table_name, i.index_name, c.column_position
+    """
+)
+MSSQL_UNIQUE_INDEXES_QUERY = text(
+    """
+    select t.name as table_name, i.name as index_name, c.name as column_name
+    from sys.indexes i
+    join sys.tables t on t.object_id = i.object_id
+    join sys.schemas s on s.schema_id = t.schema_id
+    join sys.index_columns ic on ic.object_id = i.object_id and ic.index_id = i.index_id
+    join sys.columns c on c.object_id = ic.object_id and c.column_id = ic.column_id
+    where s.name = :owner and i.is_unique = 1 and i.has_filter = 0
+        and ic.is_included_column = 0
+    order by t.name, i.name, ic.key_ordinal
+    """
+)
+
+# Columns of the foreign keys between the tables of an owner.
+POSTGRES_FOREIGN_KEYS_QUERY = text(
+    """
+    select con.conname as constraint_name, t.relname as table_name,
+        a.attname as column_name, rt.relname as referenced_table_name,
+        ra.attname as referenced_column_name
+    from pg_constraint con
+    join pg_class t on t.oid = con.conrelid
+    join pg_namespace n on n.oid = t.relnamespace
+    join pg_class rt on rt.oid = con.confrelid
+    join pg_namespace rn on rn.oid = rt.relnamespace
+    cross join lateral unnest(con.conkey, con.confkey)
+        with ordinality as k(attnum, referenced_attnum, position)
+    join pg_attribute a on a.attrelid = con.conrelid and a.attnum = k.attnum
+    join pg_attribute ra on ra.attrelid = con.confrelid and ra.attnum = k.referenced_attnum
+    where con.contype = 'f' and n.nspname = :owner and rn.nspname = :owner
+    order by t.relname, con.conname, k.position
+    """
+)
+ORACLE_FOREIGN_KEYS_QUERY = text(
+    """
+    select c.constraint_name, cc.table_name, cc.column_name,
+        rc.table_name as referenced_table_name, rc.column_name as referenced_column_name
+    from all_constraints c
+    join all_cons_columns cc
+        on cc.owner = c.owner and cc.constraint_name = c.constraint_name
+    join all_cons_columns rc
+        on rc.owner = c.r_owner and rc.constraint_name = c.r_constraint_name
+        and rc.position = cc.position
+    where c.constraint_type = 'R' and c.owner = :owner and c.r_owner = :owner
+    order by cc.table_name, c.constraint_name, cc.position
+    """
+)
+MSSQL_FOREIGN_KEYS_QUERY = text(
+    """
+    select fk.name as constraint_name, t.name as table_name, c.name as column_name,
+        rt.name as referenced_table_name, rc.name as referenced_column_name
+    from sys.foreign_keys fk
+    join sys.foreign_key_columns fkc on fkc.constraint_object_id = fk.object_id
+    join sys.tables t on t.object_id = fk.parent_object_id
+    join sys.schemas s on s.schema_id = t.schema_id
+    join sys.columns c
+        on c.object_id = fkc.parent_object_id and c.column_id = fkc.parent_column_id
+    join sys.tables rt on rt.object_id = fk.referenced_object_id
+    join sys.schemas rs on rs.schema_id = rt.schema_id
+    join sys.columns rc
+        on rc.object_id = fkc.referenced_object_id and rc.column_id = fkc.referenced_column_id
+    where s.name = :owner and rs.name = :owner
+    order by t.name, fk.name, fkc.constraint_column_id
+    """
+)
+
+
+class UUID(types.String):
+    """
+    Identifiers (uuid, uniqueidentifier) which are read as strings but have
+    no string functions nor ordering in some databases.
+    """
+
+
+class LargeObject(types.Text):
+    """
+    Large objects (clob, nclob, ntext and text on MSSQL) which can't be
+    compared nor grouped by.
+    """
+
+
+def oracle_number(precision: Optional[int], scale: Optional[int]) -> types.TypeEngine:
+    """
+    Type of an Oracle NUMBER column, whose values are read as reflection
+    reads them: integers (scale 0, eg: INTEGER columns) as ints, numbers
+    with a scale as Decimals and the other ones as floats.
+    """
+    if scale == 0:
+        return oracle.NUMBER(precision, 0)
+    return types.Numeric(precision, scale, asdecimal=bool(scale))
+
+
+# Catalog data types (lower case prefixes) to SQLAlchemy types, or to
+# functions building the type from the precision and the scale of the column.
+CATALOG_TYPES = [
+    # A bit string on Postgres, not a bit.
+    ("bit varying", postgresql.BIT),
+    ("interval", types.Interval),
+    ("timestamp", types.DateTime),
+    ("datetime", types.DateTime),
+    ("smalldatetime", types.DateTime),
+    ("date", types.Date),
+    ("time", types.Time),
+    ("bigint", types.BigInteger),
+    ("smallint", types.SmallInteger),
+    ("tinyint", types.SmallInteger),
+    ("integer", types.Integer),
+    ("int", types.Integer),
+    ("serial", types.Integer),
+    ("numeric", types.Numeric),
+    ("decimal", types.Numeric),
+    ("number", types.Numeric),
+    ("money", types.Numeric),
+    ("smallmoney", types.Numeric),
+    ("double", types.Float),
+    ("float", types.Float),
+    ("real", types.Float),
+    ("binary_double", types.Float),
+    ("binary_float", types.Float),
+    ("boolean", types.Boolean),
+    ("bit", types.Boolean),
+    ("character", types.String),
+    ("char", types.String),
+    ("varchar", types.String),
+    ("nvarchar", types.String),
+    ("nchar", types.String),
+    ("varchar2", types.String),
+    ("nvarchar2", types.String),
+    ("text", types.Text),
+    ("ntext", LargeObject),
+    ("clob", LargeObject),
+    ("nclob", LargeObject),
+    ("uuid", UUID),
+    ("uniqueidentifier", UUID),
+]
+# Oracle DATE columns hold a time as well.
+ORACLE_CATALOG_TYPES = [("date", types.DateTime), ("number", oracle_number)] + CATALOG_TYPES
+# psycopg2 reads money as strings with a currency symbol.
+POSTGRES_CATALOG_TYPES = [("money", postgresql.MONEY)] + CATALOG_TYPES
+# text is a deprecated large object type on MSSQL, timestamp (or rowversion)
+# is a binary(8) row version rather than a date.
+MSSQL_CATALOG_TYPES = [
+    ("text", LargeObject),
+    ("timestamp", types.LargeBinary),
+    ("rowversion", types.LargeBinary),
+] + CATALOG_TYPES
+
+
+def catalog_type(
+    data_type: str, catalog_types=CATALOG_TYPES, precision=None, scale=None
+) -> types.TypeEngine:
+    """
+    Map a data type, as named in the catalog, to a SQLAlchemy type.
+    """
+    data_type = (data_type or "").lower()
+    for prefix, type_ in catalog_types:
+        if data_type.startswith(prefix):
+            return type_() if isclass(type_) else type_(precision, scale)
+    return types.NullType()
+
+
+# Each catalog gets a new version.
+catalog_versions = count()
+
+
+class OwnerCatalog:
+    """
+    Columns of all the tables of an owner, as returned by a catalog query.
+    Lightweight SQLAlchemy tables are built from it (without reflection)
+    and memoized. Statements built from the catalog are cached with its
+    version: they are not reused once the catalog is read again.
+    """
+
+    def __init__(self, owner: str, columns: Dict[str, List[CatalogColumn]]):
+        self.owner = owner
+        self.columns = columns
+        self.version = next(catalog_versions)
+        self._tables: Dict[str, TableClause] = {}
+
+    @classmethod
+    def from_rows(cls, owner: str, rows, catalog_types=CATALOG_TYPES):
+        columns: Dict[str, List[CatalogColumn]] = {}
+        for row in rows:
+            columns.setdefault(row["table_name"], []).append(
+                CatalogColumn(
+                    name=row["column_name"],
+                    type=catalog_type(
+                        row["data_type"], catalog_types, row["data_precision"], row["data_scale"]
+                    ),
+                    nullable=row["is_nullable"] in ("Y", "YES"),
+                    primary_key=bool(row["is_primary_key"]),
+                )
+            )
+        return cls(owner, columns)
+
+    def __getstate__(self):
+        # Memoized tables are rebuilt when needed.
+        return {"owner": self.owner, "columns": self.columns}
+
+    def __setstate__(self, state):
+        self.__init__(state["owner"], state["columns"])
+
+    def __contains__(self, table_name: str):
+        return table_name in self.columns
+
+    def __len__(self):
+        return sum(len(columns) for columns in self.columns.values())
+
+    def find_table(self, table_name: str) -> Optional[str]:
+        """
+        Return the name of a table in the catalog, matched case-insensitively
+        when no table has this exact name (eg: the names of tables created
+        without quotes are in upper case on Oracle).
+        """
+        if table_name in self.columns:
+            return table_name
+        lower_name = table_name.lower()
+        return next((name for name in self.columns if name.lower() == lower_name), None)
+
+    def column_names(self, table_name: str) -> List[str]:
+        return [col.name for col in self.columns[table_name]]
+
+    def primary_key(self, table_name: str) -> List[str]:
+        return [col.name for col in self.columns[table_name] if col.primary_key]
+
+    def not_nullable(self, table_name: str, column_names: List[str]) -> bool:
+        nullable = {col.name: col.nullable for col in self.columns[table_name]}
+        return all(nullable.get(name) is False for name in column_names)
+
+    def updated(self, columns: Dict[str, List[CatalogColumn]], removed_tables: List[str]):
+        """
+        Return a new catalog where the columns of some tables were replaced
+        (or added) and some tables were removed.
+        """
+        updated_columns = {
+            table_name: table_columns
+            for table_name, table_columns in self.columns.items()
+            if table_name not in removed_tables and table_name not in columns
+        }
+        updated_columns.update(columns)
+        return OwnerCatalog(self.owner, updated_columns)
+
+    def table(self, table_name: str) -> TableClause:
+        table = self._tables.get(table_name)
+        if table is None:
+            table = sql_table(
+                table_name,
+                *[sql_column(col.name, col.type) for col in self.columns[table_name]],
+                schema=self.owner,
+            )
+            # Concurrent builds of the same table are harmless.
+            self._tables[table_name] = table
+        return table
+
+
+def column_signature(column: CatalogColumn) -> tuple:
+    # SQLAlchemy types don't compare by value.
+    return (column.name, type(column.type), column.nullable, column.primary_key)
+
+
+def catalog_diff(old: OwnerCatalog, new: OwnerCatalog) -> dict:
+    """
+    Tables added to (with their columns) and removed from an owner, and the
+    columns added, removed and changed (type, nullability or primary key)
+    in the other tables.
+    """
+    diff = {
+        "added": {table: new.column_names(table) for table in new.columns if table not in old},
+        "removed": [table for table in old.columns if table not in new],
+        "modified": {},
+    }
+    for table, new_columns in new.columns.items():
+        if table not in old:
+            continue
+        old_signatures = {col.name: column_signature(col) for col in old.columns[table]}
+        new_signatures = {col.name: column_signature(col) for col in new_columns}
+        if old_signatures == new_signatures:
+            continue
+        diff["modified"][table] = {
+            "added": [name for name in new_signatures if name not in old_signatures],
+            "removed": [name for name in old_signatures if name not in new_signatures],
+            "changed": [
+                name
+                for name, signature in new_signatures.items()
+                if name in old_signatures and old_signatures[name] != signature
+            ],
+        }
+    return diff
+
+
+class TableVersions(dict):
+    """
+    Version of the definition of each table of an owner, as read by the
+    *_TABLE_VERSIONS_QUERY queries.
+    """
+
+
+def table_versions_from_rows(rows) -> TableVersions:
+    return TableVersions((row["table_name"], str(row["version"])) for row in rows)
+
+
+def estimate(value):
+    # Postgres reports -1 tuples (and Oracle no rows) for tables which were
+    # never analyzed.
+    if value is None or value < 0:
+        return None
+    return int(value)
+
+
+def table_stats_from_rows(rows) -> Dict[str, dict]:
+    return {
+        row["table_name"]: {"rows": estimate(row["row_count"]), "size": estimate(row["size"])}
+        for row in rows
+    }
+
+
+def unique_indexes_from_rows(rows) -> Dict[str, List[List[str]]]:
+    indexes: Dict[tuple, List[str]] = {}
+    for row in rows:
+        indexes.setdefault((row["table_name"], row["index_name"]), []).append(row["column_name"])
+
+    unique_indexes: Dict[str, List[List[str]]] = {}
+    for (table_name, _), columns in indexes.items():
+        unique_indexes.setdefault(table_name, []).append(columns)
+    return unique_indexes
+
+
+def foreign_keys_from_rows(rows) -> List[ForeignKey]:
+    constraints: Dict[tuple, list] = {}
+    for row in rows:
+        constraints.setdefault((row["table_name"], row["constraint_name"]), []).append(row)
+    return [
+        ForeignKey(
+            table=table_name,
+            columns=tuple(row["column_name"] for row in constraint_rows),
+            referenced_table=constraint_rows[0]["referenced_table_name"],
+            referenced_columns=tuple(row["referenced_column_name"] for row in constraint_rows),
+            inferred=False,
+        )
+        for (table_name, _), constraint_rows in constraints.items()
+    ]
@@ -0,0 +1,76 @@
+"""
+Completion of filter values: the most frequent values of a column starting
+with a prefix, among the first rows matching the prefix. The prefix is
+matched with LIKE 'prefix%' so that an index on the column can be used.
+"""
+import os
+from typing import List
+
+from sqlalchemy import bindparam, func, select
+
+# Number of rows matching the prefix which are counted.
+COMPLETION_SAMPLE_ROWS = int(os.getenv("PAGAI_COMPLETION_SAMPLE_ROWS", 10000))
+COMPLETION_CACHE_TTL = int(os.getenv("PAGAI_COMPLETION_CACHE_TTL", 300))
+# Maximum number of cached completions (one per column and prefix).
+COMPLETION_CACHE_SIZE = int(os.getenv("PAGAI_COMPLETION_CACHE_SIZE", 10000))
+COMPLETED_ALIAS = "pagai_completed"
+# Backslashes are escaped differently by each database in string literals.
+LIKE_ESCAPE = "/"
+
+
+def like_prefix(prefix: str) -> str:
+    """
+    Pattern of the values starting with prefix, its wildcards escaped.
+    """
+    for character in [LIKE_ESCAPE, "%", "_"]:
+        prefix = prefix.replace(character, LIKE_ESCAPE + character)
+    return prefix + "%"
+
+
+def completions_statement(table, column_name: str, limit: int, top: int):
+    """
+    Most frequent values among the first limit rows whose column value
+    starts with the bound prefix parameter (see like_prefix). One more
+    value than top is selected, to know whether there are more values.
+    """
+    column = table.c[column_name]
+    matching = (
+        select([column])
+        .where(column.like(bindparam("prefix"), escape=LIKE_ESCAPE))
+        .limit(limit)
+        .alias(COMPLETED_ALIAS)
+    )
+    value = matching.c[column_name]
+    return (
+        select([value.label("value"), func.count().label("frequency")])
+        .group_by(value)
+        .order_by(func.count().desc(), value)
+        .limit(top + 1)
+    )
+
+
+class Completions:
+    """
+    Completions of a prefix. They are complete when every value starting
+    with the prefix was counted: the completions of longer prefixes are
+    then found among them.
+    """
+
+    def __init__(self, values: List[dict], complete: bool):
+        self.values = values
+        self.complete = complete
+
+    @classmethod
+    def from_rows(cls, rows, limit: int, top: int):
+        values = [{"value": row["value"], "count": row["frequency"]} for row in rows]
+        counted = sum(value["count"] for value in values)
+        complete = len(values) <= top and counted < limit
+        return cls(values[:top], complete)
+
+    def narrowed(self, prefix: str) -> "Completions":
+        """
+        Completions of a longer prefix, only valid when they are complete.
+        """
+        return Completions(
+            [value for value in self.values if value["value"].startswith(prefix)], True
+        )
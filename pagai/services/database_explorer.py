@@ -1,33 +1,118 @@
-from collections import defaultdict
-from contextlib import contextmanager
-from sqlalchemy import and_, Column, create_engine, MetaData, Table, text
-from sqlalchemy.exc import InvalidRequestError, NoSuchTableError
-from sqlalchemy.orm import sessionmaker
-from typing import Dict, Optional, Callable
-
-from pagai.errors import OperationOutcome
-
-
-def handle_between_filter(col, value):
-    values = value.split(",")
-    if len(values) != 2:
-        raise ValueError("BETWEEN filter expects 2 values separated by a comma.")
-    min_val = values[0].strip()
-    max_val = values[1].strip()
-    return and_(col.__ge__(min_val), col.__le__(max_val))
-
-
-SQL_RELATIONS_TO_METHOD: Dict[str, Callable[[Column, str], Callable]] = {
-    "<": lambda col, value: col.__lt__(value),
-    "<=": lambda col, value: col.__le__(value),
-    "<>": lambda col, value: col.__ne__(value),
-    "=": lambda col, value: col.__eq__(value),
-    ">": lambda col, value: col.__gt__(value),
-    ">=": lambda col, value: col.__ge__(value),
-    "BETWEEN": handle_between_filter,
-    "IN": lambda col, value: col.in_(value.split(",")),
-    "LIKE": lambda col, value: col.like(value),
-}
+import json
+import math
+import os
+import random
+from collections import defaultdict, namedtuple
+from concurrent.futures import as_completed, ThreadPoolExecutor
+from contextlib import contextmanager, ExitStack
+from sqlalchemy import bindparam, MetaData, Table, text
+from sqlalchemy.exc import NoSuchTableError
+from typing import Any, Callable, Dict, List, Optional
+
+from pagai.errors import OperationOutcome, ServiceUnavailable
+from pagai.metrics import timed, UNKNOWN_MODEL
+from pagai.services.bulkhead import bulkheads
+from pagai.services.cache import TTLCache
+from pagai.services.catalog import (
+    catalog_diff,
+    foreign_keys_from_rows,
+    INFORMATION_SCHEMA_CATALOG_QUERY,
+    INFORMATION_SCHEMA_TABLES_CATALOG_QUERY,
+    MSSQL_CATALOG_TYPES,
+    MSSQL_FOREIGN_KEYS_QUERY,
+    MSSQL_STATS_QUERY,
+    MSSQL_TABLE_VERSIONS_QUERY,
+    MSSQL_UNIQUE_INDEXES_QUERY,
+    ORACLE_CATALOG_QUERY,
+    ORACLE_CATALOG_TYPES,
+    ORACLE_FOREIGN_KEYS_QUERY,
+    ORACLE_STATS_QUERY,
+    ORACLE_TABLE_VERSIONS_QUERY,
+    ORACLE_TABLES_CATALOG_QUERY,
+    ORACLE_UNIQUE_INDEXES_QUERY,
+    OwnerCatalog,
+    POSTGRES_CATALOG_TYPES,
+    POSTGRES_FOREIGN_KEYS_QUERY,
+    POSTGRES_STATS_QUERY,
+    POSTGRES_TABLE_VERSIONS_QUERY,
+    POSTGRES_UNIQUE_INDEXES_QUERY,
+    table_stats_from_rows,
+    table_versions_from_rows,
+    TableVersions,
+    unique_indexes_from_rows,
+)
+from pagai.services.completion import (
+    COMPLETION_CACHE_SIZE,
+    COMPLETION_CACHE_TTL,
+    COMPLETION_SAMPLE_ROWS,
+    Completions,
+    completions_statement,
+    like_prefix,
+)
+from pagai.services.dependency_graph import DependencyGraph, inferred_foreign_keys
+from pagai.services.engine_registry import credentials_key, engine_registry
+from pagai.services.fetch_tuning import fetch_options, fetch_profile
+from pagai.services.pagination import decode_cursor, paginate_rows
+from pagai.services.profiling import (
+    aggregates_statement,
+    has_repeated_values,
+    profile_kind,
+    PROFILE_CACHE_SIZE,
+    PROFILE_CACHE_TTL,
+    PROFILE_COLUMNS_PER_QUERY,
+    PROFILE_SAMPLE_ROWS,
+    PROFILE_TOP_VALUES,
+    PROFILE_WORKERS,
+    profiles_from_row,
+    STRING,
+    top_values_statement,
+)
+from pagai.services.query_planner import (
+    compiled_cache,
+    filters_params,
+    filters_shape,
+    JoinGraph,
+    keyset_params,
+    limit_statement,
+    LIMIT_PARAM,
+    paginate_statement,
+    plan_statement,
+    STATEMENT_CACHE_SIZE,
+)
+from pagai.services.query_timeout import (
+    apply_query_timeout,
+    is_query_timeout,
+    QUERY_TIMEOUT,
+    timeout_message,
+)
+from pagai.services.sampling import sample_table
+from pagai.services.search_index import SearchIndex
+from pagai.services.single_flight import single_flight
+from pagai.services.snapshot_store import snapshot_store
+
+# Filter relations used to be defined here.
+from pagai.services.query_planner import SQL_RELATIONS_TO_METHOD  # noqa: F401
+
+# Number of rows fetched at once from server-side cursors when streaming.
+STREAM_BATCH_SIZE = int(os.getenv("PAGAI_STREAM_BATCH_SIZE", 1000))
+# Number of tables previewed at the same time by a batch preview, the
+# bulkhead of the database applies on top of it.
+PREVIEW_WORKERS = int(os.getenv("PAGAI_PREVIEW_WORKERS", 4))
+# Block sampling returns a varying number of rows: sample twice as many
+# rows as requested. The sample percentage can't be lower than
+# MIN_SAMPLE_PERCENTAGE (the minimum on Oracle).
+SAMPLE_OVERSAMPLING = 2
+MIN_SAMPLE_PERCENTAGE = 0.000001
+# Entries of the schema cache read from the tables' constraints and
+# indexes, dropped when tables change.
+CONSTRAINT_KINDS = ["unique_indexes", "dependency_graph"]
+# Oracle does not accept more than 1000 expressions in a IN list.
+OWNERS_PER_QUERY = 500
+TABLES_PER_QUERY = 500
+SCHEMA_CACHE_TTL = int(os.getenv("PAGAI_SCHEMA_CACHE_TTL", 3600))
+# The schema cache is bounded by the total number of cached columns.
+SCHEMA_CACHE_MAX_COLUMNS = int(os.getenv("PAGAI_SCHEMA_CACHE_MAX_COLUMNS", 1_000_000))
+
 
 MSSQL = "MSSQL"
 ORACLE11 = "ORACLE11"
@@ -43,17 +128,22 @@ URL_SUFFIXES = {
     POSTGRES: "",
     ORACLE11: "",
     ORACLE: "",
-    # the param MARS_Connection=Yes solves the following issue:
-    # https://github.com/catherinedevlin/ipython-sql/issues/54
-    MSSQL: "?driver=ODBC+Driver+17+for+SQL+Server&MARS_Connection=Yes",
+    MSSQL: "?driver=ODBC+Driver+17+for+SQL+Server",
 }
+# the param MARS_Connection=Yes solves the following issue:
+# https://github.com/catherinedevlin/ipython-sql/issues/54
+# it can be disabled with the mars field of the fetch profile of a source.
+MARS_SUFFIX = "&MARS_Connection=Yes"
 
 
 def get_sql_url(db_model: str, sql_config: dict) -> str:
+    suffix = URL_SUFFIXES[db_model]
+    if db_model == MSSQL and fetch_profile({**sql_config, "model": db_model}).mars:
+        suffix += MARS_SUFFIX
     return (
         f"{DB_DRIVERS[db_model]}://{sql_config['login']}:{sql_config['password']}"
         f"@{sql_config['host']}:{sql_config['port']}"
-        f"/{sql_config['database']}{URL_SUFFIXES[db_model]}"
+        f"/{sql_config['database']}{suffix}"
     )
 
 
@@ -67,35 +157,213 @@ def table_exists(sql_engine, table_name):
         return False, None
 
 
+def schema_weight(schema) -> int:
+    if isinstance(schema, (OwnerCatalog, TableVersions, SearchIndex, DependencyGraph)):
+        return len(schema) + 1
+    return sum(len(columns) for columns in schema.values()) + 1
+
+
+# Model of the databases, by identity, to label the statistics of the caches.
+db_models: Dict[str, str] = {}
+
+
+def key_db_model(cache_key: tuple) -> str:
+    return db_models.get(cache_key[0], UNKNOWN_MODEL)
+
+
+# Owner schemas are shared between requests, they are keyed by
+# (database identity, owner). Owner catalogs and table statistics are stored
+# alongside them, keyed by (database identity, owner, "catalog") and
+# (database identity, owner, "stats"), as well as the table versions of the
+# last refresh (database identity, owner, "versions"), the search index of
+# the schema (database identity, owner, "search_index") and the dependency
+# graph (database identity, owner, "dependency_graph").
+schema_cache = TTLCache(
+    ttl=SCHEMA_CACHE_TTL,
+    max_weight=SCHEMA_CACHE_MAX_COLUMNS,
+    weigh=schema_weight,
+    label=key_db_model,
+)
+# Planned exploration statements, keyed by (database identity, owner, table,
+# shape of the exploration) so that they are dropped with the owner schema.
+statement_cache = TTLCache(
+    ttl=SCHEMA_CACHE_TTL, max_weight=STATEMENT_CACHE_SIZE, label=key_db_model
+)
+# Column profiles, keyed by (database identity, owner, table, column).
+profile_cache = TTLCache(ttl=PROFILE_CACHE_TTL, max_weight=PROFILE_CACHE_SIZE, label=key_db_model)
+# Completions of column values, keyed by (database identity, owner, table,
+# column, number of completions, prefix).
+completion_cache = TTLCache(
+    ttl=COMPLETION_CACHE_TTL, max_weight=COMPLETION_CACHE_SIZE, label=key_db_model
+)
+
+
+def snapshot_kind(cache_key: tuple) -> str:
+    return cache_key[2] if len(cache_key) > 2 else "schema"
+
+
+def iter_rows(result, batch_size: int):
+    while True:
+        rows = result.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+# Exploration of a table of a batch preview, given with its index in the
+# batch. error holds the OperationOutcome of the failed ones.
+Preview = namedtuple("Preview", ["index", "exploration", "column_types", "error"])
+
+
 @contextmanager
-def session_scope(explorer):
-    """Provide a scope for sqlalchemy sessions."""
-    session = sessionmaker(explorer._sql_engine)()
+def exploration_errors(query_timeout: float = QUERY_TIMEOUT):
+    """
+    Turn the errors raised while exploring a table into OperationOutcomes.
+    """
     try:
-        yield session
-    finally:
-        session.close()
+        yield
+    except (OperationOutcome, ServiceUnavailable):
+        raise
+    except Exception as e:
+        if is_query_timeout(e):
+            raise OperationOutcome(timeout_message(query_timeout))
+        raise OperationOutcome(e)
+
+
+class RowStream:
+    """
+    Iterable over the rows of an exploration. The connection holding the
+    cursor (and its query slot) is released once all the rows were consumed
+    or when the stream is closed.
+    """
+
+    def __init__(self, fields, column_types, rows, exit_stack: ExitStack):
+        self.fields = fields
+        self.column_types = column_types
+        self._rows = rows
+        self._exit_stack = exit_stack
+        self.count = 0
+
+    def __iter__(self):
+        try:
+            for row in self._rows:
+                self.count += 1
+                yield row
+        finally:
+            self.close()
+
+    def close(self):
+        self._exit_stack.close()
 
 
 class DatabaseExplorer:
-    def __init__(self, db_config: Optional[dict] = None):
+    def __init__(self, db_config: Optional[dict] = None, query_timeout: float = QUERY_TIMEOUT):
         self._db_model = db_config.get("model")
         if self._db_model not in DB_DRIVERS:
             raise OperationOutcome(f"Database type {self._db_model} is unknown")
+        # Time budget (in seconds) of each query, 0 means no timeout.
+        self.query_timeout = query_timeout
 
-        self._sql_engine = create_engine(get_sql_url(self._db_model, db_config))
-        self._metadata = MetaData(bind=self._sql_engine)
+        # Engines, and their connection pools, are shared between requests
+        # using the same credentials.
+        self._db_identity = credentials_key(db_config)
+        db_models[self._db_identity] = self._db_model
+        with timed("engine", self._db_model):
+            self._sql_engine = engine_registry.get_engine(
+                get_sql_url(self._db_model, db_config), db_config
+            )
+        self._bulkhead = bulkheads.get(self._db_identity, self._db_model)
 
-        self.db_schema = {}
+    @property
+    def db_model(self) -> str:
+        return self._db_model
 
     def check_connection_exists(self):
         if not self._sql_engine:
             raise OperationOutcome("DatabaseExplorer was not provided with any credentials.")
 
+    @contextmanager
+    def connect(self, timeout=False, **execution_options):
+        """
+        Provide a connection which reuses the compiled forms of the cached
+        exploration statements. With timeout, its queries are cancelled when
+        they exceed the query timeout.
+        Connections are only given within the concurrency limit of the
+        database (see Bulkhead).
+        """
+        with self._bulkhead.slot(), self._sql_engine.connect() as connection:
+            connection = connection.execution_options(
+                compiled_cache=compiled_cache, **execution_options
+            )
+            apply_query_timeout(connection, self.query_timeout if timeout else None)
+            yield connection
+
+    def load_cached(self, cache_key: tuple, load: Callable[[], Any]):
+        """
+        Return the value cached in the schema cache or load it. Concurrent
+        loads of the same key share a single execution.
+        """
+        value = self.get_schema_entry(cache_key)
+        if value is not None:
+            return value
+
+        def load_and_cache():
+            # The value may have been loaded by a flight which just landed.
+            value = self.get_schema_entry(cache_key)
+            if value is None:
+                value = load()
+                self.set_schema_entry(cache_key, value)
+            return value
+
+        return single_flight.do(cache_key, load_and_cache)
+
+    def get_schema_entry(self, cache_key: tuple):
+        """
+        Return an entry of the schema cache, keyed by (database identity,
+        owner[, kind]). On a cache miss, until the owner was revalidated, the
+        entry is loaded from its snapshot (if any) and the owner is
+        revalidated in the background.
+        """
+        value = schema_cache.get(cache_key)
+        if value is not None or snapshot_store is None:
+            return value
+
+        identity, owner = cache_key[:2]
+        if snapshot_store.is_revalidated((identity, owner)):
+            return None
+        value = snapshot_store.load(identity, owner, snapshot_kind(cache_key))
+        if value is not None:
+            schema_cache.set(cache_key, value)
+            snapshot_store.revalidate((identity, owner), lambda: self.revalidate_owner(owner))
+        return value
+
+    def set_schema_entry(self, cache_key: tuple, value):
+        schema_cache.set(cache_key, value)
+        if snapshot_store is not None:
+            identity, owner = cache_key[:2]
+            snapshot_store.save(identity, owner, snapshot_kind(cache_key), value)
+
+    def revalidate_owner(self, owner: str):
+        """
+        Bring the schema and the statistics of an owner, loaded from
+        snapshots, up to date with the database.
+        """
+        self.refresh_owner_schema(owner)
+
     def get_sql_alchemy_table(self, owner: str, table: str):
-        return Table(table.strip(), self._metadata, schema=owner, autoload=True)
+        """
+        Return a lightweight table built from the owner catalog.
+        We don't use reflection as it needs a round trip per table
+        and it is very slow on Oracle.
+        """
+        table = table.strip()
+        catalog = self.get_owner_catalog(owner)
+        catalog_table = catalog.find_table(table)
+        if catalog_table is None:
+            raise OperationOutcome(f"Table {table} does not exist in database")
+        return catalog.table(catalog_table)
 
-    def get_sql_alchemy_column(self, column: str, sqlalchemy_table: Table):
+    def get_sql_alchemy_column(self, column: str, sqlalchemy_table):
         """
         Return column names of a table
         """
@@ -103,84 +371,409 @@ class DatabaseExplorer:
             return sqlalchemy_table.c[column]
         except KeyError:
             # If column is not in table.c it may be because the column names
-            # are case insensitive. If so, the schema can be in upper case
-            # (what oracle considers as case insensitive) but the keys
-            # in table.c are in lower case (what sqlalchemy considers
-            # as case insensitive).
-            return sqlalchemy_table.c[column.lower()]
+            # are case insensitive: the column name can be given in lower
+            # case while the catalog holds it in upper case (what oracle
+            # considers as case insensitive).
+            for table_column in sqlalchemy_table.c:
+                if table_column.name.lower() == column.lower():
+                    return table_column
+            raise OperationOutcome(
+                f"Column {column} does not exist in table {sqlalchemy_table.name}"
+            )
 
-    def get_table_rows(self, session, owner: str, table_name: str, limit=100, filters=[]):
+    def get_table_query(
+        self,
+        owner: str,
+        table_name: str,
+        filters=[],
+        sample_percentage=None,
+        keyset=None,
+        limit=None,
+    ):
         """
-        Return content of a table with a limit
+        Return the column names of a table, the statement selecting its rows
+        and the parameters to execute it with.
+        If sample_percentage is given, rows are selected from a native block
+        sample of the table.
+        If keyset (key column names, values of the key of the last row or None
+        for the first page) is given, rows are ordered by the key and
+        selected after the given values.
+        Statements are cached by shape: filter values, key values and the
+        limit are bound parameters.
         """
-        columns_names = self.get_owner_schema(owner)[table_name]
+        # The name of the table in the catalog, whatever the requested case.
+        table_name = self.get_sql_alchemy_table(owner, table_name).name
+        catalog = self.get_owner_catalog(owner)
+        columns_names = catalog.column_names(table_name)
+        key, after_values = keyset if keyset is not None else (None, None)
 
-        table = self.get_sql_alchemy_table(owner, table_name)
-        columns = [self.get_sql_alchemy_column(col, table) for col in columns_names]
-        select = session.query(*columns)
+        params = filters_params(filters)
+        if after_values is not None:
+            params.update(keyset_params(after_values))
+        if limit is not None:
+            params[LIMIT_PARAM] = limit
 
-        # Add filtering if any
-        for filter_ in filters:
-            table = self.get_sql_alchemy_table(
-                filter_["sqlColumn"]["owner"]["name"], filter_["sqlColumn"]["table"]
+        cache_key = (
+            self._db_identity,
+            owner,
+            table_name,
+            catalog.version,
+            filters_shape(filters),
+            sample_percentage,
+            tuple(key) if key is not None else None,
+            after_values is not None,
+            limit is not None,
+        )
+        statement = statement_cache.get(cache_key)
+        if statement is None:
+            statement = self.plan_table_query(
+                owner, table_name, columns_names, filters, sample_percentage, key, after_values
             )
-            col = self.get_sql_alchemy_column(filter_["sqlColumn"]["column"], table)
-            filter_clause = SQL_RELATIONS_TO_METHOD[filter_["relation"]](col, filter_["value"])
-            select = select.filter(filter_clause)
-
-            # Apply joins
-            # TODO use fhir-river's analyzer?
-            join_tables = {}
-            for join in filter_["sqlColumn"]["joins"]:
-                # Get tables
-                left_table_owner = join["tables"][0]["owner"]["name"]
-                left_table_name = join["tables"][0]["table"]
-                left_column_name = join["tables"][0]["column"]
-                right_table_owner = join["tables"][1]["owner"]["name"]
-                right_table_name = join["tables"][1]["table"]
-                right_column_name = join["tables"][1]["column"]
-
-                left_table = join_tables.get(
-                    left_table_name, self.get_sql_alchemy_table(left_table_owner, left_table_name)
-                )
-                right_table = join_tables.get(
-                    right_table_name,
-                    self.get_sql_alchemy_table(right_table_owner, right_table_name),
-                )
-                join_tables[left_table_name] = left_table
-                join_tables[right_table_name] = right_table
+            if limit is not None:
+                statement = limit_statement(statement, mssql=self._db_model == MSSQL)
+            statement_cache.set(cache_key, statement)
+        return columns_names, statement, params
 
-                right_column = self.get_sql_alchemy_column(left_column_name, right_table)
-                left_column = self.get_sql_alchemy_column(right_column_name, left_table)
+    def plan_table_query(
+        self, owner, table_name, columns_names, filters, sample_percentage, key, after_values
+    ):
+        main_table = self.get_sql_alchemy_table(owner, table_name)
+        if sample_percentage is not None:
+            main_table = sample_table(main_table, sample_percentage)
 
-                # Add join
-                select = select.join(right_table, right_column == left_column, isouter=True)
+        graph = JoinGraph(
+            (owner, table_name), main_table, self.get_sql_alchemy_table, self.get_sql_alchemy_column
+        )
+        columns = [self.get_sql_alchemy_column(col, main_table) for col in columns_names]
+        statement = plan_statement(graph, columns, filters)
+        if key is not None:
+            statement = paginate_statement(
+                statement, [main_table.c[col] for col in key], after_values is not None
+            )
+        return statement
+
+    def get_column_types(self, owner: str, table_name: str):
+        """
+        Return the SQLAlchemy types of the columns of a table
+        """
+        table = self.get_sql_alchemy_table(owner, table_name)
+        return [col.type for col in self.get_owner_catalog(owner).columns[table.name]]
 
-        # Return as JSON serializable object
-        return {"fields": columns_names, "rows": [list(row) for row in select.limit(limit).all()]}
+    def get_sample_percentage(self, owner: str, table_name: str, limit: int):
+        """
+        Return the percentage of a table to sample to get about limit rows,
+        given its estimated number of rows. None means the whole table
+        should be read.
+        """
+        table_name = self.get_sql_alchemy_table(owner, table_name).name
+        estimated_rows = self.get_table_stats(owner).get(table_name, {}).get("rows")
+        if not estimated_rows:
+            return None
+        percentage = max(100 * limit * SAMPLE_OVERSAMPLING / estimated_rows, MIN_SAMPLE_PERCENTAGE)
+        # Rounded up to a power of 2: the sample percentage is part of the
+        # statement, a table only gets a few sampled statements.
+        percentage = 2 ** math.ceil(math.log2(percentage))
+        if percentage >= 100:
+            return None
+        return percentage
 
-    def explore(self, owner: str, table_name: str, limit: int, filters=[]):
+    def get_table_rows(
+        self,
+        owner: str,
+        table_name: str,
+        limit=100,
+        filters=[],
+        sample=False,
+        paginate=False,
+        after=None,
+    ):
+        """
+        Return content of a table with a limit.
+        If paginate is True, rows are ordered by the primary key (or a unique
+        index) and the cursor of the next page is returned as well, it can be
+        given as after to get the rows of this next page.
+        The query is planned (which may read the catalog) before a connection
+        is taken: its query slot is only held while the rows are fetched.
+        """
+        if not paginate:
+            sample_percentage = (
+                self.get_sample_percentage(owner, table_name, limit) if sample else None
+            )
+            columns_names, statement, params = self.get_table_query(
+                owner, table_name, filters, sample_percentage, limit=limit
+            )
+            return {
+                "fields": columns_names,
+                "rows": self.fetch_rows(statement, params, limit, len(columns_names)),
+            }
+
+        if sample:
+            raise OperationOutcome("Sampled explorations can't be paginated")
+        key = self.get_table_key(owner, table_name)
+        keyset = (key, decode_cursor(after, len(key)) if after else None)
+        # Fetch one more row to know whether there is a next page.
+        columns_names, statement, params = self.get_table_query(
+            owner, table_name, filters, keyset=keyset, limit=limit + 1
+        )
+        rows = self.fetch_rows(statement, params, limit + 1, len(columns_names))
+        rows, next_cursor = paginate_rows(rows, limit, [columns_names.index(col) for col in key])
+        return {"fields": columns_names, "rows": rows, "next": next_cursor}
+
+    def fetch_rows(self, statement, params, limit, columns) -> List[list]:
+        with self.connect(timeout=True, **fetch_options(limit, columns)) as connection:
+            with timed("query", self._db_model):
+                # Return as JSON serializable object
+                return [list(row) for row in connection.execute(statement, params)]
+
+    def explore(
+        self,
+        owner: str,
+        table_name: str,
+        limit: int,
+        filters=[],
+        sample=False,
+        paginate=False,
+        after=None,
+    ):
         """
         Returns the first rows of a table alongside the column names.
+        If sample is True, the rows are taken from a random sample of the
+        table instead.
+        If paginate is True, the cursor of the next page is returned as well
+        (see get_table_rows).
+        Concurrent identical explorations share a single execution.
         """
         self.check_connection_exists()
 
-        with session_scope(self) as session:
-            try:
+        def run_exploration():
+            with exploration_errors(self.query_timeout):
                 return self.get_table_rows(
-                    session=session,
                     owner=owner,
                     table_name=table_name,
                     limit=limit,
                     filters=filters,
+                    sample=sample,
+                    paginate=paginate,
+                    after=after,
+                )
+
+        flight_key = (
+            self._db_identity,
+            "explore",
+            owner,
+            table_name,
+            limit,
+            json.dumps(filters, sort_keys=True),
+            sample,
+            paginate,
+            after,
+            self.query_timeout,
+        )
+        # The exploration may wait for a query slot, then run its query.
+        flight_timeout = self.query_timeout and self.query_timeout + self._bulkhead.queue_timeout
+        return single_flight.do(flight_key, run_exploration, timeout=flight_timeout)
+
+    def preview_tables(self, previews: List[dict], filters=[]):
+        """
+        Explore several tables (dicts with owner, table and limit) on
+        PREVIEW_WORKERS threads sharing the engine of the database. Yields a
+        Preview as soon as the exploration of each table is done: the
+        failure of an exploration does not stop the other ones.
+        """
+        self.check_connection_exists()
+
+        def preview(index, owner, table_name, limit):
+            try:
+                with exploration_errors(self.query_timeout):
+                    exploration = self.explore(owner, table_name, limit=limit, filters=filters)
+                    column_types = self.get_column_types(owner, table_name)
+                return Preview(index, exploration, column_types, None)
+            except (OperationOutcome, ServiceUnavailable) as e:
+                return Preview(index, None, None, e)
+
+        executor = ThreadPoolExecutor(max_workers=max(1, min(PREVIEW_WORKERS, len(previews))))
+        futures = [
+            executor.submit(preview, index, entry["owner"], entry["table"], entry["limit"])
+            for index, entry in enumerate(previews)
+        ]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # The previews which did not start yet are dropped when the
+            # consumer stops early (eg: the client went away).
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def stream(self, owner: str, table_name: str, limit: int, filters=[], sample=False):
+        """
+        Returns the first rows of a table as a RowStream: rows are fetched
+        from a server-side cursor while they are consumed.
+        """
+        self.check_connection_exists()
+
+        # stream_results makes SQLAlchemy use a server-side cursor, rows are
+        # fetched by batches.
+        exit_stack = ExitStack()
+        try:
+            with exploration_errors(self.query_timeout):
+                sample_percentage = (
+                    self.get_sample_percentage(owner, table_name, limit) if sample else None
+                )
+                columns_names, statement, params = self.get_table_query(
+                    owner, table_name, filters, sample_percentage, limit=limit
                 )
-            except InvalidRequestError as e:
-                if "requested table(s) not available" in str(e):
-                    raise OperationOutcome(f"Table {table_name} does not exist in database")
-                else:
-                    raise OperationOutcome(e)
-            except Exception as e:
-                raise OperationOutcome(e)
+                connection = exit_stack.enter_context(
+                    self.connect(
+                        timeout=True,
+                        stream_results=True,
+                        **fetch_options(limit, len(columns_names)),
+                    )
+                )
+                with timed("query", self._db_model):
+                    result = connection.execute(statement, params)
+                rows = iter_rows(result, STREAM_BATCH_SIZE)
+        except Exception:
+            exit_stack.close()
+            raise
+        return RowStream(columns_names, self.get_column_types(owner, table_name), rows, exit_stack)
+
+    def profile_columns(self, owner: str, table_name: str, column_names: List[str] = None):
+        """
+        Returns the profiles (see pagai.services.profiling) of the columns of
+        a table, or of all its columns, computed on a sample of the table.
+        """
+        table_name = self.get_sql_alchemy_table(owner, table_name).name
+        catalog = self.get_owner_catalog(owner)
+        columns = {column.name: column for column in catalog.columns[table_name]}
+        column_names = column_names or list(columns)
+        for name in column_names:
+            if name not in columns:
+                raise OperationOutcome(f"Column {name} does not exist in table {table_name}")
+
+        profiles = {}
+        for name in column_names:
+            profile = profile_cache.get((self._db_identity, owner, table_name, name))
+            if profile is not None:
+                profiles[name] = profile
+        missing = [columns[name] for name in column_names if name not in profiles]
+        if missing:
+            flight_key = (
+                self._db_identity,
+                "profile",
+                owner,
+                table_name,
+                tuple(column.name for column in missing),
+            )
+            profiles.update(
+                single_flight.do(
+                    flight_key, lambda: self.read_column_profiles(owner, table_name, missing)
+                )
+            )
+        return {name: profiles[name] for name in column_names}
+
+    def read_column_profiles(self, owner: str, table_name: str, columns: list):
+        """
+        Compute and cache the profiles of columns of a table: their aggregates
+        are computed by chunks of columns, then the top values of the columns
+        with repeated values column by column, the queries of each step
+        running concurrently. The queries sample the table with the same
+        seed: they read the same blocks unless the table changes meanwhile.
+        """
+        sample_percentage = self.get_sample_percentage(owner, table_name, PROFILE_SAMPLE_ROWS)
+        source = self.get_sql_alchemy_table(owner, table_name)
+        if sample_percentage is not None:
+            # All the queries read the same sample.
+            source = sample_table(source, sample_percentage, seed=random.randrange(2 ** 31))
+
+        chunks = [
+            columns[i : i + PROFILE_COLUMNS_PER_QUERY]
+            for i in range(0, len(columns), PROFILE_COLUMNS_PER_QUERY)
+        ]
+
+        def read_aggregates(chunk):
+            statement = aggregates_statement(source, chunk, PROFILE_SAMPLE_ROWS)
+            with self.connect(timeout=True) as connection, timed("query", self._db_model):
+                return profiles_from_row(connection.execute(statement).first(), chunk)
+
+        def read_top_values(name):
+            statement = top_values_statement(source, name, PROFILE_SAMPLE_ROWS, PROFILE_TOP_VALUES)
+            with self.connect(timeout=True) as connection, timed("query", self._db_model):
+                rows = connection.execute(statement).fetchall()
+            return [{"value": row["value"], "count": row["frequency"]} for row in rows]
+
+        with exploration_errors(self.query_timeout), ThreadPoolExecutor(
+            max_workers=PROFILE_WORKERS
+        ) as executor:
+            profiles = {}
+            for chunk_profiles in executor.map(read_aggregates, chunks):
+                profiles.update(chunk_profiles)
+            for profile in profiles.values():
+                profile["top_values"] = []
+            repeated = [name for name, profile in profiles.items() if has_repeated_values(profile)]
+            for name, values in zip(repeated, executor.map(read_top_values, repeated)):
+                profiles[name]["top_values"] = values
+
+        for name, profile in profiles.items():
+            profile_cache.set((self._db_identity, owner, table_name, name), profile)
+        return profiles
+
+    def complete_column(
+        self, owner: str, table_name: str, column_name: str, prefix: str, top: int = 10
+    ) -> List[dict]:
+        """
+        Returns the most frequent values of a text column which start with
+        prefix (at most top of them) with their number of occurrences.
+        """
+        table = self.get_sql_alchemy_table(owner, table_name)
+        table_name = table.name
+        catalog = self.get_owner_catalog(owner)
+        column = next(
+            (column for column in catalog.columns[table_name] if column.name == column_name), None
+        )
+        if column is None:
+            raise OperationOutcome(f"Column {column_name} does not exist in table {table_name}")
+        if profile_kind(column.type) != STRING:
+            raise OperationOutcome(f"Column {column_name} is not a text column")
+
+        cache_key = (self._db_identity, owner, table_name, column_name, top)
+        completions = self.get_cached_completions(cache_key, prefix)
+        if completions is None:
+            statement_key = (
+                self._db_identity,
+                owner,
+                table_name,
+                catalog.version,
+                "completions",
+                column_name,
+                top,
+            )
+            statement = statement_cache.get(statement_key)
+            if statement is None:
+                statement = completions_statement(table, column_name, COMPLETION_SAMPLE_ROWS, top)
+                statement_cache.set(statement_key, statement)
+            with exploration_errors(self.query_timeout), self.connect(timeout=True) as connection:
+                with timed("query", self._db_model):
+                    rows = connection.execute(statement, prefix=like_prefix(prefix)).fetchall()
+            completions = Completions.from_rows(rows, COMPLETION_SAMPLE_ROWS, top)
+            completion_cache.set(cache_key + (prefix,), completions)
+        return completions.values
+
+    def get_cached_completions(self, cache_key: tuple, prefix: str) -> Optional[Completions]:
+        completions = completion_cache.get(cache_key + (prefix,))
+        # LIKE follows the collation of the column on MSSQL, which usually
+        # ignores the case: completions can't be narrowed with startswith.
+        if completions is not None or self._db_model == MSSQL:
+            return completions
+        # The completions of a shorter prefix may hold all the values.
+        for length in range(len(prefix) - 1, -1, -1):
+            shorter = completion_cache.get(cache_key + (prefix[:length],))
+            if shorter is not None and shorter.complete:
+                completions = shorter.narrowed(prefix)
+                completion_cache.set(cache_key + (prefix,), completions)
+                return completions
+        return None
 
     def get_owners(self):
         """
@@ -193,35 +786,344 @@ class DatabaseExplorer:
         else:  # POSTGRES AND MSSQL
             sql_query = text("select schema_name as owners from information_schema.schemata;")
 
-        with self._sql_engine.connect() as connection:
+        with self.connect() as connection, timed("catalog", self._db_model):
             result = connection.execute(sql_query).fetchall()
         return [r["owners"] for r in result]
 
     def get_owner_schema(self, owner: str):
         """
         Returns the database schema for one owner of a database,
-        as required by Pyrog.
+        as required by Pyrog. It is derived from the catalog of the owner,
+        which explorations read anyway.
         """
-        if self.db_schema.get(owner):
-            return self.db_schema[owner]
+        schema = self.get_schema_entry((self._db_identity, owner))
+        if schema is None:
+            catalog = self.get_owner_catalog(owner)
+            schema = {table: catalog.column_names(table) for table in catalog.columns}
+            self.set_schema_entry((self._db_identity, owner), schema)
+        return schema
+
+    def get_owner_schemas(self, owners: List[str]):
+        """
+        Returns the database schemas of several owners, the ones which are not
+        cached are read with a single catalog query (per chunk of owners).
+        """
+        schemas = self.get_cached_schemas(owners)
+        missing_owners = [owner for owner in owners if owner not in schemas]
+        if not missing_owners:
+            return schemas
+
+        # Concurrent reads of the same owners share a single catalog query.
+        flight_key = (self._db_identity, "schemas", tuple(sorted(set(missing_owners))))
+        schemas.update(
+            single_flight.do(flight_key, lambda: self.read_owner_schemas(missing_owners))
+        )
+        return schemas
+
+    def get_cached_schemas(self, owners: List[str]):
+        schemas = {}
+        for owner in owners:
+            cached_schema = self.get_schema_entry((self._db_identity, owner))
+            if cached_schema is not None:
+                schemas[owner] = cached_schema
+        return schemas
+
+    def read_owner_schemas(self, owners: List[str]):
+        """
+        Read the schemas of owners from the database and cache them.
+        """
+        # Some schemas may have been read by a flight which just landed.
+        schemas = self.get_cached_schemas(owners)
+        missing_owners = [owner for owner in owners if owner not in schemas]
+        if not missing_owners:
+            return schemas
 
         self.check_connection_exists()
-        schema = defaultdict(list)
 
         if self._db_model in [ORACLE, ORACLE11]:
             sql_query = text(
-                f"select table_name, column_name from all_tab_columns where owner='{owner}'"
+                "select owner, table_name, column_name from all_tab_columns "
+                "where owner in :owners"
             )
         else:  # POSTGRES AND MSSQL
             sql_query = text(
-                f"select table_name, column_name from information_schema.columns "
-                f"where table_schema='{owner}';"
+                "select table_schema as owner, table_name, column_name "
+                "from information_schema.columns where table_schema in :owners"
             )
+        sql_query = sql_query.bindparams(bindparam("owners", expanding=True))
 
-        with self._sql_engine.connect() as connection:
-            result = connection.execute(sql_query).fetchall()
-            for row in result:
-                schema[row["table_name"]].append(row["column_name"])
+        missing_schemas = {owner: defaultdict(list) for owner in missing_owners}
+        # The catalog may return the owners in another case than the
+        # requested one (eg: case insensitive collations on MSSQL).
+        requested_owners = {owner.lower(): owner for owner in missing_owners}
+        with self.connect() as connection, timed("catalog", self._db_model):
+            for i in range(0, len(missing_owners), OWNERS_PER_QUERY):
+                result = connection.execute(
+                    sql_query, owners=missing_owners[i : i + OWNERS_PER_QUERY]
+                )
+                for row in result:
+                    owner = row["owner"]
+                    if owner not in missing_schemas:
+                        owner = requested_owners.get(owner.lower(), owner)
+                    schema = missing_schemas.setdefault(owner, defaultdict(list))
+                    schema[row["table_name"]].append(row["column_name"])
 
-        self.db_schema[owner] = schema
-        return schema
+        for owner, schema in missing_schemas.items():
+            # Don't share a defaultdict between requests: a lookup of an
+            # unknown table would insert it in the cached schema.
+            schemas[owner] = dict(schema)
+            self.set_schema_entry((self._db_identity, owner), schemas[owner])
+        return schemas
+
+    def get_search_index(self, owner: str) -> SearchIndex:
+        """
+        Returns the search index of the schema of an owner, it is built again
+        when the cached schema was replaced.
+        """
+        schema = self.get_owner_schema(owner)
+        cache_key = (self._db_identity, owner, "search_index")
+        index = schema_cache.get(cache_key)
+        if index is None or index.schema is not schema:
+            index = single_flight.do(cache_key, lambda: SearchIndex(schema))
+            schema_cache.set(cache_key, index)
+        return index
+
+    def search_owner_schema(self, owner: str, query: str, limit=20, table=None):
+        """
+        Returns the tables and columns of an owner whose names best match
+        query (with fuzzy matching), or only the columns of a table.
+        """
+        return self.get_search_index(owner).search(query, limit, table)
+
+    def get_owner_catalog(self, owner: str) -> OwnerCatalog:
+        """
+        Returns the columns of all the tables of an owner with their type,
+        nullability and whether they belong to the primary key.
+        """
+        return self.load_cached(
+            (self._db_identity, owner, "catalog"), lambda: self.read_owner_catalog(owner)
+        )
+
+    def get_catalog_types(self) -> list:
+        if self._db_model in [ORACLE, ORACLE11]:
+            return ORACLE_CATALOG_TYPES
+        if self._db_model == MSSQL:
+            return MSSQL_CATALOG_TYPES
+        return POSTGRES_CATALOG_TYPES
+
+    def read_owner_catalog(self, owner: str) -> OwnerCatalog:
+        self.check_connection_exists()
+
+        if self._db_model in [ORACLE, ORACLE11]:
+            sql_query = ORACLE_CATALOG_QUERY
+        else:  # POSTGRES AND MSSQL
+            sql_query = INFORMATION_SCHEMA_CATALOG_QUERY
+
+        with self.connect() as connection, timed("catalog", self._db_model):
+            result = connection.execute(sql_query, owner=owner).fetchall()
+        return OwnerCatalog.from_rows(owner, result, self.get_catalog_types())
+
+    def read_tables_catalog(self, owner: str, table_names: List[str]) -> OwnerCatalog:
+        """
+        Read the columns of some tables of an owner only.
+        """
+        if not table_names:
+            return OwnerCatalog(owner, {})
+        if self._db_model in [ORACLE, ORACLE11]:
+            sql_query = ORACLE_TABLES_CATALOG_QUERY
+        else:  # POSTGRES AND MSSQL
+            sql_query = INFORMATION_SCHEMA_TABLES_CATALOG_QUERY
+
+        rows = []
+        with self.connect() as connection, timed("catalog", self._db_model):
+            for i in range(0, len(table_names), TABLES_PER_QUERY):
+                rows += connection.execute(
+                    sql_query, owner=owner, tables=table_names[i : i + TABLES_PER_QUERY]
+                ).fetchall()
+        return OwnerCatalog.from_rows(owner, rows, self.get_catalog_types())
+
+    def read_table_versions(self, owner: str) -> TableVersions:
+        if self._db_model in [ORACLE, ORACLE11]:
+            sql_query = ORACLE_TABLE_VERSIONS_QUERY
+        elif self._db_model == MSSQL:
+            sql_query = MSSQL_TABLE_VERSIONS_QUERY
+        else:  # POSTGRES
+            sql_query = POSTGRES_TABLE_VERSIONS_QUERY
+
+        with self.connect() as connection, timed("catalog", self._db_model):
+            result = connection.execute(sql_query, owner=owner).fetchall()
+        return table_versions_from_rows(result)
+
+    def refresh_owner_schema(self, owner: str) -> dict:
+        """
+        Update the cached schema of an owner with the tables whose definition
+        changed since the last refresh and return the differences (see
+        catalog_diff). The first refresh of an owner reads all its tables.
+        The statistics of the tables (used to sample them) are read again.
+        """
+        return single_flight.do(
+            (self._db_identity, owner, "refresh"), lambda: self.read_owner_changes(owner)
+        )
+
+    def read_owner_changes(self, owner: str) -> dict:
+        self.check_connection_exists()
+
+        # Versions are read first: a table altered while its columns are read
+        # will be read again on next refresh.
+        versions = self.read_table_versions(owner)
+        previous_versions = self.get_schema_entry((self._db_identity, owner, "versions"))
+        previous_catalog = self.get_schema_entry((self._db_identity, owner, "catalog"))
+        if previous_versions is None or previous_catalog is None:
+            catalog = self.read_owner_catalog(owner)
+        else:
+            changed_tables = [
+                table
+                for table, version in versions.items()
+                if previous_versions.get(table) != version
+            ]
+            changed_catalog = self.read_tables_catalog(owner, changed_tables)
+            # Tables dropped since the versions were read have no columns.
+            dropped_tables = [table for table in changed_tables if table not in changed_catalog]
+            removed_tables = [
+                table
+                for table in previous_catalog.columns
+                if table not in versions or table in dropped_tables
+            ]
+            catalog = previous_catalog.updated(changed_catalog.columns, removed_tables)
+
+        diff = catalog_diff(previous_catalog or OwnerCatalog(owner, {}), catalog)
+        if diff["added"] or diff["removed"] or diff["modified"]:
+            statement_cache.invalidate_prefix((self._db_identity, owner))
+            profile_cache.invalidate_prefix((self._db_identity, owner))
+            completion_cache.invalidate_prefix((self._db_identity, owner))
+        if versions != previous_versions:
+            # Constraints may have changed without the columns.
+            for kind in CONSTRAINT_KINDS:
+                schema_cache.invalidate((self._db_identity, owner, kind))
+                if snapshot_store is not None:
+                    snapshot_store.delete(self._db_identity, owner, kind)
+        self.set_schema_entry((self._db_identity, owner, "catalog"), catalog)
+        self.set_schema_entry(
+            (self._db_identity, owner),
+            {table: catalog.column_names(table) for table in catalog.columns},
+        )
+        self.set_schema_entry((self._db_identity, owner, "versions"), versions)
+        # Row counts change without the definition of the tables.
+        self.set_schema_entry((self._db_identity, owner, "stats"), self.read_table_stats(owner))
+        return diff
+
+    def get_table_stats(self, owner: str):
+        """
+        Returns the estimated number of rows and on-disk size (in bytes) of
+        all the tables of an owner, as found in the catalog statistics.
+        The estimates are None when the database has no statistics.
+        """
+        return self.load_cached(
+            (self._db_identity, owner, "stats"), lambda: self.read_table_stats(owner)
+        )
+
+    def read_table_stats(self, owner: str):
+        self.check_connection_exists()
+
+        if self._db_model in [ORACLE, ORACLE11]:
+            sql_query = ORACLE_STATS_QUERY
+        elif self._db_model == MSSQL:
+            sql_query = MSSQL_STATS_QUERY
+        else:  # POSTGRES
+            sql_query = POSTGRES_STATS_QUERY
+
+        with self.connect() as connection, timed("catalog", self._db_model):
+            result = connection.execute(sql_query, owner=owner).fetchall()
+        return table_stats_from_rows(result)
+
+    def get_unique_indexes(self, owner: str):
+        """
+        Returns the columns of the unique indexes of the tables of an owner.
+        """
+        return self.load_cached(
+            (self._db_identity, owner, "unique_indexes"), lambda: self.read_unique_indexes(owner)
+        )
+
+    def read_unique_indexes(self, owner: str):
+        self.check_connection_exists()
+
+        if self._db_model in [ORACLE, ORACLE11]:
+            sql_query = ORACLE_UNIQUE_INDEXES_QUERY
+        elif self._db_model == MSSQL:
+            sql_query = MSSQL_UNIQUE_INDEXES_QUERY
+        else:  # POSTGRES
+            sql_query = POSTGRES_UNIQUE_INDEXES_QUERY
+
+        with self.connect() as connection, timed("catalog", self._db_model):
+            result = connection.execute(sql_query, owner=owner).fetchall()
+        return unique_indexes_from_rows(result)
+
+    def get_dependency_graph(self, owner: str) -> DependencyGraph:
+        """
+        Returns the graph of the foreign keys, and of the inferred links,
+        between the tables of an owner.
+        """
+        return self.load_cached(
+            (self._db_identity, owner, "dependency_graph"),
+            lambda: self.read_dependency_graph(owner),
+        )
+
+    def read_dependency_graph(self, owner: str) -> DependencyGraph:
+        self.check_connection_exists()
+
+        if self._db_model in [ORACLE, ORACLE11]:
+            sql_query = ORACLE_FOREIGN_KEYS_QUERY
+        elif self._db_model == MSSQL:
+            sql_query = MSSQL_FOREIGN_KEYS_QUERY
+        else:  # POSTGRES
+            sql_query = POSTGRES_FOREIGN_KEYS_QUERY
+
+        with self.connect() as connection, timed("catalog", self._db_model):
+            result = connection.execute(sql_query, owner=owner).fetchall()
+        foreign_keys = foreign_keys_from_rows(result)
+        inferred = inferred_foreign_keys(self.get_owner_catalog(owner), foreign_keys)
+        return DependencyGraph(foreign_keys + inferred)
+
+    def get_join_paths(
+        self, owner: str, source: str, target: str, inferred=False, max_paths=10
+    ) -> List[list]:
+        """
+        Returns the shortest join paths between two tables of an owner.
+        """
+        source = self.get_sql_alchemy_table(owner, source).name
+        target = self.get_sql_alchemy_table(owner, target).name
+        return self.get_dependency_graph(owner).join_paths(source, target, inferred, max_paths)
+
+    def get_table_key(self, owner: str, table_name: str) -> List[str]:
+        """
+        Returns the columns identifying the rows of a table: its primary key
+        or else its smallest unique index on non nullable columns.
+        """
+        table_name = self.get_sql_alchemy_table(owner, table_name).name
+        catalog = self.get_owner_catalog(owner)
+        primary_key = catalog.primary_key(table_name)
+        if primary_key:
+            return primary_key
+
+        candidate_keys = [
+            columns
+            for columns in self.get_unique_indexes(owner).get(table_name, [])
+            if catalog.not_nullable(table_name, columns)
+        ]
+        if not candidate_keys:
+            raise OperationOutcome(
+                f"Table {table_name} has no primary key nor unique index to paginate on"
+            )
+        return min(candidate_keys, key=len)
+
+    def invalidate_owner_schema(self, owner: str) -> int:
+        """
+        Drops the cached schema of an owner, it will be read again from
+        the database on next access.
+        """
+        statement_cache.invalidate_prefix((self._db_identity, owner))
+        profile_cache.invalidate_prefix((self._db_identity, owner))
+        completion_cache.invalidate_prefix((self._db_identity, owner))
+        if snapshot_store is not None:
+            snapshot_store.delete(self._db_identity, owner)
+        return schema_cache.invalidate_prefix((self._db_identity, owner))
@@ -0,0 +1,182 @@
+"""
+Graph of the joins between the tables of an owner: their foreign keys, and
+optionally links inferred from column names (a patient_id column of the
+type of the id primary key of the patients table).
+"""
+from typing import Dict, List
+
+from sqlalchemy import types
+
+from pagai.services.catalog import ForeignKey, OwnerCatalog
+
+# Number of memoized join paths per graph.
+MAX_MEMOIZED_PATHS = 10000
+
+
+def singular(name: str) -> str:
+    if name.endswith("ies"):
+        return name[:-3] + "y"
+    if name.endswith("s") and not name.endswith("ss"):
+        return name[:-1]
+    return name
+
+
+def type_family(column_type) -> type:
+    if isinstance(column_type, (types.Integer, types.Numeric)):
+        return types.Numeric
+    if isinstance(column_type, types.String):
+        return types.String
+    return type(column_type)
+
+
+def inferred_foreign_keys(catalog: OwnerCatalog, foreign_keys: List[ForeignKey]) -> list:
+    """
+    Links from the columns named after a table and its single column
+    primary key (patient_id, patients_id or patientid for the id of the
+    patients table) to this primary key, when their types are alike.
+    Columns which already are foreign keys are skipped.
+    """
+    # lower case column name -> (table, primary key column)
+    referenced: Dict[str, tuple] = {}
+    for table, columns in catalog.columns.items():
+        primary_key = [column for column in columns if column.primary_key]
+        if len(primary_key) != 1:
+            continue
+        for prefix in {table.lower(), singular(table.lower())}:
+            for name in [f"{prefix}_{primary_key[0].name}", f"{prefix}{primary_key[0].name}"]:
+                referenced.setdefault(name.lower(), (table, primary_key[0]))
+
+    linked = {(fk.table, fk.columns[0]) for fk in foreign_keys if len(fk.columns) == 1}
+    inferred = []
+    for table, columns in catalog.columns.items():
+        for column in columns:
+            target = referenced.get(column.name.lower())
+            if target is None or target[0] == table or (table, column.name) in linked:
+                continue
+            referenced_table, referenced_column = target
+            if type_family(column.type) != type_family(referenced_column.type):
+                continue
+            inferred.append(
+                ForeignKey(table, (column.name,), referenced_table, (referenced_column.name,), True)
+            )
+    return inferred
+
+
+class DependencyGraph:
+    """
+    Adjacency lists of the tables (by id) linked by foreign keys, which are
+    walked in both directions to find join paths.
+    """
+
+    def __init__(self, foreign_keys: List[ForeignKey]):
+        self.edges = foreign_keys
+        self.tables: List[str] = []
+        self.table_ids: Dict[str, int] = {}
+        # table id -> ids of the edges of the table
+        self.adjacency: List[List[int]] = []
+        for edge_id, foreign_key in enumerate(foreign_keys):
+            tables = {foreign_key.table, foreign_key.referenced_table}
+            for table_id in [self.table_id(table) for table in tables]:
+                self.adjacency[table_id].append(edge_id)
+        self._paths: Dict[tuple, list] = {}
+
+    def __len__(self):
+        return len(self.edges)
+
+    def __getstate__(self):
+        # Memoized paths are not worth persisting.
+        return {"edges": self.edges}
+
+    def __setstate__(self, state):
+        self.__init__(state["edges"])
+
+    def table_id(self, table: str) -> int:
+        if table not in self.table_ids:
+            self.table_ids[table] = len(self.tables)
+            self.tables.append(table)
+            self.adjacency.append([])
+        return self.table_ids[table]
+
+    def foreign_keys(self, inferred=False) -> List[dict]:
+        return [edge._asdict() for edge in self.edges if inferred or not edge.inferred]
+
+    def join_paths(self, source: str, target: str, inferred=False, max_paths=10) -> List[list]:
+        """
+        Return the shortest join paths (at most max_paths of them) from the
+        source table to the target table, each one as a list of joins.
+        With inferred, inferred links may be part of the paths.
+        """
+        key = (source, target, inferred, max_paths)
+        paths = self._paths.get(key)
+        if paths is None:
+            paths = self.shortest_paths(source, target, inferred, max_paths)
+            if len(self._paths) >= MAX_MEMOIZED_PATHS:
+                self._paths.clear()
+            self._paths[key] = paths
+        return paths
+
+    def shortest_paths(self, source: str, target: str, inferred: bool, max_paths: int):
+        if source == target:
+            return [[]]
+        if source not in self.table_ids or target not in self.table_ids:
+            return []
+        source_id, target_id = self.table_ids[source], self.table_ids[target]
+
+        parents = self._shortest_parents(source_id, target_id, inferred)
+        if target_id not in parents:
+            return []
+        paths = []
+        self._walk_paths(parents, source_id, target_id, [], paths, max_paths)
+        return paths
+
+    def _shortest_parents(self, source_id: int, target_id: int, inferred: bool) -> dict:
+        """
+        Breadth-first search keeping all the shortest ways to each table:
+        table id -> [(previous table id, edge id)]
+        """
+        parents = {source_id: []}
+        frontier = [source_id]
+        while frontier and target_id not in parents:
+            reached = {}
+            for table_id in frontier:
+                for edge_id in self.adjacency[table_id]:
+                    edge = self.edges[edge_id]
+                    if edge.inferred and not inferred:
+                        continue
+                    other_id = self.table_ids[self.other_table(edge, self.tables[table_id])]
+                    if other_id not in parents:
+                        reached.setdefault(other_id, []).append((table_id, edge_id))
+            parents.update(reached)
+            frontier = list(reached)
+        return parents
+
+    def _walk_paths(self, parents, source_id, table_id, joins, paths, max_paths):
+        """
+        Add the paths from the source to table_id, followed by joins, to
+        paths (up to max_paths of them).
+        """
+        if len(paths) >= max_paths:
+            return
+        if table_id == source_id:
+            paths.append(joins)
+            return
+        for previous_id, edge_id in parents[table_id]:
+            joins_from_previous = [self.join(edge_id, self.tables[previous_id])] + joins
+            self._walk_paths(parents, source_id, previous_id, joins_from_previous, paths, max_paths)
+
+    def other_table(self, edge: ForeignKey, table: str) -> str:
+        return edge.referenced_table if edge.table == table else edge.table
+
+    def join(self, edge_id: int, from_table: str) -> dict:
+        edge = self.edges[edge_id]
+        if edge.table == from_table:
+            columns, joined_columns = edge.columns, edge.referenced_columns
+        else:
+            columns, joined_columns = edge.referenced_columns, edge.columns
+        return {
+            "table": from_table,
+            "columns": list(columns),
+            "joined_table": self.other_table(edge, from_table),
+            "joined_columns": list(joined_columns),
+            "inferred": edge.inferred,
+        }
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+from pagai.services.fetch_tuning import fetch_profile, tune_fetches
+
+POOL_SIZE = int(os.getenv("PAGAI_POOL_SIZE", 5))
+POOL_MAX_OVERFLOW = int(os.getenv("PAGAI_POOL_MAX_OVERFLOW", 10))
+# Connections older than this (in seconds) are recycled on checkout, which
+# avoids handing out connections that were closed by a firewall or the db.
+POOL_RECYCLE = int(os.getenv("PAGAI_POOL_RECYCLE", 1800))
+ENGINE_IDLE_TIMEOUT = int(os.getenv("PAGAI_ENGINE_IDLE_TIMEOUT", 600))
+MAX_ENGINES = int(os.getenv("PAGAI_MAX_ENGINES", 20))
+
+CREDENTIALS_KEYS = ["model", "host", "port", "database", "login", "password"]
+
+
+def credentials_key(db_config: dict) -> str:
+    """
+    Hash the credentials so that they can be used as a dict key
+    without keeping the password around in clear text.
+    """
+    values = "\x1f".join(str(db_config.get(key)) for key in CREDENTIALS_KEYS)
+    return hashlib.sha256(values.encode("utf-8")).hexdigest()
+
+
+class EngineRegistry:
+    """
+    Process-wide registry of SQLAlchemy engines (and thus of connection pools)
+    keyed by database credentials.
+    Engines which were not used for more than idle_timeout seconds are
+    disposed, as well as the least recently used ones when there are more
+    than max_engines of them.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = POOL_SIZE,
+        max_overflow: int = POOL_MAX_OVERFLOW,
+        pool_recycle: int = POOL_RECYCLE,
+        idle_timeout: int = ENGINE_IDLE_TIMEOUT,
+        max_engines: int = MAX_ENGINES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_recycle = pool_recycle
+        self.idle_timeout = idle_timeout
+        self.max_engines = max_engines
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        # key -> (engine, last time it was used, database model)
+        self._engines: Dict[str, list] = OrderedDict()
+
+    def get_engine(self, url: str, db_config: dict) -> Engine:
+        key = credentials_key(db_config)
+        now = self._clock()
+        with self._lock:
+            expired = self._pop_expired(now)
+            if key in self._engines:
+                self._engines.move_to_end(key)
+                entry = self._engines[key]
+                entry[1] = now
+                engine = entry[0]
+            else:
+                engine = self._create_engine(url, db_config)
+                self._engines[key] = [engine, now, db_config.get("model")]
+                while len(self._engines) > self.max_engines:
+                    _, (lru_engine, _, _) = self._engines.popitem(last=False)
+                    expired.append(lru_engine)
+
+        # Disposing closes the idle connections of the pool, we don't need to
+        # hold the lock while doing it.
+        for expired_engine in expired:
+            expired_engine.dispose()
+        return engine
+
+    def dispose_all(self):
+        with self._lock:
+            engines = [engine for engine, _, _ in self._engines.values()]
+            self._engines.clear()
+        for engine in engines:
+            engine.dispose()
+
+    def stats(self) -> list:
+        """
+        Return the state of the connection pool of each engine.
+        """
+        with self._lock:
+            entries = [(engine, model) for engine, _, model in self._engines.values()]
+        return [
+            {
+                "model": model,
+                "size": engine.pool.size(),
+                "checked_in": engine.pool.checkedin(),
+                "checked_out": engine.pool.checkedout(),
+                "overflow": engine.pool.overflow(),
+            }
+            for engine, model in entries
+        ]
+
+    def dialect_models(self) -> dict:
+        """
+        Return the database model of the dialect of each engine.
+        """
+        with self._lock:
+            return {engine.dialect: model for engine, _, model in self._engines.values()}
+
+    def __len__(self):
+        return len(self._engines)
+
+    def __contains__(self, db_config: dict):
+        return credentials_key(db_config) in self._engines
+
+    def _create_engine(self, url: str, db_config: dict) -> Engine:
+        engine = create_engine(
+            url,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_recycle=self.pool_recycle,
+            # Test connections with a lightweight ping when they are checked
+            # out so that stale connections are transparently replaced.
+            pool_pre_ping=True,
+        )
+        tune_fetches(engine, fetch_profile(db_config))
+        return engine
+
+    def _pop_expired(self, now: float):
+        expired = []
+        # Engines are sorted from the least to the most recently used.
+        for key, (engine, last_used, _) in list(self._engines.items()):
+            if now - last_used < self.idle_timeout:
+                break
+            del self._engines[key]
+            expired.append(engine)
+        return expired
+
+
+engine_registry = EngineRegistry()
@@ -0,0 +1,108 @@
+"""
+Number of rows fetched per round trip by the drivers, which create_engine
+leaves to their defaults (50 rows for cx_Oracle, a buffer growing from a
+single row for server-side cursors):
+- arraysize and prefetchrows of cx_Oracle cursors,
+- itersize of psycopg2 server-side cursors (and the row buffer of the
+  SQLAlchemy result reading them),
+- arraysize of pyodbc cursors.
+Explorations give their limit and their number of columns as execution
+options (see fetch_options): the rows of a query are then fetched in as few
+round trips as possible, within the bounds of the fetch profile of the
+database.
+"""
+import json
+import os
+from collections import namedtuple
+from typing import Optional
+
+from sqlalchemy import event
+
+# Fetch profiles:
+# - max_rows: maximum number of rows fetched per round trip,
+# - max_values: maximum number of values (rows x columns) fetched per round
+#   trip, which bounds the memory of the fetch buffers of wide tables,
+# - default_rows: number of rows fetched per round trip by the queries
+#   without fetch options (eg: catalog queries), None keeps the default of
+#   the driver,
+# - mars: whether MARS is enabled on MSSQL connections.
+FetchProfile = namedtuple("FetchProfile", ["max_rows", "max_values", "default_rows", "mars"])
+
+DEFAULT_FETCH_PROFILES = {
+    "ORACLE": FetchProfile(5000, 100_000, None, False),
+    "ORACLE11": FetchProfile(5000, 100_000, None, False),
+    "POSTGRES": FetchProfile(10000, 200_000, None, False),
+    "MSSQL": FetchProfile(10000, 200_000, None, True),
+}
+# Overrides of the profiles, given per database model and per source
+# (host:port/database) as JSON, eg: {"ORACLE": {"max_rows": 1000},
+# "db.example.com:1433/emr": {"mars": false}}
+FETCH_PROFILES = json.loads(os.getenv("PAGAI_FETCH_PROFILES", "{}"))
+
+FETCH_ROWS = "pagai_fetch_rows"
+FETCH_COLUMNS = "pagai_fetch_columns"
+
+
+def source_name(db_config: dict) -> str:
+    return f"{db_config.get('host')}:{db_config.get('port')}/{db_config.get('database')}"
+
+
+def fetch_profile(db_config: dict) -> FetchProfile:
+    """
+    Return the fetch profile of a database: the default one of its model
+    updated by the overrides of its model and of the source.
+    """
+    model = db_config.get("model")
+    profile = DEFAULT_FETCH_PROFILES.get(model, DEFAULT_FETCH_PROFILES["POSTGRES"])
+    for key in [model, source_name(db_config)]:
+        profile = profile._replace(**FETCH_PROFILES.get(key, {}))
+    return profile
+
+
+def fetch_options(limit: int, columns: int) -> dict:
+    """
+    Execution options of a query returning at most limit rows of columns
+    values.
+    """
+    return {FETCH_ROWS: limit, FETCH_COLUMNS: columns}
+
+
+def fetch_size(profile: FetchProfile, limit: Optional[int], columns: int) -> Optional[int]:
+    """
+    Number of rows to fetch per round trip. One more row than the limit is
+    fetched so that the driver knows there are no more rows without another
+    round trip.
+    """
+    if limit is None:
+        return profile.default_rows
+    max_rows = max(1, profile.max_values // max(1, columns))
+    return max(1, min(limit + 1, profile.max_rows, max_rows))
+
+
+def tune_fetches(engine, profile: FetchProfile):
+    """
+    Set the fetch size of the cursors of an engine before they execute
+    their queries.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        if executemany or context is None:
+            return
+        options = context.execution_options
+        size = fetch_size(profile, options.get(FETCH_ROWS), options.get(FETCH_COLUMNS, 1))
+        if size is None:
+            return
+        dialect = connection.dialect.name
+        if dialect == "oracle":
+            cursor.arraysize = size
+            # Rows returned with the response of the execution (cx_Oracle 8+)
+            if hasattr(cursor, "prefetchrows"):
+                cursor.prefetchrows = size
+        elif dialect == "postgresql" and getattr(cursor, "name", None):
+            cursor.itersize = size
+            # SQLAlchemy reads server-side cursors by batches of at most
+            # max_row_buffer rows.
+            context.execution_options = options.union({"max_row_buffer": size})
+        elif dialect == "mssql":
+            cursor.arraysize = size
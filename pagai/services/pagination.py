@@ -0,0 +1,82 @@
+"""
+Keyset pagination: pages are selected with
+WHERE (key) > (values of the last row) ORDER BY key LIMIT n
+so that every page costs the same however deep the user browses.
+The values of the last row are sent to the client in an opaque cursor.
+"""
+import base64
+import binascii
+import datetime
+import decimal
+import json
+from typing import List
+
+from sqlalchemy import and_, or_
+
+from pagai.errors import OperationOutcome
+
+# Values which are not JSON serializable are tagged in cursors.
+CURSOR_TYPES = {
+    "datetime": (datetime.datetime, datetime.datetime.isoformat, datetime.datetime.fromisoformat),
+    "date": (datetime.date, datetime.date.isoformat, datetime.date.fromisoformat),
+    "decimal": (decimal.Decimal, str, decimal.Decimal),
+}
+
+
+def encode_value(value):
+    for tag, (type_, encode, _) in CURSOR_TYPES.items():
+        if isinstance(value, type_):
+            return {tag: encode(value)}
+    return value
+
+
+def decode_value(value):
+    if isinstance(value, dict):
+        ((tag, encoded_value),) = value.items()
+        return CURSOR_TYPES[tag][2](encoded_value)
+    return value
+
+
+def encode_cursor(values: list) -> str:
+    payload = json.dumps([encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, key_length: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        values = [decode_value(value) for value in values]
+    except (binascii.Error, KeyError, TypeError, ValueError):
+        raise OperationOutcome(f"Invalid pagination cursor {cursor}")
+    if len(values) != key_length:
+        raise OperationOutcome(f"Invalid pagination cursor {cursor}")
+    return values
+
+
+def keyset_condition(key_columns: list, values: list):
+    """
+    (a, b) > (x, y) expanded as a > x OR (a = x AND b > y) since row value
+    comparisons are not supported by Oracle and MSSQL.
+    """
+    clauses = []
+    for i, (column, value) in enumerate(zip(key_columns, values)):
+        equalities = [key_columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equalities, column > value))
+    return or_(*clauses)
+
+
+def paginate_query(query, key_columns: list, after_values=None):
+    if after_values is not None:
+        query = query.where(keyset_condition(key_columns, after_values))
+    return query.order_by(*key_columns)
+
+
+def paginate_rows(rows: list, limit: int, key_indexes: List[int]):
+    """
+    Given limit + 1 rows, return the rows of the page and the cursor of the
+    next one (None if there is no next page).
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([rows[-1][i] for i in key_indexes])
@@ -0,0 +1,140 @@
+"""
+Column profiles computed by the database over a sample of a table:
+- rows: number of rows of the sample,
+- nulls and null_ratio,
+- distinct: number of distinct values in the sample,
+- min and max (strings, numbers and dates),
+- min_length, max_length and avg_length (strings),
+- top_values: the most frequent values and their number of occurrences,
+  empty when no value occurs twice.
+Large objects (see LargeObject) and unknown types only get null counts.
+"""
+import os
+from typing import List, Optional
+
+from sqlalchemy import distinct, func, select, types
+
+from pagai.services.catalog import CatalogColumn, LargeObject, UUID
+
+# Number of rows of the sample the profiles are computed on.
+PROFILE_SAMPLE_ROWS = int(os.getenv("PAGAI_PROFILE_SAMPLE_ROWS", 10000))
+PROFILE_TOP_VALUES = int(os.getenv("PAGAI_PROFILE_TOP_VALUES", 5))
+# Number of queries run at once to profile a table.
+PROFILE_WORKERS = int(os.getenv("PAGAI_PROFILE_WORKERS", 4))
+# Postgres accepts at most 1664 expressions in a select list: the aggregates
+# of the columns are computed by chunks.
+PROFILE_COLUMNS_PER_QUERY = 50
+PROFILED_ALIAS = "pagai_profiled"
+PROFILE_CACHE_TTL = int(os.getenv("PAGAI_PROFILE_CACHE_TTL", 3600))
+# Maximum number of cached column profiles.
+PROFILE_CACHE_SIZE = int(os.getenv("PAGAI_PROFILE_CACHE_SIZE", 100_000))
+
+STRING = "string"
+ORDERED = "ordered"
+CATEGORICAL = "categorical"
+
+
+def profile_kind(column_type) -> Optional[str]:
+    """
+    Return which statistics can be computed on a column of a type, None
+    means only null counts.
+    """
+    # LargeObject is a String, but can't be compared or grouped.
+    if isinstance(column_type, (LargeObject, types.NullType)):
+        return None
+    if isinstance(column_type, (UUID, types.Boolean)):
+        return CATEGORICAL
+    if isinstance(column_type, types.String):
+        return STRING
+    if isinstance(column_type, (types.Integer, types.Numeric, types.Date, types.DateTime)):
+        return ORDERED
+    return None
+
+
+AGGREGATES = {
+    "values": lambda column: func.count(column),
+    "distinct": lambda column: func.count(distinct(column)),
+    "min": lambda column: func.min(column),
+    "max": lambda column: func.max(column),
+    "min_length": lambda column: func.min(func.char_length(column)),
+    "max_length": lambda column: func.max(func.char_length(column)),
+    "avg_length": lambda column: func.avg(func.char_length(column)),
+}
+
+
+def statistics(kind: Optional[str]) -> List[str]:
+    """
+    Return the statistics (keys of AGGREGATES) computed on a kind of column.
+    """
+    if kind is None:
+        return ["values"]
+    stats = ["values", "distinct"]
+    if kind in [STRING, ORDERED]:
+        stats += ["min", "max"]
+    if kind == STRING:
+        stats += ["min_length", "max_length", "avg_length"]
+    return stats
+
+
+def sample_rows(source, column_names: List[str], limit: int):
+    """
+    Subquery of the first limit rows of source (a table or a sample of it).
+    """
+    return (
+        select([source.c[name] for name in column_names])
+        .select_from(source)
+        .limit(limit)
+        .alias(PROFILED_ALIAS)
+    )
+
+
+def aggregates_statement(source, columns: List[CatalogColumn], limit: int):
+    """
+    Compute the aggregates of several columns in a single query, the labels
+    of the aggregates of the ith column are prefixed with c<i>_.
+    """
+    sample = sample_rows(source, [column.name for column in columns], limit)
+    expressions = [func.count().label("row_count")]
+    for i, column in enumerate(columns):
+        expressions += [
+            AGGREGATES[stat](sample.c[column.name]).label(f"c{i}_{stat}")
+            for stat in statistics(profile_kind(column.type))
+        ]
+    return select(expressions).select_from(sample)
+
+
+def profiles_from_row(row, columns: List[CatalogColumn]) -> dict:
+    profiles = {}
+    for i, column in enumerate(columns):
+        profile = {stat: row[f"c{i}_{stat}"] for stat in statistics(profile_kind(column.type))}
+        values = profile.pop("values")
+        profile["rows"] = row["row_count"]
+        profile["nulls"] = row["row_count"] - values
+        profile["null_ratio"] = profile["nulls"] / row["row_count"] if row["row_count"] else None
+        if "avg_length" in profile and profile["avg_length"] is not None:
+            profile["avg_length"] = float(profile["avg_length"])
+        profiles[column.name] = profile
+    return profiles
+
+
+def has_repeated_values(profile: dict) -> bool:
+    """
+    Whether some values of a profiled column occur more than once: the top
+    values of the other columns are not worth a query.
+    """
+    return "distinct" in profile and profile["distinct"] < profile["rows"] - profile["nulls"]
+
+
+def top_values_statement(source, column_name: str, limit: int, top: int):
+    """
+    Most frequent non null values of a column among the sampled rows.
+    """
+    sample = sample_rows(source, [column_name], limit)
+    column = sample.c[column_name]
+    return (
+        select([column.label("value"), func.count().label("frequency")])
+        .where(column.isnot(None))
+        .group_by(column)
+        .order_by(func.count().desc(), column)
+        .limit(top)
+    )
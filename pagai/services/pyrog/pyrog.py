@@ -1,9 +1,21 @@
+import hashlib
 import os
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 
 from pagai.errors import AuthenticationError, AuthorizationError, OperationOutcome
+from pagai.metrics import timed
+from pagai.services.cache import TTLCache
 
 PYROG_URL = os.getenv("PYROG_URL")
+PYROG_CONNECT_TIMEOUT = float(os.getenv("PYROG_CONNECT_TIMEOUT", 3))
+PYROG_READ_TIMEOUT = float(os.getenv("PYROG_READ_TIMEOUT", 30))
+PYROG_POOL_SIZE = int(os.getenv("PYROG_POOL_SIZE", 10))
+# Resources are cached for a short time so that paging through a table
+# doesn't query Pyrog every time.
+PYROG_RESOURCE_CACHE_TTL = float(os.getenv("PYROG_RESOURCE_CACHE_TTL", 30))
+PYROG_RESOURCE_CACHE_SIZE = int(os.getenv("PYROG_RESOURCE_CACHE_SIZE", 256))
 
 resource_query = """
 query resource($resourceId: String!) {
@@ -49,6 +61,34 @@ query resource($resourceId: String!) {
 """
 
 
+def create_session() -> requests.Session:
+    """
+    Create a session whose connections to Pyrog are kept alive and pooled.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=PYROG_POOL_SIZE, pool_maxsize=PYROG_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# requests sessions are not thread-safe: each thread gets its own.
+sessions = threading.local()
+
+
+def get_session() -> requests.Session:
+    session = getattr(sessions, "session", None)
+    if session is None:
+        session = create_session()
+        sessions.session = session
+    return session
+
+
+# Resources keyed by (resource id, hash of the authorization header): a token
+# only gets the resources it was allowed to fetch.
+resource_cache = TTLCache(ttl=PYROG_RESOURCE_CACHE_TTL, max_weight=PYROG_RESOURCE_CACHE_SIZE)
+
+
 class PyrogClient:
     def __init__(self, auth_header):
         if not auth_header:
@@ -58,6 +98,7 @@ class PyrogClient:
                 "An authorization token is required to forward queries to Pyrog-server"
             )
         self.headers = {"content-type": "application/json", "Authorization": auth_header}
+        self.auth_hash = hashlib.sha256(auth_header.encode("utf-8")).hexdigest()
 
     def run_graphql_query(self, graphql_query, variables=None, auth_required=True):
         """
@@ -70,13 +111,17 @@ class PyrogClient:
             raise OperationOutcome("PYROG_URL is missing from environment")
 
         try:
-            response = requests.post(
-                PYROG_URL,
-                headers=self.headers,
-                json={"query": graphql_query, "variables": variables},
-            )
+            with timed("pyrog"):
+                response = get_session().post(
+                    PYROG_URL,
+                    headers=self.headers,
+                    json={"query": graphql_query, "variables": variables},
+                    timeout=(PYROG_CONNECT_TIMEOUT, PYROG_READ_TIMEOUT),
+                )
         except requests.exceptions.ConnectionError:
             raise OperationOutcome("Could not connect to the Pyrog service")
+        except requests.exceptions.Timeout:
+            raise OperationOutcome("The Pyrog service did not respond in time")
 
         if response.status_code != 200:
             raise OperationOutcome(
@@ -98,8 +143,15 @@ class PyrogClient:
         return body
 
     def get_resource(self, resource_id):
+        cache_key = (resource_id, self.auth_hash)
+        resource = resource_cache.get(cache_key)
+        if resource is not None:
+            return resource
+
         resp = self.run_graphql_query(resource_query, variables={"resourceId": resource_id})
         resource = resp["data"]["resource"]
         if not resource:
             raise OperationOutcome(f"Resource with id {resource_id} does not exist")
+
+        resource_cache.set(cache_key, resource)
         return resource
@@ -0,0 +1,226 @@
+"""
+Planning of explorations: the filters of a Pyrog resource, and the joins
+leading to the columns they filter on, are turned into a join graph from
+which a single SELECT is built.
+Filter values are bound parameters so that statements only depend on the
+shape of the filters: they can be cached by shape and compiled only once.
+"""
+import os
+from typing import Callable, Dict, List
+
+from sqlalchemy import and_, bindparam, select, text
+from sqlalchemy.util import LRUCache
+
+from pagai.errors import OperationOutcome
+from pagai.services.pagination import paginate_query
+
+JOIN_ALIAS = "pagai_join_{}"
+LIMIT_PARAM = "pagai_limit"
+STATEMENT_CACHE_SIZE = int(os.getenv("PAGAI_STATEMENT_CACHE_SIZE", 1000))
+
+# Compiled forms of the cached statements, per dialect. It is given to
+# SQLAlchemy as the compiled_cache execution option.
+compiled_cache = LRUCache(STATEMENT_CACHE_SIZE)
+
+
+def single_value(value: str) -> list:
+    return [value]
+
+
+def between_values(value: str) -> list:
+    values = value.split(",")
+    if len(values) != 2:
+        raise ValueError("BETWEEN filter expects 2 values separated by a comma.")
+    return [values[0].strip(), values[1].strip()]
+
+
+def in_values(value: str) -> list:
+    # A single expanding parameter holds all the values.
+    return [value.split(",")]
+
+
+# Relation -> (function parsing the filter value into parameter values,
+# function building the filter clause from the column and the parameters).
+SQL_RELATIONS: Dict[str, tuple] = {
+    "<": (single_value, lambda col, params: col < params[0]),
+    "<=": (single_value, lambda col, params: col <= params[0]),
+    "<>": (single_value, lambda col, params: col != params[0]),
+    "=": (single_value, lambda col, params: col == params[0]),
+    ">": (single_value, lambda col, params: col > params[0]),
+    ">=": (single_value, lambda col, params: col >= params[0]),
+    "BETWEEN": (between_values, lambda col, params: and_(col >= params[0], col <= params[1])),
+    "IN": (in_values, lambda col, params: col.in_(params[0])),
+    "LIKE": (single_value, lambda col, params: col.like(params[0])),
+}
+
+
+def relation_method(parse: Callable, build_clause: Callable) -> Callable:
+    return lambda col, value: build_clause(col, parse(value))
+
+
+# Relation -> function building the filter clause from the column and the
+# filter value, with the values inlined in the clause.
+SQL_RELATIONS_TO_METHOD: Dict[str, Callable] = {
+    relation: relation_method(parse, build_clause)
+    for relation, (parse, build_clause) in SQL_RELATIONS.items()
+}
+
+
+def column_ref(sql_column: dict) -> tuple:
+    return (sql_column["owner"]["name"], sql_column["table"].strip(), sql_column["column"])
+
+
+def filters_shape(filters: List[dict]) -> tuple:
+    """
+    Everything but the values of the filters: the filtered columns, the
+    relations and the joins.
+    """
+    return tuple(
+        (
+            column_ref(filter_["sqlColumn"]),
+            filter_["relation"],
+            tuple(
+                (column_ref(join["tables"][0]), column_ref(join["tables"][1]))
+                for join in filter_["sqlColumn"]["joins"]
+            ),
+        )
+        for filter_ in filters
+    )
+
+
+def filter_values(filter_: dict) -> list:
+    relation = filter_["relation"]
+    if relation not in SQL_RELATIONS:
+        raise OperationOutcome(f"Unknown filter relation {relation}")
+    parse, _ = SQL_RELATIONS[relation]
+    return parse(filter_["value"])
+
+
+def filters_params(filters: List[dict]) -> dict:
+    """
+    Values to bind to the parameters of a statement planned for filters.
+    """
+    return {
+        f"filter_{i}_{j}": value
+        for i, filter_ in enumerate(filters)
+        for j, value in enumerate(filter_values(filter_))
+    }
+
+
+class JoinGraph:
+    """
+    Tables joined to the explored table. Joins are outer joins identified by
+    their path (the sequence of joins leading to them from the explored
+    table): filters sharing a join path share the joined tables. Each joined
+    table gets its own alias so that the same table can be reached by
+    several paths, or be joined to itself.
+    Tables are identified by their name as returned by get_table, whatever
+    the case of the names given in the filters.
+    """
+
+    def __init__(
+        self,
+        main_ref: tuple,
+        main_table,
+        get_table: Callable[[str, str], object],
+        get_column: Callable[[str, object], object],
+    ):
+        self.main_ref = main_ref
+        self.from_clause = main_table
+        self._main_table = main_table
+        self._get_table = get_table
+        self._get_column = get_column
+        # join path -> aliased table
+        self._joined: Dict[tuple, object] = {}
+
+    def __len__(self):
+        return len(self._joined)
+
+    def table_ref(self, ref: tuple) -> tuple:
+        return (ref[0], self._get_table(*ref[:2]).name) + ref[2:]
+
+    def join_path(self, joins: tuple) -> Dict[tuple, object]:
+        """
+        Join the tables of a join path (if they were not already) and
+        return the tables it reaches keyed by (owner, table name).
+        """
+        tables = {self.main_ref: self._main_table}
+        path: tuple = ()
+        for left_ref, right_ref in joins:
+            left_ref, right_ref = self.table_ref(left_ref), self.table_ref(right_ref)
+            left_table = tables.get(left_ref[:2])
+            if left_table is None:
+                raise OperationOutcome(
+                    f"Table {left_ref[1]} is joined on before being joined itself"
+                )
+            path += ((left_ref, right_ref),)
+            right_table = self._joined.get(path)
+            if right_table is None:
+                right_table = self._get_table(*right_ref[:2]).alias(
+                    JOIN_ALIAS.format(len(self._joined))
+                )
+                # The column of each side of a join is looked up in the table
+                # of the other side, as explorations always did.
+                self.from_clause = self.from_clause.outerjoin(
+                    right_table,
+                    self.column(right_table, left_ref[2]) == self.column(left_table, right_ref[2]),
+                )
+                self._joined[path] = right_table
+            tables[right_ref[:2]] = right_table
+        return tables
+
+    def column(self, table, name: str):
+        if table is self._main_table:
+            return self._get_column(name, table)
+        # Look the column up in the aliased table so that errors mention
+        # the name of the table rather than its alias.
+        return table.c[self._get_column(name, table.element).name]
+
+
+def plan_statement(graph: JoinGraph, columns: list, filters: List[dict]):
+    """
+    Build the SELECT of columns of the explored table filtered by filters.
+    Filter values are the bound parameters named by filters_params.
+    """
+    clauses = []
+    for i, (filter_, (ref, relation, joins)) in enumerate(zip(filters, filters_shape(filters))):
+        table = graph.join_path(joins).get(graph.table_ref(ref[:2]))
+        if table is None:
+            raise OperationOutcome(
+                f"Filtered table {ref[1]} is not joined to table {graph.main_ref[1]}"
+            )
+        params = [
+            bindparam(f"filter_{i}_{j}", expanding=isinstance(value, list))
+            for j, value in enumerate(filter_values(filter_))
+        ]
+        _, build_clause = SQL_RELATIONS[relation]
+        clauses.append(build_clause(graph.column(table, ref[2]), params))
+
+    statement = select(columns).select_from(graph.from_clause)
+    if clauses:
+        statement = statement.where(and_(*clauses))
+    return statement
+
+
+def paginate_statement(statement, key_columns: list, after: bool):
+    """
+    Order the statement by key_columns and, if after is True, select the
+    rows after the key values bound to the after_<i> parameters.
+    """
+    after_params = [bindparam(f"after_{i}") for i in range(len(key_columns))] if after else None
+    return paginate_query(statement, key_columns, after_params)
+
+
+def limit_statement(statement, mssql: bool = False):
+    """
+    Limit the rows of the statement to the value bound to its LIMIT_PARAM
+    parameter, so that the statement does not depend on the limit.
+    """
+    if mssql:
+        # SQLAlchemy only renders TOP with a literal on MSSQL.
+        return statement.prefix_with(text(f"TOP (:{LIMIT_PARAM})"))
+    return statement.limit(bindparam(LIMIT_PARAM))
+
+
+def keyset_params(after_values: list) -> dict:
+    return {f"after_{i}": value for i, value in enumerate(after_values)}
@@ -0,0 +1,65 @@
+"""
+Time budget of the queries sent to the explored databases. It is enforced by
+each driver, which cancels the query server-side when it runs out:
+- statement_timeout on Postgres,
+- callTimeout of cx_Oracle connections (cx_Oracle 7 and Oracle client 18.1
+  or later),
+- timeout of pyodbc connections on MSSQL.
+Only the queries of explorations have a timeout, catalog queries don't.
+"""
+import math
+import os
+from typing import Optional
+
+# In seconds, 0 disables the timeout.
+QUERY_TIMEOUT = float(os.getenv("PAGAI_QUERY_TIMEOUT", 30))
+
+# Markers of the errors raised when a query is cancelled by its timeout:
+# Postgres error code and cx_Oracle / pyodbc error messages. The HYT00
+# state of pyodbc is also the one of login timeouts: its message is matched.
+POSTGRES_QUERY_CANCELED = "57014"
+TIMEOUT_ERRORS = ["DPI-1067", "ORA-03156", "ORA-01013", "Query timeout expired", "HYT01"]
+MIN_CALL_TIMEOUT_CX_ORACLE = (7,)
+MIN_CALL_TIMEOUT_ORACLE_CLIENT = (18, 1)
+
+
+def supports_call_timeout(dialect) -> bool:
+    """
+    Whether callTimeout can be set on the cx_Oracle connections of dialect,
+    setting it raises otherwise.
+    """
+    if tuple(getattr(dialect, "cx_oracle_ver", ())) < MIN_CALL_TIMEOUT_CX_ORACLE:
+        return False
+    return tuple(dialect.dbapi.clientversion()) >= MIN_CALL_TIMEOUT_ORACLE_CLIENT
+
+
+def apply_query_timeout(connection, timeout: Optional[float]):
+    """
+    Set the timeout of the queries sent on a (checked out) connection, None
+    for connections without timeout. The timeout of Oracle and MSSQL
+    connections is always set so that pooled connections don't keep the
+    timeout of a previous checkout.
+    """
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        # SET LOCAL lasts until the end of the transaction, which is rolled
+        # back when the connection is returned to the pool.
+        if timeout is not None:
+            connection.execute(f"SET LOCAL statement_timeout = {int(timeout * 1000)}")
+    elif dialect == "oracle":
+        if supports_call_timeout(connection.dialect):
+            connection.connection.connection.callTimeout = int((timeout or 0) * 1000)
+    elif dialect == "mssql":
+        connection.connection.connection.timeout = math.ceil(timeout or 0)
+
+
+def is_query_timeout(error: Exception) -> bool:
+    original_error = getattr(error, "orig", None)
+    if getattr(original_error, "pgcode", None) == POSTGRES_QUERY_CANCELED:
+        return True
+    message = str(original_error or error)
+    return any(marker in message for marker in TIMEOUT_ERRORS)
+
+
+def timeout_message(timeout: float) -> str:
+    return f"The query was cancelled as it exceeded the timeout of {timeout:g} seconds"
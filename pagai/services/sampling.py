@@ -0,0 +1,56 @@
+"""
+Native block sampling of tables.
+SQLAlchemy renders TableSample as "TABLESAMPLE system(p)" which is the
+Postgres syntax, Oracle and MSSQL have their own.
+"""
+from typing import Optional
+
+from sqlalchemy import literal
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.selectable import TableSample
+
+SAMPLE_ALIAS = "pagai_sample"
+
+
+def sample_table(table, percentage: float, seed: Optional[int] = None) -> TableSample:
+    """
+    Return a sample of about percentage % of the blocks of a table. The
+    samples of a table taken with the same seed are the same ones (as long
+    as the table does not change), otherwise each query samples other blocks.
+    """
+    return table.tablesample(
+        percentage, name=SAMPLE_ALIAS, seed=literal(seed) if seed is not None else None
+    )
+
+
+def format_percentage(tablesample: TableSample) -> str:
+    # The sample size must be a literal on Oracle and MSSQL.
+    return format(float(tablesample.sampling), "f")
+
+
+def format_seed(tablesample: TableSample, clause: str) -> str:
+    if tablesample.seed is None:
+        return ""
+    return " %s (%d)" % (clause, int(tablesample.seed.value))
+
+
+@compiles(TableSample, "oracle")
+def compile_oracle_tablesample(tablesample, compiler, **kw):
+    # The sample clause comes before the table alias on Oracle.
+    kw["asfrom"] = True
+    return "%s SAMPLE BLOCK (%s)%s %s" % (
+        compiler.process(tablesample.original, **kw),
+        format_percentage(tablesample),
+        format_seed(tablesample, "SEED"),
+        compiler.preparer.format_alias(tablesample, tablesample.name),
+    )
+
+
+@compiles(TableSample, "mssql")
+def compile_mssql_tablesample(tablesample, compiler, **kw):
+    kw["asfrom"] = True
+    return "%s TABLESAMPLE SYSTEM (%s PERCENT)%s" % (
+        compiler.visit_alias(tablesample, **kw),
+        format_percentage(tablesample),
+        format_seed(tablesample, "REPEATABLE"),
+    )
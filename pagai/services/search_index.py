@@ -0,0 +1,118 @@
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Matches whose score is below this threshold are not returned.
+MIN_SCORE = 0.3
+
+WORD = re.compile(r"[^\W_]+")
+
+
+def trigrams(name: str) -> set:
+    """
+    Trigrams of the words of a name, padded as by pg_trgm so that the start
+    of the words weighs more: "birth_date" gives "  b", " bi", "bir", ...,
+    "  d", " da", ..., "te ".
+    """
+    grams = set()
+    for word in WORD.findall(name.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigram_score(shared: int, query_size: int, name_size: int) -> float:
+    """
+    Average of the trigram similarity of a query and a name, and of the
+    share of the query trigrams found in the name (which favors the names
+    containing the query).
+    """
+    similarity = shared / (query_size + name_size - shared)
+    return (similarity + shared / query_size) / 2
+
+
+class SearchIndex:
+    """
+    Trigram inverted index of the table and column names of an owner
+    schema. Names are indexed once however many tables they appear in.
+    """
+
+    def __init__(self, schema: Dict[str, List[str]]):
+        # The schema the index was built from, to detect when it is stale.
+        self.schema = schema
+        # name -> (table, column) entries, the column of a table entry is None
+        entries: Dict[str, list] = {}
+        for table, columns in schema.items():
+            entries.setdefault(table, []).append((table, None))
+            for column in columns:
+                entries.setdefault(column, []).append((table, column))
+        self.names = list(entries)
+        self.entries = [entries[name] for name in self.names]
+        self.sizes = []
+        self.postings: Dict[str, List[int]] = {}
+        for name_id, name in enumerate(self.names):
+            name_trigrams = trigrams(name)
+            self.sizes.append(len(name_trigrams))
+            for trigram in name_trigrams:
+                self.postings.setdefault(trigram, []).append(name_id)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.entries)
+
+    def search(
+        self, query: str, limit: int = 20, table: Optional[str] = None, min_score=MIN_SCORE
+    ) -> List[dict]:
+        """
+        Return the best matches of query among the table and column names,
+        or among the columns of a table only.
+        """
+        query_trigrams = trigrams(query)
+        if not query_trigrams:
+            return []
+        if table is not None:
+            return self.search_table(query, query_trigrams, limit, table, min_score)
+
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self.postings.get(trigram, ()))
+
+        # Rank the names first: a name may be shared by thousands of tables.
+        ranked_names = []
+        for name_id, count in shared.items():
+            score = trigram_score(count, len(query_trigrams), self.sizes[name_id])
+            if score >= min_score:
+                ranked_names.append((rank(score, self.names[name_id], query), name_id))
+        ranked_names.sort(reverse=True)
+
+        matches = []
+        for (score, _, _), name_id in ranked_names:
+            matches.extend(
+                {"table": entry_table, "column": column, "score": round(score, 3)}
+                for entry_table, column in self.entries[name_id]
+            )
+            if len(matches) >= limit:
+                break
+        return matches[:limit]
+
+    def search_table(
+        self, query: str, query_trigrams: set, limit: int, table: str, min_score: float
+    ) -> List[dict]:
+        # The columns of a table are few: they are compared one by one.
+        ranked_columns = []
+        for column in self.schema.get(table, []):
+            column_trigrams = trigrams(column)
+            shared = len(query_trigrams & column_trigrams)
+            score = trigram_score(shared, len(query_trigrams), len(column_trigrams))
+            if score >= min_score:
+                ranked_columns.append((rank(score, column, query), column))
+        ranked_columns.sort(reverse=True)
+        return [
+            {"table": table, "column": column, "score": round(score, 3)}
+            for (score, _, _), column in ranked_columns[:limit]
+        ]
+
+
+def rank(score: float, name: str, query: str) -> tuple:
+    # Among names of the same score, exact matches then shorter names come
+    # first.
+    return (score, name.lower() == query.lower(), -len(name))
@@ -0,0 +1,70 @@
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from pagai.errors import ServiceUnavailable
+
+# In seconds, calls waiting longer than that for the result of an identical
+# call give up: a hung call can't block them forever.
+FLIGHT_WAIT_TIMEOUT = float(os.getenv("PAGAI_FLIGHT_WAIT_TIMEOUT", 300))
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key: the first call runs the
+    function while the other ones wait for it and share its result (or its
+    error). They wait for at most timeout seconds (FLIGHT_WAIT_TIMEOUT by
+    default) and are rejected with a ServiceUnavailable error afterwards.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, Flight] = {}
+        self.coalesced = 0
+
+    def do(
+        self, key: Hashable, function: Callable[[], Any], timeout: Optional[float] = None
+    ) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = Flight()
+                self._flights[key] = flight
+            else:
+                self.coalesced += 1
+
+        if not is_leader:
+            timeout = timeout or FLIGHT_WAIT_TIMEOUT
+            if not flight.done.wait(timeout):
+                raise ServiceUnavailable(
+                    f"An identical query is still running after {timeout:g} seconds"
+                )
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = function()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._flights), "coalesced": self.coalesced}
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,171 @@
+"""
+On-disk snapshots of the owner schemas, catalogs and statistics, so that a
+restarted worker doesn't pay for cold catalog scans.
+Snapshots are kept in a SQLite file keyed by (database identity, owner,
+kind). They are written in the background and only read on the schema
+cache misses of a cold start: the owners they were read for are then
+revalidated in the background, and their next misses (eg: once their
+entries expired) read the database.
+"""
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, Optional
+
+# Path of the SQLite file, snapshots are disabled when it is not set.
+SNAPSHOT_PATH = os.getenv("PAGAI_SNAPSHOT_PATH")
+SNAPSHOT_REVALIDATION_WORKERS = int(os.getenv("PAGAI_SNAPSHOT_REVALIDATION_WORKERS", 2))
+
+logger = logging.getLogger(__name__)
+
+CREATE_TABLE = """
+    create table if not exists snapshots (
+        identity text not null,
+        owner text not null,
+        kind text not null,
+        value blob not null,
+        saved_at real not null,
+        primary key (identity, owner, kind)
+    )
+"""
+
+
+class SnapshotStore:
+    """
+    Persist pickled (and compressed) values in a SQLite file shared by the
+    workers. Errors of the store are logged and otherwise ignored: the
+    snapshots are only a cache of the database catalogs.
+    """
+
+    def __init__(self, path: str, revalidation_workers: int = SNAPSHOT_REVALIDATION_WORKERS):
+        self.path = path
+        # SQLite connections can't be shared between threads.
+        self._connections = threading.local()
+        self._lock = threading.Lock()
+        # Keys whose revalidation is running, and which were revalidated.
+        self._revalidating = set()
+        self._revalidated = set()
+        self._executor = ThreadPoolExecutor(
+            max_workers=revalidation_workers, thread_name_prefix="snapshot-revalidation"
+        )
+        # A single writer keeps the snapshots in the order they were saved.
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="snapshot-writer")
+        self.loads = 0
+        self.saves = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._connections, "connection", None)
+        if connection is None:
+            # The file is only opened when it is first needed.
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("pragma journal_mode=wal")
+            connection.execute(CREATE_TABLE)
+            self._connections.connection = connection
+        return connection
+
+    def load(self, identity: str, owner: str, kind: str) -> Optional[Any]:
+        try:
+            row = (
+                self._connect()
+                .execute(
+                    "select value from snapshots where identity = ? and owner = ? and kind = ?",
+                    (identity, owner, kind),
+                )
+                .fetchone()
+            )
+            if row is None:
+                return None
+            value = pickle.loads(zlib.decompress(row[0]))
+        except Exception:
+            logger.exception("Could not load the %s snapshot of %s", kind, owner)
+            return None
+        with self._lock:
+            self.loads += 1
+        return value
+
+    def save(self, identity: str, owner: str, kind: str, value: Any):
+        """
+        Save a snapshot in the background: pickling a large catalog takes
+        a while.
+        """
+        self._writer.submit(self._save, identity, owner, kind, value)
+
+    def _save(self, identity: str, owner: str, kind: str, value: Any):
+        try:
+            data = zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+            self._connect().execute(
+                "insert or replace into snapshots values (?, ?, ?, ?, ?)",
+                (identity, owner, kind, data, time.time()),
+            )
+        except Exception:
+            logger.exception("Could not save the %s snapshot of %s", kind, owner)
+            return
+        with self._lock:
+            self.saves += 1
+
+    def delete(self, identity: str, owner: str, kind: Optional[str] = None) -> int:
+        """
+        Delete the snapshots of an owner, or only the one of the given kind.
+        """
+        # Pending saves would write the deleted snapshots again.
+        self.flush()
+        query = "delete from snapshots where identity = ? and owner = ?"
+        params = (identity, owner)
+        if kind is not None:
+            query, params = query + " and kind = ?", params + (kind,)
+        try:
+            return self._connect().execute(query, params).rowcount
+        except Exception:
+            logger.exception("Could not delete the snapshots of %s", owner)
+            return 0
+
+    def revalidate(self, key: Hashable, revalidate: Callable[[], Any]):
+        """
+        Run revalidate in the background, once per key and per process.
+        """
+        with self._lock:
+            if key in self._revalidating or key in self._revalidated:
+                return
+            self._revalidating.add(key)
+
+        def run():
+            try:
+                revalidate()
+            except Exception:
+                # The next snapshot load will retry.
+                logger.exception("Could not revalidate the snapshots of %s", key)
+                succeeded = False
+            else:
+                succeeded = True
+            with self._lock:
+                self._revalidating.discard(key)
+                if succeeded:
+                    self._revalidated.add(key)
+
+        self._executor.submit(run)
+
+    def is_revalidated(self, key: Hashable) -> bool:
+        """
+        Whether the snapshots of key were revalidated: they are then older
+        than the values read from the database.
+        """
+        with self._lock:
+            return key in self._revalidated
+
+    def flush(self):
+        """
+        Wait for the pending saves.
+        """
+        self._writer.submit(lambda: None).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"loads": self.loads, "saves": self.saves}
+
+
+snapshot_store = SnapshotStore(SNAPSHOT_PATH) if SNAPSHOT_PATH else None
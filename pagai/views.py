@@ -1,26 +1,64 @@
-from flask import Blueprint, jsonify, request
+import os
+from contextlib import contextmanager
+
+from flask import Blueprint, json, jsonify, request, Response, stream_with_context
 from flask_cors import CORS
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from sqlalchemy.exc import OperationalError
 
-from pagai.errors import AuthenticationError, AuthorizationError, OperationOutcome
+from pagai.errors import (
+    AuthenticationError,
+    AuthorizationError,
+    OperationOutcome,
+    ServiceUnavailable,
+)
+from pagai.formats import arrow_chunks, columnar_json, csv_chunks, ndjson_chunks
+from pagai.json_encoder import RowSerializer
+from pagai.metrics import EXPLORE_DURATION, metered_chunks, observe_exploration, timed
 from pagai.services import pyrog
 from pagai.services.database_explorer import DatabaseExplorer
+from pagai.services.query_timeout import is_query_timeout, QUERY_TIMEOUT, timeout_message
 
 api = Blueprint("api", __name__)
 # enable Cross-Origin Resource Sharing
 # "Allow-Control-Allow-Origin" HTTP header
 CORS(api)
 
+JSON_MIMETYPE = "application/json"
+COLUMNAR_JSON_MIMETYPE = "application/vnd.pagai.columnar+json"
+ARROW_STREAM_MIMETYPE = "application/vnd.apache.arrow.stream"
 
-@api.route("/explore/<resource_id>/<owner>/<table>", methods=["GET"])
-def explore(resource_id, owner, table):
+STREAM_FORMATS = {
+    "ndjson": (ndjson_chunks, "application/x-ndjson"),
+    "csv": (csv_chunks, "text/csv"),
+    "arrow": (arrow_chunks, ARROW_STREAM_MIMETYPE),
+}
+# Maximum number of tables previewed by a single batch preview.
+MAX_PREVIEWED_TABLES = int(os.getenv("PAGAI_MAX_PREVIEWED_TABLES", 50))
+
+
+@contextmanager
+def database_errors():
+    try:
+        yield
+    except OperationalError as e:
+        if "could not connect to server" in str(e):
+            raise OperationOutcome(f"Could not connect to the database: {e}")
+        elif is_query_timeout(e):
+            raise OperationOutcome(timeout_message(query_timeout()))
+        else:
+            raise OperationOutcome(e)
+    except ServiceUnavailable:
+        raise
+    except Exception as e:
+        raise OperationOutcome(e)
+
+
+def get_explored_resource(resource_id):
     """
-    Database exploration: returns the first rows of
-    a database table. The db credentials are retrieved from
-    Pyrog. The number of returned rows may be specified using
-    query params (eg: /explore/<resource_id>/<table>?first=10).
+    Fetch the resource from Pyrog and return the credentials of its source
+    and its filters.
     """
-    limit = request.args.get("first", 10, type=int)
     # Get headers
     authorization_header = request.headers.get("Authorization")
 
@@ -36,50 +74,390 @@ def explore(resource_id, owner, table):
     # Get filters
     filters = resource["filters"]
 
+    return credentials, filters
+
+
+def bool_arg(name: str) -> bool:
+    return request.args.get(name, "false").lower() in ["true", "1"]
+
+
+def first_arg() -> int:
+    """
+    Number of rows asked with ?first=, 10 by default.
+    """
+    first = request.args.get("first", 10, type=int)
+    if first < 1:
+        raise OperationOutcome("The number of rows (?first=) must be at least 1")
+    return first
+
+
+def query_timeout() -> float:
+    """
+    Query timeout (in seconds) asked with ?timeout=, it can't exceed the
+    configured one.
+    """
+    timeout = request.args.get("timeout", type=float)
+    if not timeout or timeout <= 0:
+        return QUERY_TIMEOUT
+    return min(timeout, QUERY_TIMEOUT) if QUERY_TIMEOUT else timeout
+
+
+def reject_pagination(output_format: str):
+    """
+    Streamed explorations are not paginated: reject ?paginate= and ?after=
+    rather than ignoring them.
+    """
+    if bool_arg("paginate") or request.args.get("after") is not None:
+        raise OperationOutcome(f"Explorations streamed as {output_format} can't be paginated")
+
+
+def stream_response(explorer, owner, table, limit, filters, output_format, sample):
+    chunks, mimetype = STREAM_FORMATS[output_format]
+    rows = explorer.stream(owner, table, limit=limit, filters=filters, sample=sample)
     try:
-        explorer = DatabaseExplorer(credentials)
-        return jsonify(explorer.explore(owner, table, limit=limit, filters=filters))
-    except OperationalError as e:
-        if "could not connect to server" in str(e):
-            raise OperationOutcome(f"Could not connect to the database: {e}")
+        body = chunks(rows.fields, rows.column_types, rows)
+    except Exception:
+        rows.close()
+        raise
+    body = metered_chunks(body, rows, explorer.db_model, output_format)
+    return Response(stream_with_context(body), mimetype=mimetype)
+
+
+def serialize_exploration(exploration, column_types, mimetype, db_model):
+    with timed("serialize", db_model):
+        if mimetype == COLUMNAR_JSON_MIMETYPE:
+            response = Response(columnar_json(exploration, column_types), mimetype=mimetype)
+            output_format = "columnar_json"
         else:
-            raise OperationOutcome(e)
-    except Exception as e:
-        raise OperationOutcome(e)
+            response = RowSerializer(column_types).jsonify(exploration)
+            output_format = "json"
+    observe_exploration(db_model, len(exploration["rows"]), len(response.get_data()), output_format)
+    return response
+
+
+@api.route("/explore/<resource_id>/<owner>/<table>", methods=["GET"])
+def explore(resource_id, owner, table):
+    """
+    Database exploration: returns the first rows of
+    a database table. The db credentials are retrieved from
+    Pyrog. The number of returned rows may be specified using
+    query params (eg: /explore/<resource_id>/<table>?first=10).
+    With ?sample=true, the rows are taken from a random sample of the table
+    (using native block sampling) instead of being the first ones.
+    With ?paginate=true, rows are ordered by the primary key (or a unique
+    index) and the response holds the cursor of the next page in "next"
+    (null for the last page), which is given as ?after=<cursor> to get the
+    next page (pagination is not available with Arrow streams).
+    Queries exceeding the timeout (PAGAI_QUERY_TIMEOUT seconds, which can
+    be lowered with ?timeout=<seconds>) are cancelled.
+    The response format is negotiated with the Accept header:
+    - application/json: {"fields": [...], "rows": [[...], ...]}
+    - application/vnd.pagai.columnar+json: the values of each field in an
+        array {"fields": [...], "columns": [[...], ...]}
+    - application/vnd.apache.arrow.stream: an Arrow IPC stream
+    """
+    limit = first_arg()
+    sample = bool_arg("sample")
+    after = request.args.get("after")
+    paginate = bool_arg("paginate") or after is not None
+    mimetype = request.accept_mimetypes.best_match(
+        [JSON_MIMETYPE, COLUMNAR_JSON_MIMETYPE, ARROW_STREAM_MIMETYPE], default=JSON_MIMETYPE
+    )
+    if mimetype == ARROW_STREAM_MIMETYPE:
+        reject_pagination("arrow")
+    credentials, filters = get_explored_resource(resource_id)
+
+    db_model = str(credentials.get("model"))
+
+    with database_errors(), EXPLORE_DURATION.labels(db_model=db_model).time():
+        explorer = DatabaseExplorer(credentials, query_timeout=query_timeout())
+        if mimetype == ARROW_STREAM_MIMETYPE:
+            return stream_response(explorer, owner, table, limit, filters, "arrow", sample)
+        exploration = explorer.explore(
+            owner,
+            table,
+            limit=limit,
+            filters=filters,
+            sample=sample,
+            paginate=paginate,
+            after=after,
+        )
+        column_types = explorer.get_column_types(owner, table)
+        return serialize_exploration(exploration, column_types, mimetype, db_model)
+
+
+@api.route("/explore/<resource_id>/<owner>/<table>/stream", methods=["GET"])
+def explore_stream(resource_id, owner, table):
+    """
+    Streaming database exploration: same as /explore but the rows are sent
+    while they are fetched from the database, as newline delimited JSON
+    (?format=ndjson, the default), as CSV (?format=csv) or as an Arrow IPC
+    stream (?format=arrow). The timeout (?timeout=) applies to each
+    fetch of rows. Streamed rows can't be paginated.
+    """
+    limit = first_arg()
+    sample = bool_arg("sample")
+    output_format = request.args.get("format", "ndjson")
+    if output_format not in STREAM_FORMATS:
+        raise OperationOutcome(f"Unknown format {output_format}")
+    reject_pagination(output_format)
+    credentials, filters = get_explored_resource(resource_id)
+
+    with database_errors():
+        explorer = DatabaseExplorer(credentials, query_timeout=query_timeout())
+        return stream_response(explorer, owner, table, limit, filters, output_format, sample)
+
+
+def previewed_tables(body) -> list:
+    """
+    Validate the tables of a batch preview: {"tables": [{"owner": ...,
+    "table": ..., "limit": 10}, ...]}, the limit being optional.
+    """
+    tables = body.get("tables") if isinstance(body, dict) else None
+    if not isinstance(tables, list) or not tables:
+        raise OperationOutcome("A list of tables to preview is required")
+    if len(tables) > MAX_PREVIEWED_TABLES:
+        raise OperationOutcome(f"At most {MAX_PREVIEWED_TABLES} tables can be previewed at once")
+
+    entries = []
+    for entry in tables:
+        if not isinstance(entry, dict) or not entry.get("owner") or not entry.get("table"):
+            raise OperationOutcome("Each previewed table needs an owner and a table")
+        limit = entry.get("limit", 10)
+        if not isinstance(limit, int) or limit < 0:
+            raise OperationOutcome(f"Invalid limit {limit} for table {entry['table']}")
+        entries.append({"owner": entry["owner"], "table": entry["table"], "limit": limit})
+    return entries
+
+
+def preview_lines(explorer, entries, filters):
+    """
+    Serialize each preview as a line of JSON as soon as it is ready.
+    """
+    for preview in explorer.preview_tables(entries, filters):
+        entry = entries[preview.index]
+        line = {"index": preview.index, "owner": entry["owner"], "table": entry["table"]}
+        if preview.error is not None:
+            yield json.dumps({**line, "error": str(preview.error)}, separators=(",", ":")) + "\n"
+            continue
+        rows = preview.exploration["rows"]
+        serializer = RowSerializer(preview.column_types)
+        with timed("serialize", explorer.db_model):
+            chunk = serializer.dumps(
+                {
+                    **line,
+                    "fields": preview.exploration["fields"],
+                    "rows": serializer.convert_rows(rows),
+                }
+            )
+        observe_exploration(explorer.db_model, len(rows), len(chunk), "preview")
+        yield chunk + "\n"
+
+
+@api.route("/explore/<resource_id>/preview", methods=["POST"])
+def preview_tables(resource_id):
+    """
+    Batch preview: returns the first rows of several tables of the source
+    of a resource, given as {"tables": [{"owner": ..., "table": ...,
+    "limit": 10}, ...]}. The tables are explored concurrently (see
+    PAGAI_PREVIEW_WORKERS) and each one is sent as soon as it is ready, as
+    newline delimited JSON: {"index": ..., "owner": ..., "table": ...,
+    "fields": [...], "rows": [[...], ...]} where index is the position of
+    the table in the request, or {"index": ..., ..., "error": "..."} when
+    its exploration failed.
+    """
+    entries = previewed_tables(request.get_json(silent=True))
+    credentials, filters = get_explored_resource(resource_id)
+
+    with database_errors():
+        explorer = DatabaseExplorer(credentials, query_timeout=query_timeout())
+        # The previews are read while the response is sent: fail before it.
+        explorer.check_connection_exists()
+        body = preview_lines(explorer, entries, filters)
+        return Response(stream_with_context(body), mimetype=STREAM_FORMATS["ndjson"][1])
 
 
 @api.route("/get_owners", methods=["POST"])
 def get_owners():
     credentials = request.get_json()
 
-    try:
+    with database_errors():
         explorer = DatabaseExplorer(credentials)
         db_owners = explorer.get_owners()
         return jsonify(db_owners)
-    except OperationalError as e:
-        if "could not connect to server" in str(e):
-            raise OperationOutcome(f"Could not connect to the database: {e}")
-        else:
-            raise OperationOutcome(e)
-    except Exception as e:
-        raise OperationOutcome(e)
 
 
 @api.route("/get_owner_schema/<owner>", methods=["POST"])
 def get_owner_schema(owner):
     credentials = request.get_json()
 
-    try:
+    with database_errors():
         explorer = DatabaseExplorer(credentials)
         db_schema = explorer.get_owner_schema(owner)
         return jsonify(db_schema)
-    except OperationalError as e:
-        if "could not connect to server" in str(e):
-            raise OperationOutcome(f"Could not connect to the database: {e}")
-        else:
-            raise OperationOutcome(e)
-    except Exception as e:
-        raise OperationOutcome(e)
+
+
+@api.route("/get_owner_schemas", methods=["POST"])
+def get_owner_schemas():
+    """
+    Returns the schemas of several owners in a single response, keyed by
+    owner. The owners are given as query params
+    (eg: /get_owner_schemas?owners=public&owners=other), ?all=true
+    returns the schemas of all the owners of the database.
+    """
+    credentials = request.get_json()
+    owners = request.args.getlist("owners")
+    all_owners = bool_arg("all")
+    if not owners and not all_owners:
+        raise OperationOutcome("At least one owner is required")
+
+    with database_errors():
+        explorer = DatabaseExplorer(credentials)
+        if all_owners:
+            owners = explorer.get_owners()
+        db_schemas = explorer.get_owner_schemas(owners)
+        return jsonify(db_schemas)
+
+
+@api.route("/get_owner_stats/<owner>", methods=["POST"])
+def get_owner_stats(owner):
+    """
+    Returns the estimated number of rows and size (in bytes) of the tables
+    of an owner, eg: {"patients": {"rows": 1000, "size": 65536}}.
+    """
+    credentials = request.get_json()
+
+    with database_errors():
+        explorer = DatabaseExplorer(credentials)
+        stats = explorer.get_table_stats(owner)
+        return jsonify(stats)
+
+
+@api.route("/get_owner_dependencies/<owner>", methods=["POST"])
+def get_owner_dependencies(owner):
+    """
+    Returns the foreign keys between the tables of an owner, eg:
+    [{"table": "visits", "columns": ["patient_id"], "referenced_table":
+    "patients", "referenced_columns": ["id"], "inferred": false}].
+    With ?infer=true, the links inferred from the column names are
+    returned as well.
+    """
+    credentials = request.get_json()
+
+    with database_errors():
+        explorer = DatabaseExplorer(credentials)
+        graph = explorer.get_dependency_graph(owner)
+        return jsonify(graph.foreign_keys(inferred=bool_arg("infer")))
+
+
+@api.route("/join_paths/<owner>/<source>/<target>", methods=["POST"])
+def get_join_paths(owner, source, target):
+    """
+    Returns the shortest join paths from a table to another one, each one
+    as a list of joins, eg: [[{"table": "patients", "columns": ["id"],
+    "joined_table": "visits", "joined_columns": ["patient_id"],
+    "inferred": false}]]. The number of paths may be specified with
+    ?first=10 and ?infer=true allows inferred links in the paths.
+    """
+    credentials = request.get_json()
+    max_paths = request.args.get("first", 10, type=int)
+
+    with database_errors():
+        explorer = DatabaseExplorer(credentials)
+        paths = explorer.get_join_paths(owner, source, target, bool_arg("infer"), max_paths)
+        return jsonify(paths)
+
+
+@api.route("/profile/<owner>/<table>", methods=["POST"])
+def profile_columns(owner, table):
+    """
+    Returns the profiles of the columns of a table (null ratio, distinct
+    count, min/max, lengths and top values) computed by the database on a
+    sample of the table, keyed by column. The columns may be given as query
+    params (eg: /profile/public/patients?columns=name&columns=gender),
+    all the columns are profiled otherwise.
+    """
+    credentials = request.get_json()
+    columns = request.args.getlist("columns")
+
+    with database_errors():
+        explorer = DatabaseExplorer(credentials, query_timeout=query_timeout())
+        profiles = explorer.profile_columns(owner, table, columns)
+        return jsonify(profiles)
+
+
+@api.route("/complete/<owner>/<table>/<column>", methods=["POST"])
+def complete_column(owner, table, column):
+    """
+    Completion of filter values: returns the most frequent values of a
+    text column which start with ?prefix= (among the first matching rows)
+    and their number of occurrences, eg: [{"value": "Paris", "count": 12}].
+    The number of values may be specified with ?first=10.
+    """
+    credentials = request.get_json()
+    prefix = request.args.get("prefix", "")
+    top = request.args.get("first", 10, type=int)
+    if top < 1:
+        raise OperationOutcome("The number of completions (?first=) must be at least 1")
+
+    with database_errors():
+        explorer = DatabaseExplorer(credentials, query_timeout=query_timeout())
+        completions = explorer.complete_column(owner, table, column, prefix, top)
+        return jsonify(completions)
+
+
+@api.route("/search/<owner>/<query>", methods=["POST"])
+def search_owner_schema(owner, query):
+    """
+    Fuzzy search of the tables and columns of an owner by name, the best
+    matches come first, eg: [{"table": "patients", "column": "birth_date",
+    "score": 0.64}] (column is null for tables). The number of matches may
+    be specified with ?first=20 and ?table=<table> only searches the
+    columns of a table.
+    """
+    credentials = request.get_json()
+    limit = request.args.get("first", 20, type=int)
+    table = request.args.get("table")
+
+    with database_errors():
+        explorer = DatabaseExplorer(credentials)
+        matches = explorer.search_owner_schema(owner, query, limit, table)
+        return jsonify(matches)
+
+
+@api.route("/invalidate_owner_schema/<owner>", methods=["POST"])
+def invalidate_owner_schema(owner):
+    """
+    Drops the cached schema of an owner so that the next call to
+    /get_owner_schema reads it again from the database.
+    """
+    credentials = request.get_json()
+
+    with database_errors():
+        explorer = DatabaseExplorer(credentials)
+        return jsonify({"invalidated": explorer.invalidate_owner_schema(owner)})
+
+
+@api.route("/refresh_owner_schema/<owner>", methods=["POST"])
+def refresh_owner_schema(owner):
+    """
+    Re-reads the tables of an owner whose definition changed since the last
+    refresh and returns the tables and columns which were added, removed or
+    modified.
+    """
+    credentials = request.get_json()
+
+    with database_errors():
+        explorer = DatabaseExplorer(credentials)
+        return jsonify(explorer.refresh_owner_schema(owner))
+
+
+@api.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Prometheus metrics (see pagai.metrics) in the text exposition format.
+    """
+    return Response(generate_latest(), content_type=CONTENT_TYPE_LATEST)
 
 
 @api.errorhandler(OperationOutcome)
@@ -95,3 +473,8 @@ def handle_authentication_error(e):
 @api.errorhandler(AuthorizationError)
 def handle_authorization_error(e):
     return jsonify({"error": str(e)}), 403
+
+
+@api.errorhandler(ServiceUnavailable)
+def handle_service_unavailable(e):
+    return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
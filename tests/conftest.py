@@ -4,7 +4,16 @@ import pytest
 import pandas as pd
 from sqlalchemy import create_engine
 
-from pagai.services.database_explorer import get_sql_url, table_exists
+from pagai.services.database_explorer import (
+    completion_cache,
+    get_sql_url,
+    profile_cache,
+    schema_cache,
+    statement_cache,
+    table_exists,
+)
+from pagai.services.pyrog import pyrog
+from pagai.services.query_planner import compiled_cache
 from tests.settings import DATABASES
 
 
@@ -13,6 +22,25 @@ def get_test_data_path(filename: str) -> str:
     return osp.join(this_directory, "data", filename)
 
 
+@pytest.fixture(autouse=True)
+def empty_caches():
+    """
+    Empty the module-level caches after each test, even a failed one:
+    schemas (with catalogs, stats and search indexes), statements and their
+    compiled forms, profiles, completions and Pyrog resources.
+    """
+    yield
+    for cache in [
+        schema_cache,
+        statement_cache,
+        compiled_cache,
+        profile_cache,
+        completion_cache,
+        pyrog.resource_cache,
+    ]:
+        cache.clear()
+
+
 @pytest.fixture(scope="session", params=list(DATABASES.keys()))
 def db_config(request):
     db_driver = request.param
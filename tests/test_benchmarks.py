@@ -0,0 +1,27 @@
+from benchmarks.bench_fetch import parse_args as parse_fetch_args, run as run_fetch
+from benchmarks.bench_explorer import parse_args, regressions, run
+
+
+class TestBenchmarks:
+    def test_run_on_a_small_schema(self):
+        args = parse_args(["--tables", "20", "--columns", "8", "--rows", "20", "--iterations", "2"])
+
+        results = run(args)
+
+        assert "explore joins" in results
+        assert all(result["p50_ms"] > 0 for result in results.values())
+        assert regressions(results, results, tolerance=0.2) == []
+
+    def test_fetch_benchmark(self):
+        args = parse_fetch_args(["--rows", "20", "--columns", "8", "--iterations", "1"])
+
+        results = run_fetch(args)
+
+        assert {result["profile"] for result in results} == {
+            "untuned",
+            "default",
+            "50 rows",
+            "500 rows",
+            "5000 rows",
+        }
+        assert all(result["rows_per_s"] > 0 for result in results)
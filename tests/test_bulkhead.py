@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+from pagai.errors import ServiceUnavailable
+from pagai.services.bulkhead import Bulkhead
+
+
+class TestBulkhead:
+    def test_queries_wait_for_a_slot(self):
+        bulkhead = Bulkhead(max_concurrent=1, max_queue=1, queue_timeout=5)
+        bulkhead.acquire()
+
+        thread = threading.Thread(target=bulkhead.acquire)
+        thread.start()
+        while bulkhead.stats()["queued"] == 0:
+            pass
+        bulkhead.release()
+        thread.join()
+
+        assert bulkhead.stats()["active"] == 1
+        assert bulkhead.stats()["queued"] == 0
+
+    def test_queries_are_rejected_when_the_queue_is_full(self):
+        bulkhead = Bulkhead(max_concurrent=1, max_queue=0, queue_timeout=5)
+        bulkhead.acquire()
+
+        with pytest.raises(ServiceUnavailable):
+            bulkhead.acquire()
+        assert bulkhead.stats()["rejected"] == 1
+
+    def test_queries_are_rejected_after_the_queue_timeout(self):
+        bulkhead = Bulkhead(max_concurrent=1, max_queue=1, queue_timeout=0.01)
+        bulkhead.acquire()
+
+        with pytest.raises(ServiceUnavailable):
+            bulkhead.acquire()
+        assert bulkhead.stats()["queued"] == 0
+
+    def test_slots_can_be_released_by_another_thread(self):
+        bulkhead = Bulkhead(max_concurrent=1, max_queue=0)
+        slot = bulkhead.slot()
+        slot.__enter__()
+        assert bulkhead.stats()["active"] == 1
+
+        thread = threading.Thread(target=slot.__exit__, args=(None, None, None))
+        thread.start()
+        thread.join()
+
+        assert bulkhead.stats()["active"] == 0
+        with bulkhead.slot():
+            assert bulkhead.stats()["active"] == 1
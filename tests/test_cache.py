@@ -0,0 +1,77 @@
+from pagai.services.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache:
+    def test_get_set(self):
+        cache = TTLCache(ttl=60, max_weight=10)
+        assert cache.get("key") is None
+
+        cache.set("key", {"table": ["column"]})
+        assert cache.get("key") == {"table": ["column"]}
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_entries_expire(self):
+        clock = FakeClock()
+        cache = TTLCache(ttl=60, max_weight=10, clock=clock)
+
+        cache.set("key", "value")
+        clock.now = 59
+        assert cache.get("key") == "value"
+        clock.now = 60
+        assert cache.get("key") is None
+        assert len(cache) == 0
+
+    def test_weight_bound_evicts_least_recently_used(self):
+        cache = TTLCache(ttl=60, max_weight=5, weigh=len)
+
+        cache.set("a", [1, 2])
+        cache.set("b", [1, 2])
+        cache.get("a")
+        cache.set("c", [1, 2])
+
+        assert cache.get("a") == [1, 2]
+        assert cache.get("b") is None
+        assert cache.get("c") == [1, 2]
+        assert cache.stats()["weight"] == 4
+        assert cache.stats()["evictions"] == 1
+
+    def test_values_heavier_than_the_bound_are_not_cached(self):
+        cache = TTLCache(ttl=60, max_weight=2, weigh=len)
+
+        cache.set("a", [1])
+        cache.set("b", [1, 2, 3])
+
+        assert cache.get("a") == [1]
+        assert cache.get("b") is None
+
+    def test_invalidate_prefix(self):
+        cache = TTLCache(ttl=60, max_weight=10)
+
+        cache.set(("db", "owner"), "schema")
+        cache.set(("db", "owner", "stats"), "stats")
+        cache.set(("db", "other_owner"), "schema")
+
+        assert cache.invalidate_prefix(("db", "owner")) == 2
+        assert cache.get(("db", "owner")) is None
+        assert cache.get(("db", "other_owner")) == "schema"
+
+    def test_stats_by_label(self):
+        cache = TTLCache(ttl=60, max_weight=2, label=lambda key: key[0])
+        cache.set(("a", 1), "value")
+        cache.get(("a", 1))
+        cache.get(("b", 1))
+        cache.set(("b", 1), "value")
+        cache.set(("b", 2), "value")
+
+        stats = cache.stats_by_label()
+        assert stats["a"] == {"entries": 0, "weight": 0, "hits": 1, "misses": 0, "evictions": 1}
+        assert stats["b"] == {"entries": 2, "weight": 2, "hits": 0, "misses": 1, "evictions": 0}
@@ -0,0 +1,147 @@
+from sqlalchemy import types
+from sqlalchemy.dialects import postgresql
+
+from pagai.services.catalog import (
+    catalog_diff,
+    catalog_type,
+    LargeObject,
+    MSSQL_CATALOG_TYPES,
+    ORACLE_CATALOG_TYPES,
+    OwnerCatalog,
+    POSTGRES_CATALOG_TYPES,
+    table_stats_from_rows,
+)
+
+
+def catalog_row(
+    table_name,
+    column_name,
+    data_type,
+    is_nullable="YES",
+    is_primary_key=0,
+    precision=None,
+    scale=None,
+):
+    return {
+        "table_name": table_name,
+        "column_name": column_name,
+        "data_type": data_type,
+        "data_precision": precision,
+        "data_scale": scale,
+        "is_nullable": is_nullable,
+        "is_primary_key": is_primary_key,
+    }
+
+
+class TestOwnerCatalog:
+    def test_catalog_type(self):
+        assert isinstance(catalog_type("character varying"), types.String)
+        assert isinstance(catalog_type("timestamp without time zone"), types.DateTime)
+        assert isinstance(catalog_type("date"), types.Date)
+        assert isinstance(catalog_type("DATE", ORACLE_CATALOG_TYPES), types.DateTime)
+        assert not isinstance(catalog_type("text"), LargeObject)
+        assert isinstance(catalog_type("text", MSSQL_CATALOG_TYPES), LargeObject)
+        assert isinstance(catalog_type("CLOB", ORACLE_CATALOG_TYPES), LargeObject)
+        assert isinstance(catalog_type("NUMBER"), types.Numeric)
+        assert isinstance(catalog_type("geometry"), types.NullType)
+        assert isinstance(catalog_type("bit", MSSQL_CATALOG_TYPES), types.Boolean)
+        assert not isinstance(catalog_type("bit varying"), types.Boolean)
+        assert isinstance(catalog_type("timestamp", MSSQL_CATALOG_TYPES), types.LargeBinary)
+        assert isinstance(catalog_type("rowversion", MSSQL_CATALOG_TYPES), types.LargeBinary)
+        assert isinstance(catalog_type("money", POSTGRES_CATALOG_TYPES), postgresql.MONEY)
+
+    def test_oracle_numbers(self):
+        integer = catalog_type("NUMBER", ORACLE_CATALOG_TYPES, precision=None, scale=0)
+        decimal = catalog_type("NUMBER", ORACLE_CATALOG_TYPES, precision=10, scale=2)
+        number = catalog_type("NUMBER", ORACLE_CATALOG_TYPES)
+
+        # Integers are read as ints, as with reflection.
+        assert isinstance(integer, types.Integer)
+        assert not integer.asdecimal
+        assert isinstance(catalog_type("NUMBER", ORACLE_CATALOG_TYPES, 9, 0), types.Integer)
+        assert decimal.asdecimal and not isinstance(decimal, types.Integer)
+        assert not number.asdecimal and not isinstance(number, types.Integer)
+
+    def test_from_rows(self):
+        catalog = OwnerCatalog.from_rows(
+            "public",
+            [
+                catalog_row("patients", "id", "integer", "NO", 1),
+                catalog_row("patients", "name", "text"),
+                catalog_row("UPPERCASE", "ID", "NUMBER", "N", 1),
+            ],
+        )
+
+        assert "patients" in catalog
+        assert "unknown" not in catalog
+        assert len(catalog) == 3
+        assert catalog.column_names("patients") == ["id", "name"]
+        assert catalog.primary_key("patients") == ["id"]
+        assert not catalog.columns["UPPERCASE"][0].nullable
+        assert catalog.find_table("uppercase") == "UPPERCASE"
+        assert catalog.find_table("unknown") is None
+
+    def test_tables_are_memoized(self):
+        catalog = OwnerCatalog.from_rows(
+            "public", [catalog_row("patients", "id", "integer", "NO", 1)]
+        )
+
+        table = catalog.table("patients")
+        assert table is catalog.table("patients")
+        assert table.schema == "public"
+        assert list(table.c.keys()) == ["id"]
+        assert isinstance(table.c.id.type, types.Integer)
+
+
+class TestCatalogDiff:
+    def test_updated_catalog_diff(self):
+        old = OwnerCatalog.from_rows(
+            "public",
+            [
+                catalog_row("patients", "id", "integer", "NO", 1),
+                catalog_row("patients", "name", "text"),
+                catalog_row("patients", "age", "integer"),
+                catalog_row("visits", "id", "integer", "NO", 1),
+                catalog_row("old", "id", "integer"),
+            ],
+        )
+        changed = OwnerCatalog.from_rows(
+            "public",
+            [
+                catalog_row("patients", "id", "integer", "NO", 1),
+                catalog_row("patients", "name", "text", "NO"),
+                catalog_row("patients", "birth_date", "date"),
+                catalog_row("doctors", "id", "integer", "NO", 1),
+            ],
+        )
+
+        new = old.updated(changed.columns, ["old"])
+
+        assert list(new.columns) == ["visits", "patients", "doctors"]
+        assert new.primary_key("visits") == ["id"]
+        assert "old" in old
+        assert catalog_diff(old, new) == {
+            "added": {"doctors": ["id"]},
+            "removed": ["old"],
+            "modified": {
+                "patients": {"added": ["birth_date"], "removed": ["age"], "changed": ["name"]}
+            },
+        }
+        assert catalog_diff(new, new) == {"added": {}, "removed": [], "modified": {}}
+
+
+class TestTableStats:
+    def test_table_stats_from_rows(self):
+        stats = table_stats_from_rows(
+            [
+                {"table_name": "patients", "row_count": 1000.0, "size": 65536},
+                {"table_name": "never_analyzed", "row_count": -1, "size": 8192},
+                {"table_name": "no_stats", "row_count": None, "size": None},
+            ]
+        )
+
+        assert stats == {
+            "patients": {"rows": 1000, "size": 65536},
+            "never_analyzed": {"rows": None, "size": 8192},
+            "no_stats": {"rows": None, "size": None},
+        }
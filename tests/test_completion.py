@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+from sqlalchemy.dialects import mssql, oracle, postgresql
+
+from benchmarks.sqlite_explorer import make_credentials, OWNER, SQLiteExplorer
+from benchmarks.synthetic import create_database
+from pagai.errors import OperationOutcome
+from pagai.services.completion import Completions, completions_statement, like_prefix
+from tests.test_profiling import CATALOG
+
+
+class TestCompletion:
+    def test_like_prefix(self):
+        assert like_prefix("Par") == "Par%"
+        assert like_prefix("") == "%"
+        assert like_prefix("10%_a/b") == "10/%/_a//b%"
+
+    @pytest.mark.parametrize("dialect", [postgresql, oracle, mssql])
+    def test_statement(self, dialect):
+        statement = completions_statement(CATALOG.table("patients"), "name", 100, 5)
+        statement = str(statement.compile(dialect=dialect.dialect()))
+
+        assert "LIKE" in statement and "ESCAPE '/'" in statement
+        assert "GROUP BY pagai_completed.name ORDER BY count(*) DESC" in statement
+
+    def test_narrowed(self):
+        rows = [{"value": "Paris", "frequency": 3}, {"value": "Pau", "frequency": 1}]
+
+        completions = Completions.from_rows(rows, 100, 5)
+        assert completions.complete
+        assert completions.narrowed("Par").values == [{"value": "Paris", "count": 3}]
+        assert not Completions.from_rows(rows, 4, 5).complete
+        assert not Completions.from_rows(rows, 100, 1).complete
+        assert Completions.from_rows(rows, 100, 1).values == [{"value": "Paris", "count": 3}]
+
+
+class TestExplorerCompletion:
+    def test_complete_column(self, tmp_path):
+        path = str(tmp_path / "explored.db")
+        create_database(path, n_tables=2, n_columns=4, n_rows=50, n_joins=1)
+        explorer = SQLiteExplorer(make_credentials(path))
+
+        completions = explorer.complete_column(OWNER, "link_0", "label", "label-1", top=100)
+
+        assert completions
+        assert all(value["value"].startswith("label-1") for value in completions)
+        assert completions == sorted(completions, key=lambda value: -value["count"])
+        # Narrowed from the complete completions of "label-1".
+        narrowed = explorer.complete_column(OWNER, "link_0", "label", "label-10", top=100)
+        assert narrowed == [value for value in completions if value["value"].startswith("label-10")]
+        assert len(explorer.complete_column(OWNER, "link_0", "label", "", top=1)) == 1
+
+        with pytest.raises(OperationOutcome, match="is not a text column"):
+            explorer.complete_column(OWNER, "link_0", "id", "1")
+        with pytest.raises(OperationOutcome, match="Column unknown does not exist"):
+            explorer.complete_column(OWNER, "link_0", "unknown", "1")
+
+    def test_complete_text_column(self, tmp_path):
+        path = str(tmp_path / "explored.db")
+        create_database(path, n_tables=1, n_columns=2, n_rows=1, n_joins=0)
+        with sqlite3.connect(path) as connection:
+            connection.execute("create table notes (id integer primary key, body text)")
+            connection.executemany(
+                "insert into notes (body) values (?)", [("fever",), ("fever",), ("cough",)]
+            )
+        explorer = SQLiteExplorer(make_credentials(path))
+
+        assert explorer.complete_column(OWNER, "notes", "body", "fe") == [
+            {"value": "fever", "count": 2}
+        ]
@@ -0,0 +1,127 @@
+from sqlalchemy import types
+
+from benchmarks.sqlite_explorer import make_credentials, OWNER, SQLiteExplorer
+from benchmarks.synthetic import create_database
+from pagai.services.catalog import CatalogColumn, ForeignKey, foreign_keys_from_rows, OwnerCatalog
+from pagai.services.dependency_graph import DependencyGraph, inferred_foreign_keys
+
+FOREIGN_KEYS = [
+    ForeignKey("visits", ("patient_id",), "patients", ("id",), False),
+    ForeignKey("visits", ("doctor_id",), "doctors", ("id",), False),
+    ForeignKey("prescriptions", ("visit_id",), "visits", ("id",), False),
+    ForeignKey("prescriptions", ("doctor_id",), "doctors", ("id",), False),
+    ForeignKey("addresses", ("patient_id",), "patients", ("id",), True),
+]
+
+
+def join(table, column, joined_table, joined_column, inferred=False):
+    return {
+        "table": table,
+        "columns": [column],
+        "joined_table": joined_table,
+        "joined_columns": [joined_column],
+        "inferred": inferred,
+    }
+
+
+class TestDependencyGraph:
+    def test_foreign_keys_from_rows(self):
+        rows = [
+            {
+                "table_name": "visits",
+                "constraint_name": "fk_patient",
+                "column_name": column,
+                "referenced_table_name": "patients",
+                "referenced_column_name": referenced_column,
+            }
+            for column, referenced_column in [("patient_site", "site"), ("patient_id", "id")]
+        ]
+
+        assert foreign_keys_from_rows(rows) == [
+            ForeignKey("visits", ("patient_site", "patient_id"), "patients", ("site", "id"), False)
+        ]
+
+    def test_inferred_foreign_keys(self):
+        catalog = OwnerCatalog(
+            "public",
+            {
+                "patients": [CatalogColumn("id", types.Integer(), False, True)],
+                "categories": [CatalogColumn("code", types.String(), False, True)],
+                "visits": [
+                    CatalogColumn("id", types.Integer(), False, True),
+                    CatalogColumn("patient_id", types.Numeric(), True, False),
+                    CatalogColumn("CategoryCode", types.String(), True, False),
+                    CatalogColumn("doctor_id", types.Integer(), True, False),
+                ],
+                "notes": [CatalogColumn("patient_id", types.String(), True, False)],
+            },
+        )
+        foreign_keys = [ForeignKey("visits", ("patient_id",), "patients", ("id",), False)]
+
+        assert inferred_foreign_keys(catalog, foreign_keys) == [
+            ForeignKey("visits", ("CategoryCode",), "categories", ("code",), True)
+        ]
+
+    def test_join_paths(self):
+        graph = DependencyGraph(FOREIGN_KEYS)
+
+        assert graph.join_paths("patients", "patients") == [[]]
+        assert graph.join_paths("patients", "prescriptions") == [
+            [
+                join("patients", "id", "visits", "patient_id"),
+                join("visits", "id", "prescriptions", "visit_id"),
+            ]
+        ]
+        assert graph.join_paths("patients", "doctors") == [
+            [
+                join("patients", "id", "visits", "patient_id"),
+                join("visits", "doctor_id", "doctors", "id"),
+            ]
+        ]
+        assert graph.join_paths("prescriptions", "visits") == [
+            [join("prescriptions", "visit_id", "visits", "id")]
+        ]
+        assert graph.join_paths("addresses", "patients") == []
+        assert graph.join_paths("addresses", "patients", inferred=True) == [
+            [join("addresses", "patient_id", "patients", "id", inferred=True)]
+        ]
+        assert graph.join_paths("unknown", "patients") == []
+
+    def test_all_shortest_paths(self):
+        # Prescriptions and visits both reference doctors and patients.
+        graph = DependencyGraph(
+            [
+                ForeignKey("visits", ("patient_id",), "patients", ("id",), False),
+                ForeignKey("visits", ("doctor_id",), "doctors", ("id",), False),
+                ForeignKey("prescriptions", ("patient_id",), "patients", ("id",), False),
+                ForeignKey("prescriptions", ("doctor_id",), "doctors", ("id",), False),
+            ]
+        )
+
+        paths = graph.join_paths("patients", "doctors")
+
+        assert [[step["joined_table"] for step in path] for path in paths] == [
+            ["visits", "doctors"],
+            ["prescriptions", "doctors"],
+        ]
+        assert len(graph.join_paths("patients", "doctors", max_paths=1)) == 1
+
+
+class TestExplorerDependencyGraph:
+    def test_dependency_graph(self, tmp_path):
+        path = str(tmp_path / "explored.db")
+        create_database(path, n_tables=4, n_columns=2, n_rows=1, n_joins=2)
+        explorer = SQLiteExplorer(make_credentials(path))
+
+        graph = explorer.get_dependency_graph(OWNER)
+
+        assert graph.foreign_keys() == [
+            ForeignKey("link_0", ("parent_id",), "wide", ("id",), False)._asdict(),
+            ForeignKey("link_1", ("parent_id",), "link_0", ("id",), False)._asdict(),
+        ]
+        assert explorer.get_join_paths(OWNER, "wide", "link_1") == [
+            [join("wide", "id", "link_0", "parent_id"), join("link_0", "id", "link_1", "parent_id")]
+        ]
+        assert explorer.get_join_paths(OWNER, "WIDE", "Link_1") == explorer.get_join_paths(
+            OWNER, "wide", "link_1"
+        )
@@ -0,0 +1,76 @@
+from pagai.services.database_explorer import get_sql_url, POSTGRES
+from pagai.services.engine_registry import credentials_key, EngineRegistry
+
+
+def make_config(login="test"):
+    return {
+        "model": POSTGRES,
+        "host": "localhost",
+        "port": 5432,
+        "database": "test",
+        "login": login,
+        "password": "secret",
+    }
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestEngineRegistry:
+    def test_credentials_key(self):
+        assert credentials_key(make_config()) == credentials_key(make_config())
+        assert credentials_key(make_config()) != credentials_key(make_config("other"))
+        assert "secret" not in credentials_key(make_config())
+
+    def test_engines_are_reused(self):
+        registry = EngineRegistry()
+        config = make_config()
+
+        engine = registry.get_engine(get_sql_url(POSTGRES, config), config)
+        assert registry.get_engine(get_sql_url(POSTGRES, config), config) is engine
+        assert len(registry) == 1
+
+        other_config = make_config("other")
+        assert registry.get_engine(get_sql_url(POSTGRES, other_config), other_config) is not engine
+        assert len(registry) == 2
+
+    def test_least_recently_used_engines_are_evicted(self):
+        registry = EngineRegistry(max_engines=2)
+        configs = [make_config(f"user{i}") for i in range(3)]
+
+        for config in configs[:2]:
+            registry.get_engine(get_sql_url(POSTGRES, config), config)
+        # Use the first engine again so that the second one becomes the LRU.
+        registry.get_engine(get_sql_url(POSTGRES, configs[0]), configs[0])
+        registry.get_engine(get_sql_url(POSTGRES, configs[2]), configs[2])
+
+        assert len(registry) == 2
+        assert configs[0] in registry
+        assert configs[1] not in registry
+        assert configs[2] in registry
+
+    def test_idle_engines_are_evicted(self):
+        clock = FakeClock()
+        registry = EngineRegistry(idle_timeout=60, clock=clock)
+        config, other_config = make_config(), make_config("other")
+
+        registry.get_engine(get_sql_url(POSTGRES, config), config)
+        clock.now = 120
+        registry.get_engine(get_sql_url(POSTGRES, other_config), other_config)
+
+        assert config not in registry
+        assert other_config in registry
+
+    def test_pool_configuration(self):
+        registry = EngineRegistry(pool_size=3, pool_recycle=42)
+        config = make_config()
+
+        engine = registry.get_engine(get_sql_url(POSTGRES, config), config)
+        assert engine.pool.size() == 3
+        assert engine.pool._recycle == 42
+        assert engine.pool._pre_ping
@@ -102,6 +102,26 @@ class TestExploration:
                 Counter(expected_row) == Counter(actual_row) for actual_row in exploration["rows"]
             )
 
+    def test_explore_sample(self, db_config):
+        explorer = DatabaseExplorer(db_config)
+        table = "PATIENTS" if db_config["model"] in [ORACLE11, ORACLE] else "patients"
+
+        exploration = explorer.explore(
+            owner=db_config["owner"], table_name=table, limit=2, sample=True
+        )
+        assert len(exploration["fields"]) == 4
+        assert len(exploration["rows"]) <= 2
+
+    def test_stream(self, db_config):
+        explorer = DatabaseExplorer(db_config)
+        table = "PATIENTS" if db_config["model"] in [ORACLE11, ORACLE] else "patients"
+
+        rows = explorer.stream(owner=db_config["owner"], table_name=table, limit=2)
+        TestCase().assertCountEqual(
+            [field.lower() for field in rows.fields], ["index", "patient_id", "gender", "date"]
+        )
+        assert len(list(rows)) == 2
+
     def test_owners(self, db_config):
         explorer = DatabaseExplorer(db_config)
         owners = explorer.get_owners()
@@ -112,6 +132,34 @@ class TestExploration:
         db_schema = explorer.get_owner_schema(db_config["owner"])
         self.verify_schema_structure(db_schema)
 
+    def test_get_owner_schemas(self, db_config):
+        explorer = DatabaseExplorer(db_config)
+        owners = explorer.get_owners()
+        db_schemas = explorer.get_owner_schemas(owners)
+
+        TestCase().assertCountEqual(db_schemas.keys(), owners)
+        self.verify_schema_structure(db_schemas[db_config["owner"]])
+
+    def test_get_owner_catalog(self, db_config):
+        explorer = DatabaseExplorer(db_config)
+        catalog = explorer.get_owner_catalog(db_config["owner"])
+
+        table = "PATIENTS" if db_config["model"] in [ORACLE11, ORACLE] else "patients"
+        assert table in catalog
+        TestCase().assertCountEqual(
+            [col.lower() for col in catalog.column_names(table)],
+            ["index", "patient_id", "gender", "date"],
+        )
+        assert explorer.get_owner_catalog(db_config["owner"]) is catalog
+
+    def test_get_table_stats(self, db_config):
+        explorer = DatabaseExplorer(db_config)
+        stats = explorer.get_table_stats(db_config["owner"])
+
+        table = "PATIENTS" if db_config["model"] in [ORACLE11, ORACLE] else "patients"
+        assert table in stats
+        assert set(stats[table].keys()) == {"rows", "size"}
+
     def test_case_sensitivity(self, db_config):
         explorer = DatabaseExplorer(db_config)
         db_schema = explorer.get_owner_schema(db_config["owner"])
@@ -0,0 +1,64 @@
+from sqlalchemy import create_engine, event
+
+from pagai.services import fetch_tuning
+from pagai.services.database_explorer import get_sql_url, MSSQL
+from pagai.services.fetch_tuning import (
+    fetch_options,
+    fetch_profile,
+    fetch_size,
+    FetchProfile,
+    tune_fetches,
+)
+
+CONFIG = {
+    "model": MSSQL,
+    "host": "localhost",
+    "port": 1433,
+    "database": "emr",
+    "login": "test",
+    "password": "secret",
+}
+
+
+class TestFetchTuning:
+    def test_fetch_size(self):
+        profile = FetchProfile(1000, 10000, None, False)
+
+        assert fetch_size(profile, 10, 5) == 11
+        assert fetch_size(profile, 100_000, 5) == 1000
+        # Wide tables are fetched by fewer rows.
+        assert fetch_size(profile, 100_000, 200) == 50
+        assert fetch_size(profile, 100_000, 100_000) == 1
+        assert fetch_size(profile, None, 5) is None
+        assert fetch_size(profile._replace(default_rows=500), None, 5) == 500
+
+    def test_fetch_profile(self, monkeypatch):
+        assert fetch_profile(CONFIG).mars
+        assert "MARS_Connection=Yes" in get_sql_url(MSSQL, CONFIG)
+
+        monkeypatch.setattr(
+            fetch_tuning,
+            "FETCH_PROFILES",
+            {"MSSQL": {"max_rows": 100}, "localhost:1433/emr": {"mars": False}},
+        )
+
+        assert fetch_profile(CONFIG) == FetchProfile(100, 200_000, None, False)
+        assert fetch_profile({**CONFIG, "database": "other"}).mars
+        assert "MARS_Connection" not in get_sql_url(MSSQL, CONFIG)
+
+    def test_tune_fetches(self):
+        engine = create_engine("sqlite://")
+        tune_fetches(engine, FetchProfile(1000, 10000, None, False))
+        # sqlite3 cursors have an arraysize, like cx_Oracle ones.
+        engine.dialect.name = "oracle"
+        arraysizes = []
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def record_arraysize(connection, cursor, *args):
+            arraysizes.append(cursor.arraysize)
+
+        with engine.connect() as connection:
+            connection.execution_options(**fetch_options(10, 3)).execute("select 1").fetchall()
+            connection.execute("select 1").fetchall()
+
+        assert arraysizes == [11, 1]
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import types
+
+from pagai.app import app
+from pagai.formats import arrow_chunks, columnar_json, csv_chunks, ndjson_chunks
+
+FIELDS = ["id", "name", "date"]
+TYPES = [types.Integer(), types.String(), types.DateTime()]
+ROWS = [(i, f"name{i}", datetime(2020, 1, i + 1)) for i in range(5)]
+
+
+class TestStreamFormats:
+    def test_ndjson_chunks(self):
+        with app.app_context():
+            chunks = list(ndjson_chunks(FIELDS, TYPES, iter(ROWS), chunk_size=2))
+
+        # The field names are sent on their own before any row.
+        assert chunks[0] == '{"fields":["id","name","date"]}\n'
+        assert len(chunks) == 4
+        lines = "".join(chunks[1:]).splitlines()
+        assert len(lines) == 5
+        assert lines[0] == '[0,"name0","2020-01-01T00:00:00"]'
+
+    def test_csv_chunks(self):
+        chunks = list(csv_chunks(FIELDS, TYPES, iter(ROWS), chunk_size=2))
+
+        assert chunks[0] == "id,name,date\r\n"
+        assert len(chunks) == 4
+        assert chunks[1] == "0,name0,2020-01-01T00:00:00\r\n1,name1,2020-01-02T00:00:00\r\n"
+
+    def test_columnar_json(self):
+        with app.app_context():
+            output = columnar_json({"fields": FIELDS, "rows": ROWS[:2]}, TYPES)
+
+        assert output == (
+            '{"columns":[[0,1],["name0","name1"],'
+            '["2020-01-01T00:00:00","2020-01-02T00:00:00"]],"fields":["id","name","date"]}\n'
+        )
+
+    def test_columnar_json_without_rows(self):
+        with app.app_context():
+            output = columnar_json({"fields": FIELDS, "rows": []}, TYPES)
+
+        assert output == '{"columns":[[],[],[]],"fields":["id","name","date"]}\n'
+
+    def test_arrow_chunks(self):
+        pyarrow = pytest.importorskip("pyarrow")
+
+        chunks = list(arrow_chunks(FIELDS, TYPES, iter(ROWS), chunk_size=2))
+        table = pyarrow.ipc.open_stream(b"".join(chunks)).read_all()
+
+        assert table.schema.names == FIELDS
+        assert table.num_rows == 5
+        assert table.column("date").to_pylist()[0] == datetime(2020, 1, 1)
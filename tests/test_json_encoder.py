@@ -0,0 +1,73 @@
+import datetime
+import decimal
+
+import pytest
+from flask import jsonify
+from sqlalchemy import types
+
+from pagai import json_encoder
+from pagai.app import app
+from pagai.json_encoder import RowSerializer
+
+FIELDS = ["id", "name", "birth_date", "visit_time", "weight", "ratio", "unknown"]
+COLUMN_TYPES = [
+    types.Integer(),
+    types.String(),
+    types.Date(),
+    types.DateTime(),
+    types.Numeric(),
+    types.Float(),
+    types.NullType(),
+]
+ROWS = [
+    [
+        1,
+        "Jeanne d'Arc \x7f é",
+        datetime.date(1412, 1, 6),
+        datetime.datetime(2020, 3, 5, 10, 30, 12, 42),
+        decimal.Decimal("65.10"),
+        1e-05,
+        decimal.Decimal("3.3"),
+    ],
+    [2 ** 70, None, None, None, None, 0.5, datetime.date(2020, 1, 1)],
+]
+
+
+@pytest.fixture(params=[True, False], ids=["orjson", "no-orjson"])
+def fast_json(request, monkeypatch):
+    if not request.param:
+        monkeypatch.setattr(json_encoder, "orjson", None)
+
+
+class TestRowSerializer:
+    def test_same_output_as_jsonify(self, fast_json):
+        with app.app_context():
+            expected = jsonify({"fields": FIELDS, "rows": ROWS}).get_data()
+            response = RowSerializer(COLUMN_TYPES).jsonify({"fields": FIELDS, "rows": ROWS})
+
+        assert response.get_data() == expected
+        assert response.mimetype == "application/json"
+
+    def test_same_output_as_jsonify_with_fast_json_types(self, fast_json):
+        rows = [[row[0], row[1], row[2], row[3]] for row in ROWS] + [
+            [3, "ascii", datetime.date(2000, 1, 1), datetime.datetime(2000, 1, 1)]
+        ]
+        with app.app_context():
+            expected = jsonify({"fields": FIELDS[:4], "rows": rows}).get_data()
+            serializer = RowSerializer(COLUMN_TYPES[:4])
+
+            assert serializer.jsonify({"fields": FIELDS[:4], "rows": rows}).get_data() == expected
+            # Each row on its own.
+            for row in rows:
+                assert serializer.dumps(serializer.convert_rows([row])[0]) + "\n" == (
+                    jsonify(row).get_data(as_text=True)
+                )
+
+    def test_converters_are_chosen_once_per_column(self):
+        with app.app_context():
+            serializer = RowSerializer(COLUMN_TYPES)
+
+        converted_columns = [index for index, _ in serializer.converters]
+        assert 0 not in converted_columns
+        assert 1 not in converted_columns
+        assert 2 in converted_columns
@@ -0,0 +1,53 @@
+from pagai.app import create_app
+from pagai.metrics import bulkhead_metrics, compiled_metrics, pool_metrics, timed
+from pagai.services.database_explorer import db_models, schema_cache
+
+
+class TestMetrics:
+    def test_metrics_endpoint(self, monkeypatch):
+        with timed("catalog", "POSTGRES"):
+            pass
+        monkeypatch.setitem(db_models, "db", "ORACLE")
+        schema_cache.set(("db", "owner"), {"patients": ["id"]})
+
+        response = create_app().test_client().get("/metrics")
+        assert response.status_code == 200
+        body = response.get_data(as_text=True)
+        assert 'pagai_phase_duration_seconds_count{db_model="POSTGRES",phase="catalog"}' in body
+        assert 'pagai_cache_entries{cache="schema",db_model="ORACLE"} 1.0' in body
+
+    def test_pool_metrics_are_summed_by_model(self):
+        pools = [
+            {"model": "POSTGRES", "size": 5, "checked_in": 1, "checked_out": 2, "overflow": -3},
+            {"model": "POSTGRES", "size": 5, "checked_in": 0, "checked_out": 1, "overflow": -4},
+        ]
+        metrics = {metric.name: metric for metric in pool_metrics(pools)}
+
+        assert metrics["pagai_engines"].samples[0].value == 2
+        assert metrics["pagai_pool_checked_out_connections"].samples[0].value == 3
+        assert metrics["pagai_pool_overflow_connections"].samples[0].value == 0
+
+    def test_bulkhead_metrics_are_summed_by_model(self):
+        bulkheads = [
+            {"db_model": "ORACLE", "active": 2, "queued": 1, "rejected": 0},
+            {"db_model": "ORACLE", "active": 1, "queued": 0, "rejected": 3},
+            {"db_model": "MSSQL", "active": 5, "queued": 4, "rejected": 1},
+        ]
+        metrics = {metric.name: metric for metric in bulkhead_metrics(bulkheads)}
+
+        samples = {
+            sample.labels["db_model"]: sample.value
+            for sample in metrics["pagai_db_active_queries"].samples
+        }
+        assert samples == {"ORACLE": 3, "MSSQL": 5}
+
+    def test_compiled_statements_are_counted_by_model(self):
+        oracle, postgres = object(), object()
+        keys = [(oracle, "a"), (oracle, "b"), (postgres, "a")]
+
+        metric = compiled_metrics(keys, {oracle: "ORACLE", postgres: "POSTGRES"})
+
+        assert {sample.labels["db_model"]: sample.value for sample in metric.samples} == {
+            "ORACLE": 2,
+            "POSTGRES": 1,
+        }
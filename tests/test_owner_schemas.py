@@ -0,0 +1,30 @@
+from contextlib import contextmanager
+
+from benchmarks.sqlite_explorer import make_credentials, SQLiteExplorer
+from pagai.services.database_explorer import DatabaseExplorer
+
+ROWS = [
+    {"owner": "DBO", "table_name": "patients", "column_name": "id"},
+    {"owner": "DBO", "table_name": "patients", "column_name": "name"},
+    {"owner": "other", "table_name": "visits", "column_name": "id"},
+]
+
+
+class CatalogConnection:
+    def execute(self, query, owners):
+        return [row for row in ROWS if row["owner"].lower() in [o.lower() for o in owners]]
+
+
+class TestOwnerSchemas:
+    def test_owners_in_another_case(self, tmp_path, monkeypatch):
+        explorer = SQLiteExplorer(make_credentials(str(tmp_path / "explored.db")))
+
+        @contextmanager
+        def connect():
+            yield CatalogConnection()
+
+        monkeypatch.setattr(explorer, "connect", connect)
+
+        schemas = DatabaseExplorer.read_owner_schemas(explorer, ["dbo", "other"])
+
+        assert schemas == {"dbo": {"patients": ["id", "name"]}, "other": {"visits": ["id"]}}
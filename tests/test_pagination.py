@@ -0,0 +1,68 @@
+import datetime
+import decimal
+
+import pytest
+from sqlalchemy.dialects import oracle
+from sqlalchemy.sql import column
+
+from pagai.app import create_app
+from pagai.errors import OperationOutcome
+from pagai.services.pagination import decode_cursor, encode_cursor, keyset_condition, paginate_rows
+
+
+class TestPagination:
+    def test_cursor_round_trip(self):
+        values = [
+            1,
+            "a",
+            None,
+            datetime.datetime(2020, 1, 2, 3, 4, 5),
+            datetime.date(2020, 1, 2),
+            decimal.Decimal("1.10"),
+        ]
+        assert decode_cursor(encode_cursor(values), len(values)) == values
+
+    @pytest.mark.parametrize("cursor", ["not a cursor", encode_cursor([1, 2])])
+    def test_invalid_cursor(self, cursor):
+        with pytest.raises(OperationOutcome):
+            decode_cursor(cursor, 1)
+
+    def test_keyset_condition(self):
+        condition = keyset_condition([column("a"), column("b")], [1, 2])
+        assert str(condition.compile(dialect=oracle.dialect())) == (
+            "a > :a_1 OR a = :a_2 AND b > :b_1"
+        )
+
+    def test_paginate_rows(self):
+        rows = [[1, "a"], [2, "b"], [3, "c"]]
+
+        page, cursor = paginate_rows(rows, 2, [0])
+        assert page == rows[:2]
+        assert decode_cursor(cursor, 1) == [2]
+
+        assert paginate_rows(rows, 3, [0]) == (rows, None)
+
+    @pytest.mark.parametrize(
+        "url,headers",
+        [
+            ("/explore/resource/public/patients/stream?paginate=true", {}),
+            ("/explore/resource/public/patients/stream?format=csv&after=cursor", {}),
+            (
+                "/explore/resource/public/patients?paginate=true",
+                {"Accept": "application/vnd.apache.arrow.stream"},
+            ),
+        ],
+    )
+    def test_streams_are_not_paginated(self, url, headers):
+        response = create_app().test_client().get(url, headers=headers)
+
+        assert response.status_code == 400
+        assert "can't be paginated" in response.get_json()["error"]
+
+    @pytest.mark.parametrize("first", [0, -1])
+    def test_pages_have_rows(self, first):
+        url = f"/explore/resource/public/patients?paginate=true&first={first}"
+        response = create_app().test_client().get(url)
+
+        assert response.status_code == 400
+        assert "must be at least 1" in response.get_json()["error"]
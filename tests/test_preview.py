@@ -0,0 +1,49 @@
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.sqlite_explorer import make_credentials, OWNER, SQLiteExplorer
+from benchmarks.synthetic import create_database
+from pagai.errors import OperationOutcome
+
+
+class TestExplorerPreview:
+    def test_preview_tables(self, tmp_path):
+        path = str(tmp_path / "explored.db")
+        create_database(path, n_tables=3, n_columns=4, n_rows=20, n_joins=2)
+        explorer = SQLiteExplorer(make_credentials(path))
+        previews = [
+            {"owner": OWNER, "table": "link_0", "limit": 5},
+            {"owner": OWNER, "table": "unknown", "limit": 5},
+            {"owner": OWNER, "table": "link_1", "limit": 2},
+        ]
+
+        results = sorted(explorer.preview_tables(previews), key=lambda preview: preview.index)
+
+        assert [preview.index for preview in results] == [0, 1, 2]
+        assert results[0].exploration["fields"] == ["id", "parent_id", "label"]
+        assert len(results[0].exploration["rows"]) == 5
+        assert len(results[0].column_types) == 3
+        assert isinstance(results[1].error, OperationOutcome)
+        assert "Table unknown does not exist" in str(results[1].error)
+        assert len(results[2].exploration["rows"]) == 2
+
+    def test_preview_errors_dont_stop_the_batch(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "explored.db")
+        create_database(path, n_tables=3, n_columns=4, n_rows=20, n_joins=2)
+        explorer = SQLiteExplorer(make_credentials(path))
+
+        def get_column_types(owner, table_name):
+            if table_name == "link_0":
+                raise OperationalError("select", {}, Exception("connection lost"))
+            return []
+
+        monkeypatch.setattr(explorer, "get_column_types", get_column_types)
+        previews = [
+            {"owner": OWNER, "table": "link_0", "limit": 5},
+            {"owner": OWNER, "table": "link_1", "limit": 5},
+        ]
+
+        results = sorted(explorer.preview_tables(previews), key=lambda preview: preview.index)
+
+        assert isinstance(results[0].error, OperationOutcome)
+        assert "connection lost" in str(results[0].error)
+        assert results[1].error is None
@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import types
+from sqlalchemy.dialects import mssql, oracle, postgresql
+
+from benchmarks.sqlite_explorer import make_credentials, OWNER, SQLiteExplorer
+from benchmarks.synthetic import create_database
+from pagai.errors import OperationOutcome
+from pagai.services.catalog import CatalogColumn, LargeObject, OwnerCatalog, UUID
+from pagai.services.profiling import (
+    aggregates_statement,
+    CATEGORICAL,
+    ORDERED,
+    profile_kind,
+    statistics,
+    STRING,
+    top_values_statement,
+)
+
+CATALOG = OwnerCatalog(
+    "public",
+    {
+        "patients": [
+            CatalogColumn("id", types.Integer(), False, True),
+            CatalogColumn("name", types.String(), True, False),
+            CatalogColumn("notes", LargeObject(), True, False),
+        ]
+    },
+)
+
+
+class TestProfiling:
+    def test_profile_kind(self):
+        assert profile_kind(types.String()) == STRING
+        assert profile_kind(types.Text()) == STRING
+        assert profile_kind(LargeObject()) is None
+        assert profile_kind(UUID()) == CATEGORICAL
+        assert profile_kind(types.Boolean()) == CATEGORICAL
+        assert profile_kind(types.Integer()) == ORDERED
+        assert profile_kind(types.DateTime()) == ORDERED
+        assert profile_kind(types.NullType()) is None
+        assert statistics(None) == ["values"]
+        assert statistics(CATEGORICAL) == ["values", "distinct"]
+
+    @pytest.mark.parametrize("dialect", [postgresql, oracle, mssql])
+    def test_statements(self, dialect):
+        table = CATALOG.table("patients")
+
+        aggregates = aggregates_statement(table, CATALOG.columns["patients"], 100)
+        aggregates = str(aggregates.compile(dialect=dialect.dialect()))
+        top_values = top_values_statement(table, "name", 100, 5)
+        top_values = str(top_values.compile(dialect=dialect.dialect()))
+
+        assert "count(DISTINCT pagai_profiled.name) AS c1_distinct" in aggregates
+        assert "c2_values" in aggregates and "c2_distinct" not in aggregates
+        assert "GROUP BY pagai_profiled.name ORDER BY count(*) DESC" in top_values
+
+
+class TestExplorerProfiling:
+    def test_profile_columns(self, tmp_path):
+        path = str(tmp_path / "explored.db")
+        create_database(path, n_tables=2, n_columns=4, n_rows=50, n_joins=1)
+        explorer = SQLiteExplorer(make_credentials(path))
+
+        profiles = explorer.profile_columns(OWNER, "link_0")
+
+        assert list(profiles) == ["id", "parent_id", "label"]
+        assert profiles["id"] == {
+            "rows": 50,
+            "nulls": 0,
+            "null_ratio": 0.0,
+            "distinct": 50,
+            "min": 0,
+            "max": 49,
+            "top_values": [],
+        }
+        label = profiles["label"]
+        assert label["min_length"] >= len("label-0") and label["max_length"] <= len("label-100")
+        assert sum(value["count"] for value in label["top_values"]) <= 50
+        assert label["top_values"][0]["count"] >= label["top_values"][-1]["count"]
+        assert explorer.profile_columns(OWNER, "link_0", ["label"]) == {"label": label}
+
+        with pytest.raises(OperationOutcome, match="Column unknown does not exist"):
+            explorer.profile_columns(OWNER, "link_0", ["unknown"])
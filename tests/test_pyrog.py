@@ -0,0 +1,39 @@
+import pytest
+
+from benchmarks.pyrog_stub import PyrogStub
+from pagai.errors import OperationOutcome
+from pagai.services.pyrog import pyrog
+
+RESOURCE = {"id": "resource_id", "filters": [], "source": {"id": "source_id", "credential": None}}
+
+
+@pytest.fixture
+def pyrog_stub(monkeypatch):
+    with PyrogStub({"resource_id": RESOURCE}) as stub:
+        monkeypatch.setattr(pyrog, "PYROG_URL", stub.url)
+        yield stub
+
+
+class TestPyrogClient:
+    def test_get_resource(self, pyrog_stub):
+        client = pyrog.PyrogClient("Bearer token")
+
+        assert client.get_resource("resource_id") == RESOURCE
+        assert pyrog_stub.queries[0][0]["variables"] == {"resourceId": "resource_id"}
+        assert pyrog_stub.queries[0][1] == "Bearer token"
+
+    def test_resources_are_cached_per_token(self, pyrog_stub):
+        pyrog.PyrogClient("Bearer token").get_resource("resource_id")
+        pyrog.PyrogClient("Bearer token").get_resource("resource_id")
+        assert len(pyrog_stub.queries) == 1
+
+        pyrog.PyrogClient("Bearer other_token").get_resource("resource_id")
+        assert len(pyrog_stub.queries) == 2
+
+    def test_unknown_resource(self, pyrog_stub):
+        with pytest.raises(OperationOutcome, match="does not exist"):
+            pyrog.PyrogClient("Bearer token").get_resource("unknown")
+
+    def test_missing_token(self):
+        with pytest.raises(OperationOutcome):
+            pyrog.PyrogClient(None)
@@ -0,0 +1,132 @@
+import pytest
+from sqlalchemy import select, types
+from sqlalchemy.dialects import mssql, postgresql
+
+from benchmarks.sqlite_explorer import connect, make_credentials, OWNER, SQLiteExplorer
+from benchmarks.synthetic import create_database
+from pagai.errors import OperationOutcome
+from pagai.services.catalog import CatalogColumn, OwnerCatalog
+from pagai.services.database_explorer import schema_cache
+from pagai.services.query_planner import (
+    filters_params,
+    filters_shape,
+    JoinGraph,
+    limit_statement,
+    plan_statement,
+)
+
+CATALOG = OwnerCatalog(
+    "public",
+    {
+        "patients": [
+            CatalogColumn("id", types.Integer(), False, True),
+            CatalogColumn("gender", types.String(), True, False),
+        ],
+        "admissions": [
+            CatalogColumn("id", types.Integer(), False, True),
+            CatalogColumn("patient_id", types.Integer(), True, False),
+            CatalogColumn("kind", types.String(), True, False),
+        ],
+    },
+)
+
+
+def sql_column(table, column, joins=[]):
+    return {"owner": {"name": "public"}, "table": table, "column": column, "joins": joins}
+
+
+# The column of each side of a join belongs to the table of the other side.
+ADMISSIONS_JOIN = {"tables": [sql_column("patients", "patient_id"), sql_column("admissions", "id")]}
+
+
+def plan(filters) -> str:
+    main_table = CATALOG.table("patients")
+    graph = JoinGraph(
+        ("public", "patients"),
+        main_table,
+        lambda owner, table: CATALOG.table(CATALOG.find_table(table)),
+        lambda column, table: table.c[column],
+    )
+    statement = plan_statement(graph, list(main_table.c), filters)
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+class TestQueryPlanner:
+    def test_joins_are_deduplicated(self):
+        filters = [
+            {
+                "sqlColumn": sql_column("admissions", "kind", [ADMISSIONS_JOIN]),
+                "relation": "IN",
+                "value": "a,b",
+            },
+            {
+                "sqlColumn": sql_column("admissions", "id", [ADMISSIONS_JOIN]),
+                "relation": "BETWEEN",
+                "value": "1, 5",
+            },
+        ]
+
+        sql = plan(filters)
+        assert sql.count("JOIN") == 1
+        assert "pagai_join_0.patient_id = public.patients.id" in sql
+        assert "pagai_join_0.kind IN ([EXPANDING_filter_0_0])" in sql
+        assert filters_params(filters) == {
+            "filter_0_0": ["a", "b"],
+            "filter_1_0": "1",
+            "filter_1_1": "5",
+        }
+
+    def test_shape_does_not_depend_on_values(self):
+        filter_ = {"sqlColumn": sql_column("patients", "gender"), "relation": "=", "value": "F"}
+
+        assert filters_shape([filter_]) == filters_shape([{**filter_, "value": "M"}])
+        assert "public.patients.gender = %(filter_0_0)s" in plan([filter_])
+
+    def test_table_names_are_case_insensitive(self):
+        join = {"tables": [sql_column("PATIENTS", "patient_id"), sql_column("Admissions", "id")]}
+        filters = [
+            {"sqlColumn": sql_column("PATIENTS", "gender"), "relation": "=", "value": "F"},
+            {"sqlColumn": sql_column("ADMISSIONS", "kind", [join]), "relation": "=", "value": "a"},
+        ]
+
+        sql = plan(filters)
+        assert "public.patients.gender = %(filter_0_0)s" in sql
+        assert "pagai_join_0.kind = %(filter_1_0)s" in sql
+
+    def test_filtered_table_must_be_joined(self):
+        filter_ = {"sqlColumn": sql_column("admissions", "kind"), "relation": "=", "value": "a"}
+
+        with pytest.raises(OperationOutcome):
+            plan([filter_])
+
+    def test_unknown_relation(self):
+        filter_ = {"sqlColumn": sql_column("patients", "gender"), "relation": "~", "value": "F"}
+
+        with pytest.raises(OperationOutcome):
+            filters_params([filter_])
+
+    def test_limit_is_bound(self):
+        statement = select([CATALOG.table("patients").c.id])
+
+        postgres_sql = str(limit_statement(statement).compile(dialect=postgresql.dialect()))
+        mssql_sql = str(limit_statement(statement, mssql=True).compile(dialect=mssql.dialect()))
+        assert postgres_sql.endswith("LIMIT %(pagai_limit)s")
+        assert mssql_sql.startswith("SELECT TOP (:pagai_limit) [public].patients.id")
+
+
+class TestExplorerStatements:
+    def test_statements_follow_the_catalog(self, tmp_path):
+        path = str(tmp_path / "explored.db")
+        create_database(path, n_tables=2, n_columns=2, n_rows=3, n_joins=1)
+        explorer = SQLiteExplorer(make_credentials(path))
+        assert explorer.explore(OWNER, "link_0", limit=5)["fields"] == ["id", "parent_id", "label"]
+
+        connection = connect(path)
+        connection.execute(f"alter table {OWNER}.link_0 add column extra text")
+        connection.commit()
+        # The catalog is read again while the statement is still cached.
+        schema_cache.invalidate((explorer._db_identity, OWNER, "catalog"))
+
+        exploration = explorer.explore(OWNER, "link_0", limit=5)
+        assert exploration["fields"] == ["id", "parent_id", "label", "extra"]
+        assert all(len(row) == 4 for row in exploration["rows"])
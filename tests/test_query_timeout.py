@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+from sqlalchemy.exc import OperationalError
+
+from pagai.services.query_timeout import apply_query_timeout, is_query_timeout
+
+
+class PostgresError(Exception):
+    pgcode = "57014"
+
+
+class TestQueryTimeout:
+    def test_is_query_timeout(self):
+        assert is_query_timeout(OperationalError("select", {}, PostgresError()))
+        assert is_query_timeout(
+            OperationalError("select", {}, Exception("DPI-1067: call timeout of 1000 ms exceeded"))
+        )
+        assert is_query_timeout(
+            OperationalError("select", {}, Exception("('HYT00', '[HYT00] Query timeout expired')"))
+        )
+        assert not is_query_timeout(
+            OperationalError("select", {}, Exception("could not connect to server"))
+        )
+        assert not is_query_timeout(
+            OperationalError("connect", {}, Exception("('HYT00', '[HYT00] Login timeout expired')"))
+        )
+
+    def test_apply_query_timeout(self):
+        class Connection:
+            def __init__(self, dialect, dbapi_connection=None):
+                self.dialect = dialect
+                self.connection = SimpleNamespace(connection=dbapi_connection)
+                self.statements = []
+
+            def execute(self, statement):
+                self.statements.append(statement)
+
+        postgres = Connection(SimpleNamespace(name="postgresql"))
+        apply_query_timeout(postgres, 1.5)
+        apply_query_timeout(postgres, None)
+        assert postgres.statements == ["SET LOCAL statement_timeout = 1500"]
+
+        mssql = Connection(SimpleNamespace(name="mssql"), SimpleNamespace(timeout=0))
+        apply_query_timeout(mssql, 1.5)
+        assert mssql.connection.connection.timeout == 2
+        apply_query_timeout(mssql, None)
+        assert mssql.connection.connection.timeout == 0
+
+        # callTimeout needs Oracle client 18.1.
+        old_client = SimpleNamespace(clientversion=lambda: (12, 2, 0, 1, 0))
+        oracle = Connection(
+            SimpleNamespace(name="oracle", cx_oracle_ver=(8, 3), dbapi=old_client),
+            SimpleNamespace(),
+        )
+        apply_query_timeout(oracle, 1.5)
+        assert not hasattr(oracle.connection.connection, "callTimeout")
+        oracle.dialect.dbapi = SimpleNamespace(clientversion=lambda: (19, 8, 0, 0, 0))
+        apply_query_timeout(oracle, 1.5)
+        assert oracle.connection.connection.callTimeout == 1500
@@ -0,0 +1,42 @@
+from sqlalchemy.dialects import mssql, oracle, postgresql
+from sqlalchemy.sql import column, select, table
+
+from pagai.services.sampling import sample_table
+
+PATIENTS = table("PATIENTS", column("ID"), schema="SYSTEM")
+
+
+def compile_sample(dialect) -> str:
+    sample = sample_table(PATIENTS, 1.5)
+    return str(select([sample.c.ID]).compile(dialect=dialect))
+
+
+class TestSampling:
+    def test_postgres(self):
+        assert 'FROM "SYSTEM"."PATIENTS" AS pagai_sample TABLESAMPLE system(' in compile_sample(
+            postgresql.dialect()
+        )
+
+    def test_oracle(self):
+        assert 'FROM "SYSTEM"."PATIENTS" SAMPLE BLOCK (1.500000) pagai_sample' in compile_sample(
+            oracle.dialect()
+        )
+
+    def test_mssql(self):
+        assert (
+            "FROM [SYSTEM].[PATIENTS] AS pagai_sample TABLESAMPLE SYSTEM (1.500000 PERCENT)"
+            in compile_sample(mssql.dialect())
+        )
+
+    def test_seed(self):
+        def compile_seeded(dialect):
+            sample = sample_table(PATIENTS, 1.5, seed=42)
+            return str(select([sample.c.ID]).compile(dialect=dialect))
+
+        assert "TABLESAMPLE system(%(system_1)s) REPEATABLE (%(param_1)s)" in compile_seeded(
+            postgresql.dialect()
+        )
+        assert "SAMPLE BLOCK (1.500000) SEED (42) pagai_sample" in compile_seeded(oracle.dialect())
+        assert "TABLESAMPLE SYSTEM (1.500000 PERCENT) REPEATABLE (42)" in compile_seeded(
+            mssql.dialect()
+        )
@@ -0,0 +1,61 @@
+from benchmarks.sqlite_explorer import make_credentials, OWNER, SQLiteExplorer
+from benchmarks.synthetic import create_database
+from pagai.services.search_index import SearchIndex, trigrams
+
+SCHEMA = {
+    "patients": ["id", "first_name", "birth_date"],
+    "visits": ["id", "patient_id", "visit_date"],
+    "doctors": ["id", "name"],
+}
+
+
+class TestSearchIndex:
+    def test_trigrams(self):
+        assert trigrams("Id") == {"  i", " id", "id "}
+        assert trigrams("a_b") == {"  a", " a ", "  b", " b "}
+        assert trigrams("__") == set()
+
+    def test_search(self):
+        index = SearchIndex(SCHEMA)
+
+        assert len(index) == 11
+        matches = index.search("birth")
+        assert matches[0] == {"table": "patients", "column": "birth_date", "score": 0.773}
+        assert index.search("patient", limit=2) == [
+            {"table": "visits", "column": "patient_id", "score": 0.864},
+            {"table": "patients", "column": None, "score": 0.787},
+        ]
+        # Typos are tolerated.
+        assert index.search("brth_dat")[0]["column"] == "birth_date"
+        assert index.search("zzz") == []
+
+    def test_exact_matches_come_first(self):
+        index = SearchIndex({"t": ["name_first", "first_name"]})
+
+        assert [match["column"] for match in index.search("first_name")] == [
+            "first_name",
+            "name_first",
+        ]
+
+    def test_search_table(self):
+        index = SearchIndex(SCHEMA)
+
+        assert index.search("id", table="visits") == [
+            {"table": "visits", "column": "id", "score": 1.0},
+            {"table": "visits", "column": "patient_id", "score": 0.636},
+        ]
+        assert index.search("id", table="unknown") == []
+
+
+class TestExplorerSearch:
+    def test_index_follows_the_cached_schema(self, tmp_path):
+        path = str(tmp_path / "explored.db")
+        create_database(path, n_tables=3, n_columns=2, n_rows=1, n_joins=0)
+        explorer = SQLiteExplorer(make_credentials(path))
+
+        index = explorer.get_search_index(OWNER)
+        assert explorer.get_search_index(OWNER) is index
+        assert explorer.search_owner_schema(OWNER, "wide")[0]["table"] == "wide"
+
+        explorer.invalidate_owner_schema(OWNER)
+        assert explorer.get_search_index(OWNER) is not index
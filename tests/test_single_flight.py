@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+
+from pagai.errors import ServiceUnavailable
+from pagai.services.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls, results = [], []
+
+        def load():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return "schema"
+
+        leader = threading.Thread(target=lambda: results.append(flight.do("key", load)))
+        leader.start()
+        started.wait()
+        followers = [
+            threading.Thread(target=lambda: results.append(flight.do("key", load)))
+            for _ in range(3)
+        ]
+        for follower in followers:
+            follower.start()
+        while flight.stats()["coalesced"] < 3:
+            pass
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join()
+
+        assert calls == [1]
+        assert results == ["schema"] * 4
+        assert flight.stats() == {"in_flight": 0, "coalesced": 3}
+
+    def test_errors_are_raised(self):
+        flight = SingleFlight()
+
+        def fail():
+            raise ValueError("catalog query failed")
+
+        with pytest.raises(ValueError):
+            flight.do("key", fail)
+        assert flight.do("key", lambda: "schema") == "schema"
+
+    def test_followers_stop_waiting(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+
+        def hang():
+            started.set()
+            release.wait()
+
+        leader = threading.Thread(target=lambda: flight.do("key", hang))
+        leader.start()
+        started.wait()
+
+        with pytest.raises(ServiceUnavailable):
+            flight.do("key", hang, timeout=0.01)
+        release.set()
+        leader.join()
@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from sqlalchemy import types
+
+from benchmarks.sqlite_explorer import make_credentials, OWNER, SQLiteExplorer
+from benchmarks.synthetic import create_database
+from pagai.services import database_explorer
+from pagai.services.catalog import CatalogColumn, OwnerCatalog
+from pagai.services.snapshot_store import SnapshotStore
+
+
+class TestSnapshotStore:
+    def test_save_and_load(self, tmp_path):
+        store = SnapshotStore(str(tmp_path / "snapshots.db"))
+        catalog = OwnerCatalog(
+            "public", {"patients": [CatalogColumn("id", types.Integer(), False, True)]}
+        )
+        catalog.table("patients")
+
+        store.save("db", "public", "catalog", catalog)
+        store.save("db", "public", "schema", {"patients": ["id"]})
+        store.flush()
+
+        loaded = store.load("db", "public", "catalog")
+        assert loaded.primary_key("patients") == ["id"]
+        assert isinstance(loaded.columns["patients"][0].type, types.Integer)
+        assert loaded.table("patients").c.id is not None
+        assert store.load("db", "other", "catalog") is None
+        assert store.delete("db", "public", "catalog") == 1
+        assert store.load("db", "public", "schema") == {"patients": ["id"]}
+        assert store.delete("db", "public") == 1
+        assert store.stats() == {"loads": 2, "saves": 2}
+
+    def test_errors_are_ignored(self, tmp_path):
+        store = SnapshotStore(str(tmp_path / "missing" / "snapshots.db"))
+
+        store.save("db", "public", "schema", {})
+        store.flush()
+
+        assert store.load("db", "public", "schema") is None
+        assert store.delete("db", "public") == 0
+
+    def test_revalidate_once(self, tmp_path):
+        store = SnapshotStore(str(tmp_path / "snapshots.db"))
+        calls, done = [], threading.Event()
+
+        def revalidate():
+            calls.append(1)
+            done.set()
+
+        store.revalidate(("db", "public"), revalidate)
+        store.revalidate(("db", "public"), revalidate)
+        done.wait(5)
+        store._executor.shutdown()
+
+        assert calls == [1]
+        assert store.is_revalidated(("db", "public"))
+        assert not store.is_revalidated(("db", "other"))
+
+
+class TestExplorerSnapshots:
+    def test_restarted_worker_loads_snapshots(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "explored.db")
+        create_database(path, n_tables=3, n_columns=2, n_rows=1, n_joins=0)
+        store = SnapshotStore(str(tmp_path / "snapshots.db"))
+        monkeypatch.setattr(database_explorer, "snapshot_store", store)
+        revalidated, revalidation_ends = [], threading.Event()
+
+        def revalidate_owner(self, owner):
+            revalidated.append(owner)
+            revalidation_ends.wait(5)
+
+        monkeypatch.setattr(SQLiteExplorer, "revalidate_owner", revalidate_owner)
+        explorer = SQLiteExplorer(make_credentials(path))
+        schema = explorer.get_owner_schema(OWNER)
+        store.flush()
+
+        # A restart empties the in-memory caches.
+        database_explorer.schema_cache.clear()
+        monkeypatch.setattr(SQLiteExplorer, "read_owner_catalog", lambda self, owner: 1 / 0)
+
+        assert explorer.get_owner_schema(OWNER) == schema
+        assert explorer.get_owner_catalog(OWNER).column_names("wide") == ["id", "c_0", "c_1"]
+        revalidation_ends.set()
+        store._executor.shutdown()
+        assert revalidated == [OWNER]
+
+        # Once revalidated, expired entries are read from the database.
+        database_explorer.schema_cache.clear()
+        with pytest.raises(ZeroDivisionError):
+            explorer.get_owner_catalog(OWNER)